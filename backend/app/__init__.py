@@ -4,33 +4,66 @@ from flask_login import LoginManager
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
 from .config import Config
+from .cache import TreeCache, UserCache
+from .events import EventBroker
+from .metrics import Metrics
+from .passwords import PasswordHasher
+from .profiler import Profiler
+from .query_budget import QueryBudget
+from .serialization import JSONProvider
+from . import database
 from flasgger import Swagger
 
 # Initialize extensions outside the create_app function
 db = SQLAlchemy()
 login_manager = LoginManager()
 bcrypt = Bcrypt()
+tree_cache = TreeCache()
+user_cache = UserCache()
+password_hasher = PasswordHasher()
+event_broker = EventBroker()
+metrics = Metrics()
+query_budget = QueryBudget()
+profiler = Profiler()
 
 
-def create_app():
+def create_app(test_config=None):
     """
     Creates and configures the Flask application.
 
     Initializes extensions, registers blueprints, and sets up CORS.
 
+    Args:
+        test_config: Optional mapping of settings that override the defaults in Config.
+            Applied before the extensions are initialized, so it can point the app at a
+            different database (e.g. an in-memory one for tests).
+
     Returns:
         The configured Flask app instance.
     """
     app = Flask(__name__)
     app.config.from_object(Config)
+    if test_config is not None:
+        app.config.from_mapping(test_config)
+
+    # Serialize JSON responses with the encoder chosen by JSON_ENCODER
+    app.json = JSONProvider(app)
 
     # Enable CORS for all routes
     CORS(app)
 
-    # Initialize extensions with the app instance
+    # Initialize extensions with the app instance, applying the database profile to the engine first
+    database.init_profile(app)
     db.init_app(app)
     login_manager.init_app(app)
     bcrypt.init_app(app)
+    tree_cache.init_app(app)
+    user_cache.init_app(app)
+    password_hasher.init_app(app, bcrypt)
+    event_broker.init_app(app)
+    metrics.init_app(app, db)
+    query_budget.init_app(app, db)
+    profiler.init_app(app, db)
 
     # Initialize Swagger UI for API documentation
     swagger = Swagger(app, template_file='../openapi.yaml')
@@ -39,6 +72,14 @@ def create_app():
     from .routes import main
     app.register_blueprint(main)
 
+    # Register the schema migration commands (flask db upgrade / flask db current)
+    from . import migrations
+    app.cli.add_command(migrations.db_cli)
+
+    # Register the command generating benchmark data (flask seed)
+    from . import seed
+    app.cli.add_command(seed.seed_command)
+
     @app.after_request
     def after_request(response):
         """
@@ -61,8 +102,17 @@ def create_app():
         Creates all database tables defined in the models.
 
         This is done within the application context to ensure that the database connection
-        is available.
+        is available. A new database already has the latest schema, so every migration is
+        recorded as applied; an existing one is only upgraded by 'flask db upgrade'.
         """
+        database.configure_engine(app, db.engine)
+        new_database = not db.inspect(db.engine).has_table('user')
         db.create_all()
+        if new_database:
+            migrations.stamp(db.engine)
+        else:
+            with db.engine.connect() as connection:
+                if migrations.current_version(connection) < migrations.head():
+                    app.logger.warning("Database schema is out of date, run 'flask db upgrade'")
 
     return app
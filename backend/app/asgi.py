@@ -0,0 +1,256 @@
+import io
+import sys
+from asgiref.wsgi import WsgiToAsgi
+from flask import jsonify, request, session, current_app
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from werkzeug.exceptions import HTTPException, NotFound
+from . import db, login_manager, tree_cache, user_cache
+from .database import configure_engine, engine_options
+from .models import CachedUser, User, TodoList, TodoItem
+from .operations import (list_stats, list_stats_select, list_to_dict, list_tree_select, serialize_item_tree,
+                         subtrees_select)
+from .routes import (is_paginated, items_etag, lists_etag, lists_version_select, not_modified, page_query,
+                     page_result, wants_list_stats, with_etag)
+from .tokens import InvalidToken, bearer_token, verify_token
+
+# Async drivers used for the synchronous drivers of SQLALCHEMY_DATABASE_URI
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+
+def async_database_url(app):
+    """
+    Returns the URL of the async engine of an app.
+
+    SQLALCHEMY_ASYNC_DATABASE_URI wins if set; otherwise the URL of the app's engine is
+    reused with the async driver of its dialect, so both modes share one database.
+    """
+    if app.config.get('SQLALCHEMY_ASYNC_DATABASE_URI'):
+        return make_url(app.config['SQLALCHEMY_ASYNC_DATABASE_URI'])
+    with app.app_context():
+        url = db.engine.url
+    return url.set(drivername=ASYNC_DRIVERS[url.get_backend_name()])
+
+
+def build_environ(scope):
+    """
+    Builds the WSGI environ of a bodyless ASGI HTTP request, for a Flask request context.
+
+    Args:
+        scope: The ASGI connection scope.
+    """
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1] or 80),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        key = name if name in ('CONTENT_TYPE', 'CONTENT_LENGTH') else f'HTTP_{name}'
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+async def load_user(async_session):
+    """
+    Returns the user of the current request, or None.
+
+    Accepts the same credentials as the blueprint without blocking: a bearer access token
+    (no database access) or a session holding a user ID (served from the user cache, or
+    loaded with the async session on a miss).
+    """
+    token = bearer_token(request)
+    if token is not None:
+        try:
+            claims = verify_token(token, 'access')
+        except InvalidToken:
+            return None
+        return CachedUser(int(claims['sub']), claims.get('username'), claims.get('email'))
+
+    try:
+        user_id = int(session.get('_user_id'))
+    except (TypeError, ValueError):
+        return None
+    record = user_cache.get(user_id)
+    if record is None:
+        user = await async_session.get(User, user_id)
+        if user is None:
+            return None
+        record = CachedUser(user.id, user.username, user.email)
+        user_cache.set(user_id, record)
+    return record
+
+
+async def check_auth(async_session, user):
+    """Async counterpart of routes.check_auth for an authenticated user."""
+    return jsonify({
+        'authenticated': True,
+        'user': {'id': user.id, 'username': user.username, 'email': user.email}
+    })
+
+
+async def get_lists(async_session, user):
+    """Async counterpart of routes.get_lists."""
+    stats = wants_list_stats()
+    etag = lists_etag(user.id, *(await async_session.execute(lists_version_select(user.id, stats))).one())
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    async def serialize(lists):
+        """Serializes the lists, with their item totals if requested."""
+        if not stats:
+            return [list_to_dict(list) for list in lists]
+        totals = list_stats(lists, await async_session.execute(list_stats_select([list.id for list in lists])))
+        return [list_to_dict(list, totals[list.id]) for list in lists]
+
+    statement = db.select(TodoList).filter_by(user_id=user.id)
+    if is_paginated():
+        try:
+            statement, limit = page_query(statement, TodoList)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        lists, next_cursor = page_result((await async_session.scalars(statement)).all(), limit)
+        return with_etag(jsonify({
+            'lists': await serialize(lists),
+            'next_cursor': next_cursor
+        }), etag)
+
+    lists = (await async_session.scalars(statement)).all()
+    return with_etag(jsonify(await serialize(lists)), etag)
+
+
+async def get_items(async_session, user, list_id):
+    """Async counterpart of routes.get_items."""
+    todo_list = await async_session.get(TodoList, list_id)
+    if todo_list is None:
+        raise NotFound()
+    if todo_list.user_id != user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    etag = items_etag(todo_list)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    if is_paginated():
+        try:
+            statement, limit = page_query(db.select(TodoItem).filter_by(list_id=list_id, parent_id=None), TodoItem)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        roots, next_cursor = page_result((await async_session.scalars(statement)).all(), limit)
+        items = []
+        if roots:
+            items = (await async_session.scalars(subtrees_select(roots))).all()
+        return with_etag(jsonify({
+            'items': serialize_item_tree(items, roots),
+            'next_cursor': next_cursor
+        }), etag)
+
+    data = tree_cache.get(todo_list.id, todo_list.version)
+    if data is None:
+        items = (await async_session.scalars(list_tree_select(list_id))).all()
+        data = jsonify(serialize_item_tree(items)).get_data()
+        tree_cache.set(todo_list.id, todo_list.version, data)
+    return with_etag(current_app.response_class(data, mimetype='application/json'), etag)
+
+
+# Blueprint endpoints served from the event loop; every other request goes to the WSGI app
+ASYNC_VIEWS = {
+    'main.check_auth': check_auth,
+    'main.get_lists': get_lists,
+    'main.get_items': get_items,
+}
+
+
+class AsyncApp:
+    """
+    ASGI application serving a Flask app from an event loop.
+
+    The read routes in ASYNC_VIEWS are answered by coroutines that query the database
+    through an async SQLAlchemy engine, so waiting on the database or on idle keep-alive
+    connections does not pin a thread. They run inside a Flask request context and reuse
+    the blueprint's models, serialization, ETag and pagination helpers and after_request
+    hooks (CORS), so the JSON contract is the same.
+
+    Writes, unauthenticated requests and every other route are passed to the Flask app
+    itself, which runs on a thread pool.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.wsgi = WsgiToAsgi(app)
+        url = async_database_url(app)
+        options = engine_options(app, url)
+        if options:
+            options['poolclass'] = AsyncAdaptedQueuePool  # aiosqlite defaults to NullPool
+        self.engine = create_async_engine(url, **options)
+        configure_engine(app, self.engine.sync_engine)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['method'] != 'GET' or not await self.handle(scope, send):
+            await self.wsgi(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        """Answers the ASGI lifespan protocol, disposing of the async engine on shutdown."""
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle(self, scope, send):
+        """
+        Serves a GET request with an async view.
+
+        Returns:
+            False, without sending anything, if the request has no async view or no
+            credentials the async views accept; the WSGI app then serves it.
+        """
+        with self.app.request_context(build_environ(scope)):
+            if request.routing_exception is not None or request.url_rule.endpoint not in ASYNC_VIEWS:
+                return False
+
+            async with AsyncSession(self.engine, expire_on_commit=False) as async_session:
+                user = await load_user(async_session)
+                if user is None:
+                    return False
+                login_manager._update_request_context_with_user(user)
+                try:
+                    rv = await ASYNC_VIEWS[request.url_rule.endpoint](async_session, user, **request.view_args)
+                except HTTPException as e:
+                    rv = self.app.handle_user_exception(e)
+            response = self.app.process_response(self.app.make_response(rv))
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in response.headers.to_wsgi_list()],
+        })
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+        return True
@@ -0,0 +1,209 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from flask import current_app, has_app_context
+
+
+def hit_rate(hits, misses):
+    """Returns the share of lookups that were hits, or 0.0 before the first lookup."""
+    lookups = hits + misses
+    return hits / lookups if lookups else 0.0
+
+
+class ByteBudgetLRU:
+    """
+    A thread-safe LRU mapping whose capacity is a total size in bytes rather than a number of entries.
+
+    Each value is stored with a version; a lookup with a different version is a miss, so an
+    entry written by a request that read an older version can never be served after a write.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()  # key -> (version, data), least recently used first
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = Lock()
+
+    def get(self, key, version):
+        """Returns the cached data for key at version, or None."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, version, data):
+        """Stores data for key at version, evicting least recently used entries to stay within budget."""
+        if len(data) > self.max_bytes:
+            return
+        with self.lock:
+            self._remove(key)
+            self.entries[key] = (version, data)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                self._remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def invalidate(self, *keys):
+        """Drops the entries of the given keys."""
+        with self.lock:
+            for key in keys:
+                self._remove(key)
+
+    def stats(self):
+        """Returns the cache counters and current usage."""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': hit_rate(self.hits, self.misses),
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes
+            }
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+
+class TTLCache:
+    """
+    A thread-safe LRU mapping of at most max_entries entries, each expiring ttl seconds after it was stored.
+    """
+
+    def __init__(self, max_entries, ttl, clock=time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (expires_at, value), least recently used first
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = Lock()
+
+    def get(self, key):
+        """Returns the value stored for key, or None if there is none or it has expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] <= self.clock():
+                del self.entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value):
+        """Stores value for key, evicting the least recently used entry if the cache is full."""
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (self.clock() + self.ttl, value)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys):
+        """Drops the entries of the given keys."""
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def stats(self):
+        """Returns the cache counters and current usage."""
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': hit_rate(self.hits, self.misses),
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'entries': len(self.entries),
+                'max_entries': self.max_entries
+            }
+
+
+class TreeCache:
+    """
+    Flask extension caching the serialized item tree of each list, keyed by list ID and version.
+
+    Each app gets its own ByteBudgetLRU, sized by TREE_CACHE_MAX_BYTES (0 disables caching).
+    """
+
+    def init_app(self, app):
+        """Creates the app's cache."""
+        app.extensions['tree_cache'] = ByteBudgetLRU(app.config['TREE_CACHE_MAX_BYTES'])
+
+    @property
+    def store(self):
+        return current_app.extensions['tree_cache']
+
+    def get(self, list_id, version):
+        """Returns the cached JSON body of a list's tree at the given version, or None."""
+        if not self.store.max_bytes:
+            return None
+        return self.store.get(list_id, version)
+
+    def set(self, list_id, version, data):
+        """Caches the JSON body of a list's tree at the given version."""
+        if self.store.max_bytes:
+            self.store.set(list_id, version, data)
+
+    def invalidate(self, *list_ids):
+        """Drops the cached trees of the given lists. Does nothing outside an app context."""
+        if has_app_context():
+            self.store.invalidate(*list_ids)
+
+    def stats(self):
+        """Returns the hit, miss and eviction counters and the memory usage of the cache."""
+        return self.store.stats()
+
+
+class UserCache:
+    """
+    Flask extension caching lightweight user records for the Flask-Login user loader.
+
+    Each app gets its own TTLCache, sized by USER_CACHE_SIZE (0 disables caching). Entries
+    are dropped when the user row changes in this process; USER_CACHE_TTL bounds how long
+    another worker can keep serving a record after such a change.
+    """
+
+    def init_app(self, app):
+        """Creates the app's cache."""
+        app.extensions['user_cache'] = TTLCache(app.config['USER_CACHE_SIZE'], app.config['USER_CACHE_TTL'])
+
+    @property
+    def store(self):
+        return current_app.extensions['user_cache']
+
+    def get(self, user_id):
+        """Returns the cached record of a user, or None."""
+        if not self.store.max_entries:
+            return None
+        return self.store.get(user_id)
+
+    def set(self, user_id, record):
+        """Caches the record of a user."""
+        if self.store.max_entries:
+            self.store.set(user_id, record)
+
+    def invalidate(self, *user_ids):
+        """Drops the cached records of the given users. Does nothing outside an app context."""
+        if has_app_context():
+            self.store.invalidate(*user_ids)
+
+    def stats(self):
+        """Returns the hit, miss, eviction and expiration counters of the cache."""
+        return self.store.stats()
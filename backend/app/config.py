@@ -14,6 +14,22 @@ class Config:
     # Database connection URI
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///todo.db'  # Use environment variable or local SQLite database
 
+    # Database URI of the async engine used by asgi.py; derived from SQLALCHEMY_DATABASE_URI if unset
+    SQLALCHEMY_ASYNC_DATABASE_URI = os.environ.get('ASYNC_DATABASE_URL')
+
+    # Database profile: 'development' uses the driver defaults, 'production' sizes the connection
+    # pool and sets the SQLite pragmas below (WAL journaling, synchronous=NORMAL, foreign keys)
+    DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE') or 'development'
+
+    # Connections kept in the pool, and how many more may be opened under load (production profile)
+    DATABASE_POOL_SIZE = int(os.environ.get('DATABASE_POOL_SIZE') or 10)
+    DATABASE_MAX_OVERFLOW = int(os.environ.get('DATABASE_MAX_OVERFLOW') or 20)
+
+    # SQLite lock wait in milliseconds, and memory-mapped and page cache sizes in bytes (production profile)
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000)
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024)
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE') or 64 * 1024 * 1024)
+
     # Disable SQLAlchemy event tracking for performance improvement
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
@@ -23,8 +39,66 @@ class Config:
     # JWT access token expiration time
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
 
+    # JWT refresh token expiration time
+    JWT_REFRESH_TOKEN_EXPIRES = timedelta(days=30)
+
     # Permanent session lifetime (for "remember me" functionality)
     PERMANENT_SESSION_LIFETIME = timedelta(days=30)
 
     # Enable permanent sessions
     SESSION_PERMANENT = True
+
+    # Maximum number of operations accepted in a single POST /batch request
+    BATCH_MAX_OPERATIONS = int(os.environ.get('BATCH_MAX_OPERATIONS') or 500)
+
+    # Maximum number of items accepted in a single POST /lists/<id>/items/import request
+    IMPORT_MAX_ITEMS = int(os.environ.get('IMPORT_MAX_ITEMS') or 10000)
+
+    # Rows fetched per round trip by GET /export, and records inserted per statement by POST /import
+    EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE') or 1000)
+
+    # Deepest level an item can be created at (top-level items are level 1)
+    MAX_NESTING_LEVEL = int(os.environ.get('MAX_NESTING_LEVEL') or 3)
+
+    # Largest page size accepted by the paginated GET /lists and GET /lists/<id>/items
+    PAGE_MAX_SIZE = int(os.environ.get('PAGE_MAX_SIZE') or 200)
+
+    # Encoder of JSON responses: 'auto' (orjson when installed), 'orjson' or 'json' (standard library)
+    JSON_ENCODER = os.environ.get('JSON_ENCODER') or 'auto'
+
+    # Memory budget, in bytes, of the in-process cache of serialized item trees (0 disables it)
+    TREE_CACHE_MAX_BYTES = int(os.environ.get('TREE_CACHE_MAX_BYTES') or 64 * 1024 * 1024)
+
+    # Broker carrying list change events to GET /lists/<id>/events streams: an import path of an
+    # app.events.EventBackend subclass (the default only reaches streams of the same process)
+    EVENTS_BACKEND = os.environ.get('EVENTS_BACKEND') or 'app.events.MemoryBackend'
+
+    # Events a slow stream may fall behind by before it is told to reload, and seconds between keep-alives
+    EVENTS_QUEUE_SIZE = int(os.environ.get('EVENTS_QUEUE_SIZE') or 100)
+    EVENTS_HEARTBEAT_INTERVAL = float(os.environ.get('EVENTS_HEARTBEAT_INTERVAL') or 15)
+
+    # Per-route request, SQL and response size metrics served at GET /metrics (0, the default, disables
+    # them). The endpoint is not authenticated: when enabled, only expose it to the metrics scraper.
+    METRICS_ENABLED = int(os.environ.get('METRICS_ENABLED') or 0)
+
+    # What happens when a view runs more SQL statements than its declared budget: 'off', 'log'
+    # (a warning in the app log, e.g. in staging) or 'raise' (QueryBudgetExceeded, as in the tests)
+    QUERY_BUDGET_MODE = os.environ.get('QUERY_BUDGET_MODE') or 'off'
+
+    # Development/staging only: profile requests sent with an X-Profile header or ?profile=1 (0 disables it)
+    PROFILER_ENABLED = int(os.environ.get('PROFILER_ENABLED') or 0)
+
+    # Directory the profiles are saved to; if unset, a profile is returned in place of the response
+    PROFILER_DIR = os.environ.get('PROFILER_DIR')
+
+    # bcrypt cost factor for new password hashes; older hashes are upgraded on the next login
+    BCRYPT_LOG_ROUNDS = int(os.environ.get('BCRYPT_LOG_ROUNDS') or 12)
+
+    # Threads hashing passwords, and how many more hashes may wait for one before requests are rejected
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS') or 4)
+    PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE') or 16)
+
+    # Number of user records the Flask-Login user loader keeps in memory (0 disables the cache),
+    # and for how many seconds a record may be served before it is reloaded
+    USER_CACHE_SIZE = int(os.environ.get('USER_CACHE_SIZE') or 10000)
+    USER_CACHE_TTL = int(os.environ.get('USER_CACHE_TTL') or 60)
@@ -0,0 +1,91 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+PROFILES = ('development', 'production')
+
+
+def is_file_sqlite(url):
+    """Returns True if a database URL points at an SQLite database file, rather than an in-memory one."""
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def engine_options(app, url):
+    """
+    Returns the engine options of the app's database profile for a database URL.
+
+    The 'production' profile sizes the connection pool with DATABASE_POOL_SIZE and
+    DATABASE_MAX_OVERFLOW. In-memory SQLite databases keep SQLAlchemy's default
+    single-connection pool, whatever the profile.
+
+    Args:
+        app: The Flask app.
+        url: The database URL, as a string or URL object.
+    """
+    url = make_url(url)
+    if app.config['DATABASE_PROFILE'] != 'production' or (
+            url.get_backend_name() == 'sqlite' and not is_file_sqlite(url)):
+        return {}
+    options = {
+        'pool_size': app.config['DATABASE_POOL_SIZE'],
+        'max_overflow': app.config['DATABASE_MAX_OVERFLOW'],
+    }
+    if url.get_backend_name() != 'sqlite':
+        options['pool_pre_ping'] = True  # Server databases may drop idle connections
+    return options
+
+
+def sqlite_pragmas(app):
+    """
+    Returns the PRAGMA statements run on every new SQLite connection of the app's profile.
+
+    The 'production' profile switches to write-ahead logging, so readers no longer block
+    on a writer; waits up to SQLITE_BUSY_TIMEOUT milliseconds for a lock instead of failing
+    with "database is locked"; only syncs on checkpoints (safe with WAL); memory-maps and
+    caches the database file; and enforces foreign keys.
+    """
+    if app.config['DATABASE_PROFILE'] != 'production':
+        return []
+    return [
+        'PRAGMA journal_mode=WAL',
+        f"PRAGMA busy_timeout={int(app.config['SQLITE_BUSY_TIMEOUT'])}",
+        'PRAGMA synchronous=NORMAL',
+        f"PRAGMA mmap_size={int(app.config['SQLITE_MMAP_SIZE'])}",
+        f"PRAGMA cache_size={-(int(app.config['SQLITE_CACHE_SIZE']) // 1024)}",  # Negative means KiB
+        'PRAGMA foreign_keys=ON',
+    ]
+
+
+def init_profile(app):
+    """
+    Applies the database profile to the app's engine options.
+
+    Must run before the SQLAlchemy extension is initialized; explicit
+    SQLALCHEMY_ENGINE_OPTIONS take precedence over the profile.
+
+    Raises:
+        ValueError: If DATABASE_PROFILE is not a known profile.
+    """
+    if app.config['DATABASE_PROFILE'] not in PROFILES:
+        raise ValueError(f"Unknown DATABASE_PROFILE {app.config['DATABASE_PROFILE']!r}, expected one of {PROFILES}")
+    options = engine_options(app, app.config['SQLALCHEMY_DATABASE_URI'])
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {**options, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})}
+
+
+def configure_engine(app, engine):
+    """
+    Runs the profile's pragmas on every new connection of an SQLite engine.
+
+    Args:
+        app: The Flask app.
+        engine: A synchronous Engine (for an AsyncEngine, pass its sync_engine).
+    """
+    pragmas = sqlite_pragmas(app)
+    if engine.url.get_backend_name() != 'sqlite' or not pragmas:
+        return
+
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
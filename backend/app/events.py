@@ -0,0 +1,121 @@
+import queue
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from threading import Lock
+from flask import current_app, has_app_context
+from werkzeug.utils import import_string
+
+
+class Subscription:
+    """
+    A subscriber's queue of messages on one channel.
+
+    The queue is bounded: if the subscriber falls behind by more than its size, further
+    messages are dropped and the subscription is marked as overflowed, so the stream can
+    tell its client to reload instead of silently missing changes.
+    """
+
+    def __init__(self, backend, channel, max_size):
+        self.backend = backend
+        self.channel = channel
+        self.messages = queue.Queue(max_size)
+        self.overflowed = False
+
+    def put(self, message):
+        """Queues a message, or marks the subscription as overflowed if the queue is full."""
+        try:
+            self.messages.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+    def get(self, timeout):
+        """Returns the next message, waiting up to timeout seconds, or None."""
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        """Stops receiving messages."""
+        self.backend.unsubscribe(self)
+
+
+class EventBackend(ABC):
+    """
+    Interface of the brokers that carry events between the write routes and the event streams.
+
+    Messages are strings (serialized JSON), so a backend shared by several worker processes,
+    e.g. over a local socket, can pass them on unchanged. EVENTS_BACKEND names the class,
+    which is created with the app's config; a class missing one of the methods fails then.
+    """
+
+    def __init__(self, config):
+        self.queue_size = config['EVENTS_QUEUE_SIZE']
+
+    @abstractmethod
+    def publish(self, channel, message):
+        """Delivers a message to every current subscriber of a channel."""
+
+    @abstractmethod
+    def subscribe(self, channel):
+        """Returns a new Subscription to a channel."""
+
+    @abstractmethod
+    def unsubscribe(self, subscription):
+        """Removes a subscription created by subscribe."""
+
+
+class MemoryBackend(EventBackend):
+    """
+    In-process broker: events reach the streams served by the same worker process only.
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.subscriptions = defaultdict(set)  # channel -> subscriptions
+        self.lock = Lock()
+
+    def publish(self, channel, message):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(channel, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+    def subscribe(self, channel):
+        subscription = Subscription(self, channel, self.queue_size)
+        with self.lock:
+            self.subscriptions[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscribers = self.subscriptions.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.subscriptions[subscription.channel]
+
+
+class EventBroker:
+    """
+    Flask extension publishing the change events of each list to its subscribers.
+
+    Each app gets its own backend, an instance of the EVENTS_BACKEND class.
+    """
+
+    def init_app(self, app):
+        """Creates the app's backend."""
+        app.extensions['event_broker'] = import_string(app.config['EVENTS_BACKEND'])(app.config)
+
+    @property
+    def backend(self):
+        return current_app.extensions['event_broker']
+
+    def publish(self, list_id, event):
+        """Publishes an event of a list. Does nothing outside an app context."""
+        if has_app_context():
+            self.backend.publish(f'list:{list_id}', current_app.json.dumps(event))
+
+    def subscribe(self, list_id):
+        """Returns a Subscription to the events of a list; its messages are serialized events."""
+        return self.backend.subscribe(f'list:{list_id}')
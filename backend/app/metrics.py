@@ -0,0 +1,196 @@
+import time
+from bisect import bisect_left
+from threading import Lock
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+# Upper bounds of the histogram buckets; each histogram also has a +Inf bucket
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENTS_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+BYTES_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_value(value):
+    """Formats a sample value or bucket bound as Prometheus expects, e.g. '0.25', '3' or '+Inf'."""
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def format_labels(names, values):
+    """Formats label pairs, e.g. '{method="GET",status="200"}', escaping the values."""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter:
+    """A thread-safe family of counters, one per combination of label values."""
+
+    type = 'counter'
+
+    def __init__(self, name, documentation, labels):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.series = {}  # label values -> total
+        self.lock = Lock()
+
+    def inc(self, label_values, amount=1):
+        """Adds amount to the counter of the given label values."""
+        with self.lock:
+            self.series[label_values] = self.series.get(label_values, 0) + amount
+
+    def samples(self):
+        """Yields the sample lines of the family."""
+        with self.lock:
+            series = sorted(self.series.items())
+        for label_values, total in series:
+            yield f'{self.name}{format_labels(self.labels, label_values)} {format_value(total)}'
+
+
+class Histogram:
+    """
+    A thread-safe family of histograms, one per combination of label values.
+
+    Observations are counted in the first bucket whose upper bound they do not exceed;
+    buckets are made cumulative, as Prometheus expects, only when rendered.
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.series = {}  # label values -> [count per bucket..., count above the last bucket, sum]
+        self.lock = Lock()
+
+    def observe(self, label_values, value):
+        """Records a value in the histogram of the given label values."""
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            counts = self.series.get(label_values)
+            if counts is None:
+                counts = self.series[label_values] = [0] * (len(self.buckets) + 2)
+            counts[index] += 1
+            counts[-1] += value
+
+    def samples(self):
+        """Yields the bucket, sum and count lines of the family."""
+        with self.lock:
+            series = sorted((label_values, list(counts)) for label_values, counts in self.series.items())
+        labels = self.labels + ('le',)
+        for label_values, counts in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                yield f'{self.name}_bucket{format_labels(labels, label_values + (format_value(bound),))} {cumulative}'
+            label_text = format_labels(self.labels, label_values)
+            yield f'{self.name}_sum{label_text} {format_value(counts[-1])}'
+            yield f'{self.name}_count{label_text} {cumulative}'
+
+
+class Registry:
+    """The metrics of one app."""
+
+    def __init__(self):
+        route = ('method', 'endpoint')
+        self.requests = Counter('http_requests_total', 'Requests answered, by route and status code.',
+                                route + ('status',))
+        self.latency = Histogram('http_request_duration_seconds', 'Time spent handling a request.',
+                                 route, SECONDS_BUCKETS)
+        self.response_size = Histogram('http_response_size_bytes', 'Body size of the responses with a known length.',
+                                       route, BYTES_BUCKETS)
+        self.statements = Histogram('http_request_sql_statements', 'SQL statements executed per request.',
+                                    route, STATEMENTS_BUCKETS)
+        self.sql_time = Histogram('http_request_sql_duration_seconds', 'Time spent executing SQL per request.',
+                                  route, SECONDS_BUCKETS)
+        self.families = (self.requests, self.latency, self.response_size, self.statements, self.sql_time)
+
+    def render(self):
+        """Returns every metric in the Prometheus text exposition format."""
+        lines = []
+        for family in self.families:
+            lines.append(f'# HELP {family.name} {family.documentation}')
+            lines.append(f'# TYPE {family.name} {family.type}')
+            lines.extend(family.samples())
+        return '\n'.join(lines) + '\n'
+
+
+class Metrics:
+    """
+    Flask extension recording the latency, status code, response size and SQL statements of each request.
+
+    Requests are labelled with their method and endpoint (e.g. 'main.get_items'); requests
+    that match no route are not recorded. SQL statements are counted through the engine's
+    cursor events, so lazy loads and bulk statements are included. The SQL of a streamed
+    body (GET /export) runs after the request is recorded, and is not counted; neither is
+    the size of a streamed body without a Content-Length. METRICS_ENABLED=0, the default,
+    installs nothing.
+    """
+
+    def init_app(self, app, db):
+        """Creates the app's registry and installs the request hooks and the engine listeners."""
+        if not app.config['METRICS_ENABLED']:
+            return
+        app.extensions['metrics'] = Registry()
+        app.before_request(self.start_request)
+        app.after_request(self.record_request)
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self.start_statement)
+        event.listen(engine, 'after_cursor_execute', self.record_statement)
+
+    @property
+    def registry(self):
+        return current_app.extensions['metrics']
+
+    @property
+    def enabled(self):
+        return 'metrics' in current_app.extensions
+
+    @staticmethod
+    def start_request():
+        g.metrics_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+
+    def record_request(self, response):
+        """Records a finished request; registered as an after_request function."""
+        started = g.pop('metrics_started', None)
+        if started is None or request.endpoint is None:
+            return response
+        route = (request.method, request.endpoint)
+        self.registry.requests.inc(route + (response.status_code,))
+        self.registry.latency.observe(route, time.perf_counter() - started)
+        self.registry.statements.observe(route, g.sql_statements)
+        self.registry.sql_time.observe(route, g.sql_seconds)
+        size = response.content_length
+        if size is None and not response.is_streamed:
+            size = response.calculate_content_length()
+        if size is not None:
+            self.registry.response_size.observe(route, size)
+        return response
+
+    @staticmethod
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info['metrics_statement_started'] = time.perf_counter()
+
+    @staticmethod
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('metrics_statement_started', None)
+        if started is not None and has_request_context() and 'metrics_started' in g:
+            g.sql_statements += 1
+            g.sql_seconds += time.perf_counter() - started
+
+    def render(self):
+        """Returns the app's metrics in the Prometheus text exposition format."""
+        return self.registry.render()
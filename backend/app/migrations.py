@@ -0,0 +1,272 @@
+import click
+from datetime import datetime
+from flask.cli import AppGroup
+from . import db, search
+
+# Records which migrations have been applied to the database
+schema_migrations = db.Table(
+    'schema_migrations',
+    db.Column('version', db.Integer, primary_key=True),
+    db.Column('applied_at', db.DateTime, default=datetime.utcnow)
+)
+
+
+def add_column(connection, table, name, definition):
+    """
+    Adds a column to an existing table unless it is already there.
+
+    Args:
+        connection: The connection of the migration's transaction.
+        table: The table name.
+        name: The column name.
+        definition: The column type and constraints, as SQL.
+    """
+    columns = {column['name'] for column in db.inspect(connection).get_columns(table)}
+    if name not in columns:
+        connection.exec_driver_sql(f'ALTER TABLE "{table}" ADD COLUMN {name} {definition}')
+
+
+def add_versions(connection):
+    """Adds the version counters used for ETags."""
+    add_column(connection, 'user', 'lists_version', 'INTEGER NOT NULL DEFAULT 1')
+    add_column(connection, 'todo_list', 'version', 'INTEGER NOT NULL DEFAULT 1')
+
+
+def add_sync_tracking(connection):
+    """Adds item revisions and the tombstone table used by GET /lists/<id>/changes."""
+    add_column(connection, 'todo_item', 'updated_at', 'DATETIME')
+    add_column(connection, 'todo_item', 'revision', 'INTEGER NOT NULL DEFAULT 0')
+    connection.exec_driver_sql('UPDATE todo_item SET updated_at = created_at WHERE updated_at IS NULL')
+    connection.exec_driver_sql(
+        'CREATE TABLE IF NOT EXISTS todo_item_tombstone ('
+        'id INTEGER NOT NULL, '
+        'item_id INTEGER NOT NULL, '
+        'list_id INTEGER NOT NULL, '
+        'revision INTEGER NOT NULL, '
+        'deleted_at DATETIME, '
+        'PRIMARY KEY (id))'
+    )
+
+
+def add_hot_path_indexes(connection):
+    """
+    Adds the indexes behind the filters the routes run.
+
+    (user_id, created_at, id) serves GET /lists and its pagination. (list_id, parent_id,
+    created_at, id) serves the top-level items of a list and their pagination; its list_id
+    prefix serves the whole-tree load of GET /lists/<id>/items, delete_list and the
+    list_id/revision delta of GET /lists/<id>/changes. The tombstones of that delta are read
+    by (list_id, revision). (parent_id, completed) covers the subtask counts of
+    recount_children and the counter repair. Subtrees are read by the path range scan of
+    ix_todo_item_path, added with the paths.
+    """
+    for statement in (
+        'CREATE INDEX IF NOT EXISTS ix_todo_list_user_id_created_at ON todo_list (user_id, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS ix_todo_item_list_id_parent_id_created_at '
+        'ON todo_item (list_id, parent_id, created_at, id)',
+        'CREATE INDEX IF NOT EXISTS ix_todo_item_parent_id_completed ON todo_item (parent_id, completed)',
+        'CREATE INDEX IF NOT EXISTS ix_todo_item_tombstone_list_id_revision '
+        'ON todo_item_tombstone (list_id, revision)',
+    ):
+        connection.exec_driver_sql(statement)
+
+
+def add_item_paths(connection):
+    """
+    Adds the materialized path of every item, and moves subtasks to the list of their tree.
+
+    Paths and lists are computed top-down from the top-level items with a recursive CTE.
+    Subtasks left behind in their old list by a move, before moves took the subtree along,
+    get the list that displays them.
+    """
+    add_column(connection, 'todo_item', 'path', "VARCHAR(255) NOT NULL DEFAULT '/'")
+    connection.exec_driver_sql(
+        'CREATE TEMPORARY TABLE item_tree AS '
+        'WITH RECURSIVE tree(id, path, list_id) AS ('
+        "SELECT id, '/', list_id FROM todo_item WHERE parent_id IS NULL "
+        'UNION ALL '
+        "SELECT todo_item.id, tree.path || tree.id || '/', tree.list_id "
+        'FROM todo_item JOIN tree ON todo_item.parent_id = tree.id'
+        ') SELECT id, path, list_id FROM tree'
+    )
+    connection.exec_driver_sql(
+        'UPDATE todo_item SET path = item_tree.path, list_id = item_tree.list_id '
+        'FROM item_tree WHERE item_tree.id = todo_item.id'
+    )
+    connection.exec_driver_sql('DROP TABLE item_tree')
+    connection.exec_driver_sql('CREATE INDEX IF NOT EXISTS ix_todo_item_path ON todo_item (path)')
+
+
+# Actual number of direct subtasks, and of open ones, of every item
+CHILD_COUNTS_SQL = (
+    'SELECT parent.id, '
+    '(SELECT count(*) FROM todo_item AS child WHERE child.parent_id = parent.id) AS children, '
+    '(SELECT count(*) FROM todo_item AS child WHERE child.parent_id = parent.id '
+    'AND child.completed IS NOT 1) AS open_children '
+    'FROM todo_item AS parent'
+)
+CHILD_COUNTS_DIFFER_SQL = (
+    'counts.id = todo_item.id AND (todo_item.child_count != counts.children '
+    'OR todo_item.open_child_count != counts.open_children)'
+)
+
+
+def repair_child_counts(connection):
+    """
+    Recomputes the subtask counters that differ from the actual subtasks.
+
+    Args:
+        connection: A connection in a transaction.
+
+    Returns:
+        The number of items whose counters were repaired.
+    """
+    return connection.exec_driver_sql(
+        'UPDATE todo_item SET child_count = counts.children, open_child_count = counts.open_children '
+        f'FROM ({CHILD_COUNTS_SQL}) AS counts WHERE {CHILD_COUNTS_DIFFER_SQL}'
+    ).rowcount
+
+
+def wrong_child_counts(connection):
+    """
+    Finds the items whose subtask counters differ from their actual subtasks.
+
+    Args:
+        connection: A database connection.
+
+    Returns:
+        (id, child_count, open_child_count, children, open_children) rows, ordered by ID.
+    """
+    return connection.exec_driver_sql(
+        'SELECT todo_item.id, todo_item.child_count, todo_item.open_child_count, '
+        'counts.children, counts.open_children '
+        f'FROM todo_item JOIN ({CHILD_COUNTS_SQL}) AS counts ON {CHILD_COUNTS_DIFFER_SQL} '
+        'ORDER BY todo_item.id'
+    ).all()
+
+
+def add_child_counts(connection):
+    """Adds the subtask counters of items, counted from the existing subtasks."""
+    add_column(connection, 'todo_item', 'child_count', 'INTEGER NOT NULL DEFAULT 0')
+    add_column(connection, 'todo_item', 'open_child_count', 'INTEGER NOT NULL DEFAULT 0')
+    repair_child_counts(connection)
+
+
+def add_search_index(connection):
+    """Adds the full-text index of item contents behind GET /search, and indexes the existing items."""
+    search.create_index(connection)
+
+
+# Ordered (version, description, function) entries. Migrations must stay idempotent,
+# because databases created by db.create_all() may already contain parts of them.
+MIGRATIONS = [
+    (1, 'Add list and collection versions', add_versions),
+    (2, 'Add item revisions and tombstones', add_sync_tracking),
+    (3, 'Add hot-path indexes', add_hot_path_indexes),
+    (4, 'Add materialized item paths', add_item_paths),
+    (5, 'Add subtask counters', add_child_counts),
+    (6, 'Add item search index', add_search_index),
+]
+
+
+def current_version(connection):
+    """
+    Returns the latest migration applied to the database, or 0 if none is recorded.
+
+    Args:
+        connection: A database connection.
+    """
+    if not db.inspect(connection).has_table('schema_migrations'):
+        return 0
+    return connection.execute(db.select(db.func.max(schema_migrations.c.version))).scalar() or 0
+
+
+def upgrade(engine):
+    """
+    Applies every pending migration, each in its own transaction.
+
+    Args:
+        engine: The database engine.
+
+    Returns:
+        The (version, description) pairs of the applied migrations.
+    """
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        version = current_version(connection)
+
+    applied = []
+    for migration_version, description, migrate in MIGRATIONS:
+        if migration_version <= version:
+            continue
+        with engine.begin() as connection:
+            migrate(connection)
+            connection.execute(schema_migrations.insert().values(version=migration_version))
+        applied.append((migration_version, description))
+    return applied
+
+
+def stamp(engine):
+    """
+    Records every migration as applied, for databases created from the current models.
+
+    Args:
+        engine: The database engine.
+    """
+    with engine.begin() as connection:
+        schema_migrations.create(connection, checkfirst=True)
+        version = current_version(connection)
+        for migration_version, _, _ in MIGRATIONS:
+            if migration_version > version:
+                connection.execute(schema_migrations.insert().values(version=migration_version))
+
+
+def head():
+    """Returns the version of the latest migration."""
+    return MIGRATIONS[-1][0]
+
+
+db_cli = AppGroup('db', help='Manage the database schema.')
+
+
+@db_cli.command('upgrade')
+def upgrade_command():
+    """Upgrades the database to the latest schema version."""
+    applied = upgrade(db.engine)
+    for version, description in applied:
+        click.echo(f'Applied migration {version}: {description}')
+    click.echo(f'Database is at version {head()}')
+
+
+@db_cli.command('current')
+def current_command():
+    """Shows the schema version of the database."""
+    with db.engine.connect() as connection:
+        version = current_version(connection)
+    pending = head() - version
+    click.echo(f'Database is at version {version}' + (f' ({pending} pending)' if pending else ''))
+
+
+@db_cli.command('check-counts')
+@click.option('--repair', is_flag=True, help='Recompute the counters that are wrong.')
+def check_counts_command(repair):
+    """Verifies the subtask counters of every item against the actual subtasks."""
+    with db.engine.begin() as connection:
+        wrong = wrong_child_counts(connection)
+        for item_id, child_count, open_child_count, children, open_children in wrong:
+            click.echo(f'Item {item_id}: {child_count}/{open_child_count} subtasks/open recorded, '
+                       f'{children}/{open_children} actual')
+        if repair and wrong:
+            click.echo(f'Repaired {repair_child_counts(connection)} items')
+        elif not wrong:
+            click.echo('All subtask counters are correct')
+    if wrong and not repair:
+        raise click.exceptions.Exit(1)
+
+
+@db_cli.command('rebuild-search')
+def rebuild_search_command():
+    """Rebuilds the full-text search index from the contents of every item."""
+    with db.engine.begin() as connection:
+        search.rebuild_index(connection)
+    click.echo('Search index rebuilt')
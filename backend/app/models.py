@@ -1,15 +1,80 @@
-from . import db, login_manager  # Import database instance and login manager
+from . import db, login_manager, user_cache  # Import database instance, login manager and user cache
 from flask_login import UserMixin  # Import UserMixin for Flask-Login integration
 from datetime import datetime  # Import datetime for timestamps
+from sqlalchemy import event  # Import event to invalidate cached users on commit
+from sqlalchemy.orm import column_property  # Import column_property to track the previous completion status
+from sqlalchemy.orm.attributes import set_committed_value  # Import set_committed_value to refresh loaded counters
+from .tokens import InvalidToken, bearer_token, verify_token  # Import token helpers for bearer authentication
+
+
+class CachedUser(UserMixin):
+    """
+    Lightweight, read-only record of a user, kept in the user cache and used as current_user.
+    """
+
+    def __init__(self, id, username, email):
+        self.id = id
+        self.username = username
+        self.email = email
 
 
 @login_manager.user_loader
 def load_user(user_id):
     """
     User loader function for Flask-Login.
-    Loads a user object from the database given a user ID.
+    Returns the cached record of the user, loading it from the database on a miss.
     """
-    return User.query.get(int(user_id))
+    user_id = int(user_id)
+    record = user_cache.get(user_id)
+    if record is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        record = CachedUser(user.id, user.username, user.email)
+        user_cache.set(user_id, record)
+    return record
+
+
+@login_manager.request_loader
+def load_user_from_token(request):
+    """
+    Request loader function for Flask-Login, used when the request has no session.
+    Returns the user of a valid 'Authorization: Bearer <access token>' header, built from
+    the token's claims without touching the database, or None.
+    """
+    token = bearer_token(request)
+    if token is None:
+        return None
+    try:
+        claims = verify_token(token, 'access')
+    except InvalidToken:
+        return None
+    return CachedUser(int(claims['sub']), claims.get('username'), claims.get('email'))
+
+
+# Columns of a user whose change drops their cached record: the cached fields and the credentials
+CACHED_USER_FIELDS = ('username', 'email', 'password')
+
+
+@event.listens_for(db.session, 'before_flush')
+def track_changed_users(session, flush_context, instances):
+    """Remembers the users deleted, or whose CACHED_USER_FIELDS were updated, in the current transaction."""
+    changed = session.info.setdefault('changed_users', set())
+    changed.update(obj.id for obj in session.deleted if isinstance(obj, User))
+    changed.update(obj.id for obj in session.dirty if isinstance(obj, User) and any(
+        db.inspect(obj).attrs[name].history.has_changes() for name in CACHED_USER_FIELDS))
+
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_cached_users(session):
+    """Drops the cached records of the users the committed transaction changed."""
+    user_cache.invalidate(*session.info.pop('changed_users', ()))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_changed_users(session):
+    """Forgets the users changed by a transaction that was rolled back."""
+    session.info.pop('changed_users', None)
 
 
 class User(db.Model, UserMixin):
@@ -21,17 +86,23 @@ class User(db.Model, UserMixin):
     email = db.Column(db.String(120), unique=True, nullable=False)  # Unique email
     password = db.Column(db.String(60), nullable=False)  # Password hash
     lists = db.relationship('TodoList', backref='owner', lazy=True)  # Relationship with TodoList
+    lists_version = db.Column(db.Integer, nullable=False, default=1)  # Bumped whenever the user's lists change
 
 
 class TodoList(db.Model):
     """
     Represents a to-do list in the database.
     """
+    __table_args__ = (
+        db.Index('ix_todo_list_user_id_created_at', 'user_id', 'created_at', 'id'),  # Keyset pagination of GET /lists
+    )
+
     id = db.Column(db.Integer, primary_key=True)  # Primary key
     title = db.Column(db.String(100), nullable=False)  # Title of the list
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # Foreign key referencing the owner (User)
     items = db.relationship('TodoItem', backref='todo_list', lazy=True)  # Relationship with TodoItem
     created_at = db.Column(db.DateTime, default=datetime.utcnow)  # Creation timestamp
+    version = db.Column(db.Integer, nullable=False, default=1)  # Bumped whenever the list's item tree changes
 
 
 class TodoItem(db.Model):
@@ -39,9 +110,16 @@ class TodoItem(db.Model):
     Represents a to-do item in the database.
     Supports hierarchical structure (parent-child relationships).
     """
+    __table_args__ = (
+        db.Index('ix_todo_item_list_id_parent_id_created_at',
+                 'list_id', 'parent_id', 'created_at', 'id'),  # Top-level items of a list and their pagination
+        db.Index('ix_todo_item_parent_id_completed', 'parent_id', 'completed'),  # Counts of children and open subtasks
+        db.Index('ix_todo_item_path', 'path'),  # Descendants of an item, as a range of paths
+    )
+
     id = db.Column(db.Integer, primary_key=True)  # Primary key
     content = db.Column(db.String(200), nullable=False)  # Content of the item
-    completed = db.Column(db.Boolean, default=False)  # Completion status
+    completed = column_property(db.Column(db.Boolean, default=False), active_history=True)  # Completion status
     collapsed = db.Column(db.Boolean, default=False) # collapse status
     list_id = db.Column(db.Integer, db.ForeignKey('todo_list.id'), nullable=False)  # Foreign key referencing the list (TodoList)
     parent_id = db.Column(db.Integer, db.ForeignKey('todo_item.id'), nullable=True)  # Foreign key referencing the parent item (self-referential)
@@ -51,3 +129,101 @@ class TodoItem(db.Model):
                                cascade="all, delete-orphan")  # Cascade delete for children
     created_at = db.Column(db.DateTime, default=datetime.utcnow)  # Creation timestamp
     level = db.Column(db.Integer, default=1)  # Hierarchy level
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)  # Last modification timestamp
+    revision = db.Column(db.Integer, nullable=False, default=0)  # Version of the list at the item's last change
+    path = db.Column(db.String(255), nullable=False)  # IDs of the ancestors, root first: '/1/5/' ('/' at the top level)
+    child_count = db.Column(db.Integer, nullable=False, default=0)  # Number of direct subtasks
+    open_child_count = db.Column(db.Integer, nullable=False, default=0)  # Number of direct subtasks not completed
+
+
+@event.listens_for(TodoItem, 'before_insert')
+def set_item_path(mapper, connection, target):
+    """
+    Fills in the materialized path of an item inserted without one.
+
+    Uses the parent object when it is loaded, and reads the parent's path otherwise.
+    """
+    if target.path is not None:
+        return
+    parent = target.__dict__.get('parent')
+    if parent is not None:
+        target.path = f'{parent.path}{parent.id}/'
+    elif target.parent_id is not None:
+        parent_path = connection.scalar(db.select(TodoItem.path).where(TodoItem.id == target.parent_id))
+        target.path = f'{parent_path}{target.parent_id}/'
+    else:
+        target.path = '/'
+
+
+def adjust_child_counts(connection, session, parent_id, children=0, open_children=0):
+    """
+    Adds to the subtask counters of an item with a single UPDATE.
+
+    The same UPDATE stamps the item with the current version of its list and a new
+    updated_at, so GET /lists/<id>/changes sends its new counters to sync clients (the
+    caller has bumped the list's version already). The counters, revision and updated_at
+    of the item's object, if the session has it loaded, are updated too, so later
+    operations of the same transaction (e.g. in POST /batch) read the new values.
+
+    Args:
+        connection: The connection of the current transaction.
+        session: The current session.
+        parent_id: The ID of the item whose subtasks changed.
+        children: Change of the number of subtasks.
+        open_children: Change of the number of subtasks not completed.
+    """
+    stamped = connection.execute(db.update(TodoItem).where(TodoItem.id == parent_id).values(
+        child_count=TodoItem.child_count + children,
+        open_child_count=TodoItem.open_child_count + open_children,
+        revision=db.select(TodoList.version).where(TodoList.id == TodoItem.list_id).scalar_subquery(),
+        updated_at=datetime.utcnow()
+    ).returning(TodoItem.revision, TodoItem.updated_at)).first()
+    parent = session.identity_map.get(db.inspect(TodoItem).identity_key_from_primary_key((parent_id,)))
+    if parent is not None and stamped is not None:
+        for name, change in (('child_count', children), ('open_child_count', open_children)):
+            if name in parent.__dict__:
+                set_committed_value(parent, name, parent.__dict__[name] + change)
+        for name in ('revision', 'updated_at'):
+            if name in parent.__dict__:
+                set_committed_value(parent, name, getattr(stamped, name))
+
+
+@event.listens_for(TodoItem, 'after_insert')
+def count_inserted_child(mapper, connection, target):
+    """Counts a new subtask in its parent's counters."""
+    if target.parent_id is not None:
+        adjust_child_counts(connection, db.inspect(target).session, target.parent_id,
+                            1, 0 if target.completed else 1)
+
+
+@event.listens_for(TodoItem, 'after_update')
+def count_completed_child(mapper, connection, target):
+    """Updates the open subtask counter of the parent of an item whose completion status changed."""
+    history = db.inspect(target).attrs.completed.history
+    if target.parent_id is not None and history.deleted and bool(history.deleted[0]) != bool(target.completed):
+        adjust_child_counts(connection, db.inspect(target).session, target.parent_id,
+                            0, 1 if history.deleted[0] else -1)
+
+
+@event.listens_for(TodoItem, 'after_delete')
+def count_deleted_child(mapper, connection, target):
+    """Removes a deleted subtask from its parent's counters."""
+    if target.parent_id is not None:
+        adjust_child_counts(connection, db.inspect(target).session, target.parent_id,
+                            -1, 0 if target.completed else -1)
+
+
+class TodoItemTombstone(db.Model):
+    """
+    Records the deletion of a to-do item so clients syncing a list can drop it.
+    One row is written per deleted item, including every deleted subtask.
+    """
+    __table_args__ = (
+        db.Index('ix_todo_item_tombstone_list_id_revision', 'list_id', 'revision'),  # Deletions since a cursor
+    )
+
+    id = db.Column(db.Integer, primary_key=True)  # Primary key
+    item_id = db.Column(db.Integer, nullable=False)  # ID of the deleted item
+    list_id = db.Column(db.Integer, nullable=False)  # List whose tree the item was removed from
+    revision = db.Column(db.Integer, nullable=False)  # Version of the list at the deletion
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow)  # Deletion timestamp
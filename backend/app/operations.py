@@ -0,0 +1,808 @@
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import event
+from .models import db, User, TodoList, TodoItem, TodoItemTombstone, adjust_child_counts
+from flask import current_app
+from . import event_broker, tree_cache
+
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_cached_trees(session):
+    """Drops the cached trees of the lists whose version the committed transaction bumped."""
+    tree_cache.invalidate(*session.info.get('bumped_lists', ()))
+
+
+@event.listens_for(db.session, 'after_commit')
+def publish_events(session):
+    """Publishes the change events recorded by the committed transaction."""
+    for list_id, change in session.info.pop('events', ()):
+        event_broker.publish(list_id, change)
+
+
+@event.listens_for(db.session, 'after_transaction_end')
+def reset_bumped_versions(session, transaction):
+    """Forgets which versions were bumped, and the unpublished events, once the transaction ends."""
+    if transaction.parent is None:
+        session.info.pop('bumped_lists', None)
+        session.info.pop('bumped_users', None)
+        session.info.pop('events', None)
+
+
+def record_event(list_id, event_type, **fields):
+    """
+    Records a change event of a list, published to its event streams once the transaction commits.
+
+    Events of a transaction that is rolled back are never published.
+
+    Args:
+        list_id: The ID of the changed list.
+        event_type: The kind of change, e.g. 'item_created'.
+        fields: The data of the event.
+    """
+    db.session.info.setdefault('events', []).append((list_id, {'type': event_type, 'list_id': list_id, **fields}))
+
+
+def item_event_dict(item):
+    """Serializes an item for a change event: its fields without children, plus its parent_id."""
+    return dict(item_to_dict(item), parent_id=item.parent_id)
+
+
+def bump_list_versions(*list_ids):
+    """
+    Increments the version of the given lists, invalidating the ETags of their item trees.
+
+    Runs as a single UPDATE in the current transaction, so the new version is committed
+    together with the change it describes. Each list is bumped at most once per
+    transaction, however many of its items a request (e.g. POST /batch) changes.
+
+    Args:
+        list_ids: IDs of the lists whose item trees changed. None values are ignored.
+    """
+    bumped = db.session.info.setdefault('bumped_lists', set())
+    list_ids = {list_id for list_id in list_ids if list_id is not None} - bumped
+    if list_ids:
+        TodoList.query.filter(TodoList.id.in_(list_ids)).update(
+            {TodoList.version: TodoList.version + 1}, synchronize_session=False
+        )
+        bumped.update(list_ids)
+
+
+def bump_lists_version(user_id):
+    """
+    Increments the version of a user's list collection, invalidating the ETag of GET /lists.
+
+    Like bump_list_versions, it runs at most once per user and transaction.
+
+    Args:
+        user_id: The ID of the user whose lists changed.
+    """
+    bumped = db.session.info.setdefault('bumped_users', set())
+    if user_id not in bumped:
+        User.query.filter_by(id=user_id).update(
+            {User.lists_version: User.lists_version + 1}, synchronize_session=False
+        )
+        bumped.add(user_id)
+
+
+def list_revision(list_id):
+    """
+    Returns a SQL expression for the current version of a list.
+
+    Assigned to TodoItem.revision after bump_list_versions, so the item is stamped with
+    the list version that its change produced.
+
+    Args:
+        list_id: The ID of the list.
+    """
+    return db.select(TodoList.version).where(TodoList.id == list_id).scalar_subquery()
+
+
+def child_path(parent):
+    """
+    Returns the materialized path of a child of the given item.
+
+    Args:
+        parent: The parent TodoItem, or None for a top-level item.
+    """
+    return f'{parent.path}{parent.id}/' if parent is not None else '/'
+
+
+def descendants_of(item):
+    """
+    Builds a filter matching every descendant of an item.
+
+    Descendants are the items whose path starts with the item's child path. Paths only
+    contain digits and '/', which all sort before ':', so the prefix is an index range.
+
+    Args:
+        item: The TodoItem object.
+    """
+    prefix = child_path(item)
+    return db.and_(TodoItem.path >= prefix, TodoItem.path < prefix + ':')
+
+
+def subtree_of(item):
+    """
+    Builds a filter matching an item and all its descendants.
+
+    Args:
+        item: The TodoItem object.
+    """
+    return db.or_(TodoItem.id == item.id, descendants_of(item))
+
+
+def ancestor_ids(item):
+    """
+    Returns the IDs of an item's ancestors, from its top-level ancestor down to its parent.
+
+    Args:
+        item: The TodoItem object.
+    """
+    return [int(ancestor_id) for ancestor_id in item.path.strip('/').split('/') if ancestor_id]
+
+
+def list_tree_select(list_id):
+    """
+    Builds a SELECT of every item of a list's tree, ordered by ID.
+
+    Shared by the blueprint and the async views, which run it on different sessions.
+
+    Args:
+        list_id: The ID of the list.
+    """
+    return db.select(TodoItem).where(TodoItem.list_id == list_id).order_by(TodoItem.id)
+
+
+def subtrees_select(roots):
+    """
+    Builds a SELECT of the given items and all their descendants, ordered by ID.
+
+    Args:
+        roots: The TodoItem objects at the top of the subtrees.
+    """
+    return db.select(TodoItem).where(db.or_(*(subtree_of(root) for root in roots))).order_by(TodoItem.id)
+
+
+def stamp_subtree(item, list_id):
+    """
+    Stamps an item and all its descendants with the current version of a list.
+
+    Args:
+        item: The TodoItem at the top of the subtree.
+        list_id: The ID of the list whose tree now displays the subtree.
+    """
+    TodoItem.query.filter(subtree_of(item)).update(
+        {TodoItem.revision: list_revision(list_id)}, synchronize_session=False
+    )
+
+
+def record_deletions(item, list_id):
+    """
+    Writes tombstones for an item and all its descendants.
+
+    Must run before the rows themselves are deleted.
+
+    Args:
+        item: The TodoItem at the top of the subtree.
+        list_id: The ID of the list whose tree the subtree is removed from.
+    """
+    db.session.execute(db.insert(TodoItemTombstone).from_select(
+        ['item_id', 'list_id', 'revision'],
+        db.select(TodoItem.id, db.literal(list_id), list_revision(list_id)).where(subtree_of(item))
+    ))
+
+
+def delete_subtree(item):
+    """
+    Deletes an item and all its descendants with a single DELETE over their path range.
+
+    The descendants are not loaded; objects of the subtree already in the session are
+    marked as deleted from the IDs the statement returns. The bulk DELETE skips the ORM
+    events, so the item is removed from its parent's subtask counters here.
+
+    Args:
+        item: The TodoItem object at the top of the subtree.
+    """
+    TodoItem.query.filter(subtree_of(item)).delete(synchronize_session='fetch')
+    if item.parent_id is not None:
+        adjust_child_counts(db.session.connection(), db.session, item.parent_id, -1, 0 if item.completed else -1)
+
+
+def delete_list_items(list_id):
+    """
+    Deletes every item of a list's tree with a single DELETE.
+
+    Args:
+        list_id: The ID of the list.
+    """
+    TodoItem.query.filter_by(list_id=list_id).delete(synchronize_session=False)
+
+
+def load_item_tree(list_id):
+    """
+    Loads every item of a list's tree in a single query.
+
+    Args:
+        list_id: The ID of the list.
+
+    Returns:
+        A flat list of TodoItem objects ordered by ID.
+    """
+    return db.session.scalars(list_tree_select(list_id)).all()
+
+
+def item_to_dict(item):
+    """
+    Serializes the fields of a todo item, without its children.
+
+    Args:
+        item: The TodoItem object.
+
+    Returns:
+        A dictionary representation of the item.
+    """
+    return {
+        'id': item.id,
+        'content': item.content,
+        'completed': item.completed,
+        'collapsed': item.collapsed,
+        'level': item.level,
+        'created_at': item.created_at,
+        'child_count': item.child_count,
+        'open_child_count': item.open_child_count
+    }
+
+
+def load_subtrees(roots):
+    """
+    Loads the given items and all their descendants in a single query.
+
+    Args:
+        roots: The TodoItem objects at the top of the subtrees.
+
+    Returns:
+        A flat list of TodoItem objects ordered by ID.
+    """
+    if not roots:
+        return []
+    return db.session.scalars(subtrees_select(roots)).all()
+
+
+def serialize_item_tree(items, roots=None):
+    """
+    Builds the nested JSON structure of a list from a flat list of items.
+
+    Children are grouped by parent_id in memory, so no relationship is lazy loaded.
+
+    Args:
+        items: A flat list of TodoItem objects, as returned by load_item_tree.
+        roots: The top-level items to serialize, in order. Defaults to every item of
+            items without a parent, ordered by ID.
+
+    Returns:
+        A list of dictionaries for the top-level items, each with its nested children.
+    """
+    children_by_parent = defaultdict(list)
+    for item in items:
+        children_by_parent[item.parent_id].append(item)
+
+    def serialize_item(item):
+        """
+        Recursively serializes a todo item and its children.
+
+        Args:
+            item: The TodoItem object.
+
+        Returns:
+            A dictionary representation of the item and its children.
+        """
+        serialized = item_to_dict(item)
+        serialized['children'] = [serialize_item(child) for child in children_by_parent[item.id]]
+        return serialized
+
+    if roots is None:
+        roots = children_by_parent[None]
+    return [serialize_item(item) for item in roots]
+
+
+def list_to_dict(todo_list, stats=None):
+    """
+    Serializes the fields of a todo list.
+
+    Args:
+        todo_list: The TodoList object.
+        stats: Optional item totals of the list, as built by list_stats, added as 'stats'.
+
+    Returns:
+        A dictionary representation of the list.
+    """
+    serialized = {
+        'id': todo_list.id,
+        'title': todo_list.title,
+        'created_at': todo_list.created_at
+    }
+    if stats is not None:
+        serialized['stats'] = stats
+    return serialized
+
+
+def list_stats_select(list_ids):
+    """
+    Builds a SELECT of the item totals of the given lists, with one GROUP BY over their items.
+
+    Every item of a tree shares the list of its top-level item, so grouping by list_id
+    counts whole trees. Lists without items have no row.
+
+    Args:
+        list_ids: The IDs of the lists.
+    """
+    return db.select(
+        TodoItem.list_id,
+        db.func.count(),
+        db.func.count().filter(TodoItem.completed.is_(True)),
+        db.func.count().filter(TodoItem.parent_id.is_(None))
+    ).where(TodoItem.list_id.in_(list_ids)).group_by(TodoItem.list_id)
+
+
+def list_stats(lists, rows):
+    """
+    Builds the item totals of each list from the rows of list_stats_select.
+
+    Args:
+        lists: The TodoList objects the rows were selected for.
+        rows: The (list_id, items, completed, top-level) rows.
+
+    Returns:
+        A dictionary of {'item_count', 'completed_count', 'top_level_count'} dictionaries by list ID.
+    """
+    stats = {todo_list.id: {'item_count': 0, 'completed_count': 0, 'top_level_count': 0} for todo_list in lists}
+    for list_id, items, completed, top_level in rows:
+        stats[list_id] = {'item_count': items, 'completed_count': completed, 'top_level_count': top_level}
+    return stats
+
+
+# Write operations. Each one applies a change to the current transaction without
+# committing it and returns a (JSON body, status code) pair, so the single-item routes
+# and POST /batch share the same behaviour. Ownership of the list or item passed in
+# must already have been checked by the caller.
+
+def create_list(user_id, data):
+    """
+    Creates a new todo list.
+
+    Args:
+        user_id: The ID of the owner.
+        data: Request data with the list title.
+
+    Returns:
+        The created list data and 201.
+    """
+    new_list = TodoList(
+        title=data['title'],
+        user_id=user_id
+    )
+    db.session.add(new_list)
+    bump_lists_version(user_id)
+    db.session.flush()
+    return list_to_dict(new_list), 201
+
+
+def rename_list(todo_list, data):
+    """
+    Changes the title of a todo list.
+
+    Args:
+        todo_list: The TodoList object.
+        data: Request data with the new title.
+
+    Returns:
+        The updated list data and 200.
+    """
+    todo_list.title = data['title']
+    bump_lists_version(todo_list.user_id)
+    record_event(todo_list.id, 'list_updated', list=list_to_dict(todo_list))
+    return list_to_dict(todo_list), 200
+
+
+def create_item(todo_list, data):
+    """
+    Creates a new todo item in a list.
+
+    A subtask joins its parent's tree, so it takes the list of its parent.
+
+    Args:
+        todo_list: The TodoList object.
+        data: Request data with the item content and optional parent ID.
+
+    Returns:
+        The created item data and 201, or an error and 400 if the parent does not exist,
+        belongs to someone else, or the maximum nesting level is reached.
+    """
+    parent_id = data.get('parent_id')
+
+    # Calculate level based on parent
+    level = 1
+    parent = None
+    if parent_id:
+        parent = db.session.get(TodoItem, parent_id)
+        if parent is None or parent.todo_list.user_id != todo_list.user_id:
+            return {'error': 'Parent item not found'}, 400
+        level = parent.level + 1
+        if level > current_app.config['MAX_NESTING_LEVEL']:
+            return {'error': 'Maximum nesting level reached'}, 400
+
+    list_id = parent.list_id if parent else todo_list.id
+    bump_list_versions(list_id)
+    new_item = TodoItem(
+        content=data['content'],
+        list_id=list_id,
+        parent_id=parent_id,
+        level=level,
+        path=child_path(parent),
+        revision=list_revision(list_id)
+    )
+    db.session.add(new_item)
+    db.session.flush()
+    record_event(list_id, 'item_created', item=item_event_dict(new_item))
+    return item_to_dict(new_item), 201
+
+
+def update_item(item, data, user_id):
+    """
+    Updates the status, content or list of a todo item.
+
+    Only top-level items can move to another list, and their subtasks move with them.
+    Moving to a list that does not exist or belongs to someone else, or moving a subtask,
+    is ignored.
+
+    Args:
+        item: The TodoItem object.
+        data: Request data with the fields to change.
+        user_id: The ID of the current user.
+
+    Returns:
+        The updated item data and 200.
+    """
+    if 'completed' in data:
+        item.completed = data['completed']
+
+    if 'collapsed' in data:
+        item.collapsed = data['collapsed']
+
+    if 'content' in data:
+        item.content = data['content']
+
+    # Handle moving a top-level item, with its subtree, to a different list
+    old_list_id = item.list_id
+    new_list_id = data.get('list_id')
+    if new_list_id and new_list_id != item.list_id and item.parent_id is None:
+        new_list = db.session.get(TodoList, new_list_id)
+        if new_list and new_list.user_id == user_id:
+            item.list_id = new_list_id
+
+    bump_list_versions(old_list_id, item.list_id)
+    if item.list_id != old_list_id:
+        # The whole subtree left the old list's tree and joined the new one
+        record_deletions(item, old_list_id)
+        TodoItem.query.filter(descendants_of(item)).update(
+            {TodoItem.list_id: item.list_id}, synchronize_session=False
+        )
+        stamp_subtree(item, item.list_id)
+    else:
+        item.revision = list_revision(item.list_id)
+    db.session.flush()
+    if item.list_id != old_list_id:
+        for list_id in (old_list_id, item.list_id):
+            record_event(list_id, 'item_moved', item_id=item.id, from_list_id=old_list_id, to_list_id=item.list_id)
+    else:
+        record_event(item.list_id, 'item_updated', item=item_event_dict(item))
+    return item_to_dict(item), 200
+
+
+def delete_item(item):
+    """
+    Deletes a todo item and its subtasks.
+
+    Args:
+        item: The TodoItem object.
+
+    Returns:
+        A success message and 200.
+    """
+    bump_list_versions(item.list_id)
+    record_deletions(item, item.list_id)
+    delete_subtree(item)
+    db.session.flush()
+    record_event(item.list_id, 'item_deleted', item_id=item.id)
+    return {'message': 'Item and all subtasks deleted successfully'}, 200
+
+
+def complete_item(item):
+    """
+    Marks a todo item as complete, deleting it if it is a top-level task.
+
+    Args:
+        item: The TodoItem object.
+
+    Returns:
+        A success message and 200, or an error and 400 if the item has uncompleted subtasks.
+    """
+    # Check for uncompleted subtasks
+    if item.open_child_count > 0:
+        return {
+            'error': 'Cannot complete this task. Some subtasks are not finished.',
+            'uncompleted_subtasks': item.open_child_count
+        }, 400
+
+    bump_list_versions(item.list_id)
+    deleted = item.level == 1
+    if deleted:  # Delete completed top-level tasks
+        record_deletions(item, item.list_id)
+        delete_subtree(item)
+    else:
+        item.completed = True
+        item.revision = list_revision(item.list_id)
+    db.session.flush()
+    if deleted:
+        record_event(item.list_id, 'item_deleted', item_id=item.id)
+    else:
+        record_event(item.list_id, 'item_updated', item=item_event_dict(item))
+    return {
+        'message': 'Task completed successfully',
+        'deleted': deleted
+    }, 200
+
+
+def import_items(todo_list, data, max_items):
+    """
+    Inserts a nested tree of new items into a list.
+
+    The tree is validated first, then inserted one level at a time with a single
+    multi-row INSERT ... RETURNING per level, so the IDs of a level become the parent IDs
+    of the next without flushing individual ORM objects.
+
+    Args:
+        todo_list: The TodoList object.
+        data: Request data with 'items', a list of {content, completed, children} nodes, and
+            an optional 'parent_id' to import the tree under an existing item.
+        max_items: Maximum number of items accepted in one import.
+
+    Returns:
+        The number of imported items and the IDs of the imported top-level nodes with 201,
+        or an error and 400 if the tree is malformed, too large or too deep.
+    """
+    if not isinstance(data, dict):
+        return {'error': 'Missing items'}, 400
+    nodes = data.get('items')
+    parent_id = data.get('parent_id')
+    if not isinstance(nodes, list) or not nodes:
+        return {'error': 'Missing items'}, 400
+
+    level = 1
+    parent = None
+    if parent_id:
+        parent = db.session.get(TodoItem, parent_id)
+        if parent is None or parent.todo_list.user_id != todo_list.user_id:
+            return {'error': 'Parent item not found'}, 400
+        level = parent.level + 1
+
+    # Validate the whole tree before writing anything. Each level holds
+    # (node, index of its parent in the previous level) pairs.
+    levels = []
+    current = [(node, None) for node in nodes]
+    count = 0
+    while current:
+        if level + len(levels) > current_app.config['MAX_NESTING_LEVEL']:
+            return {'error': 'Maximum nesting level reached'}, 400
+        count += len(current)
+        if count > max_items:
+            return {'error': 'Too many items'}, 400
+        next_level = []
+        for index, (node, _) in enumerate(current):
+            if not isinstance(node, dict) or not isinstance(node.get('content'), str) or not node['content']:
+                return {'error': 'Every item needs a content'}, 400
+            children = node.get('children', [])
+            if not isinstance(children, list):
+                return {'error': 'Item children must be a list'}, 400
+            next_level.extend((child, index) for child in children)
+        levels.append(current)
+        current = next_level
+
+    list_id = parent.list_id if parent else todo_list.id
+    bump_list_versions(list_id)
+    revision = db.session.scalar(db.select(TodoList.version).where(TodoList.id == list_id))
+
+    if parent:
+        adjust_child_counts(db.session.connection(), db.session, parent.id, len(nodes),
+                            sum(not node.get('completed', False) for node in nodes))
+
+    parent_ids = parent_paths = None
+    root_ids = []
+    for depth, level_nodes in enumerate(levels):
+        # The bulk INSERT skips the ORM events, so every row carries its subtask counters
+        rows = [{
+            'content': node['content'],
+            'completed': bool(node.get('completed', False)),
+            'collapsed': False,
+            'list_id': list_id,
+            'parent_id': parent_ids[parent_index] if depth else parent_id,
+            'level': level + depth,
+            'path': f'{parent_paths[parent_index]}{parent_ids[parent_index]}/' if depth else child_path(parent),
+            'revision': revision,
+            'child_count': len(node.get('children', [])),
+            'open_child_count': sum(not child.get('completed', False) for child in node.get('children', []))
+        } for node, parent_index in level_nodes]
+        # RETURNING does not promise any row order, and asking SQLAlchemy to sort makes it
+        # insert row by row. New rows get ascending IDs in VALUES order, so sort the IDs instead.
+        parent_ids = sorted(db.session.scalars(db.insert(TodoItem).returning(TodoItem.id), rows))
+        parent_paths = [row['path'] for row in rows]
+        if depth == 0:
+            root_ids = parent_ids
+
+    record_event(list_id, 'items_imported', parent_id=parent_id, ids=root_ids, count=count)
+    return {'imported': count, 'ids': root_ids}, 201
+
+
+def recount_children(list_ids):
+    """
+    Recomputes the subtask counters of every item of the given lists with a single UPDATE.
+
+    Args:
+        list_ids: The IDs of the lists.
+    """
+    child = db.aliased(TodoItem)
+    children = db.select(db.func.count()).where(child.parent_id == TodoItem.id)
+    TodoItem.query.filter(TodoItem.list_id.in_(list_ids)).update({
+        TodoItem.child_count: children.scalar_subquery(),
+        TodoItem.open_child_count: children.where(child.completed.isnot(True)).scalar_subquery()
+    }, synchronize_session=False)
+
+
+def export_records(user_id, batch_size):
+    """
+    Yields the export records of every list, then every item, of a user.
+
+    Rows are read through a cursor in batches of batch_size, so memory use does not grow
+    with the amount of data. Items are ordered by ID, so each one comes after its parent.
+
+    Args:
+        user_id: The ID of the user.
+        batch_size: Number of rows fetched at a time.
+
+    Yields:
+        {'type': 'list', ...} and {'type': 'item', ...} dictionaries, with ISO 8601 dates.
+    """
+    lists = db.session.execute(
+        db.select(TodoList.id, TodoList.title, TodoList.created_at)
+        .where(TodoList.user_id == user_id).order_by(TodoList.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in lists:
+        yield {'type': 'list', 'id': row.id, 'title': row.title,
+               'created_at': row.created_at.isoformat() if row.created_at else None}
+
+    items = db.session.execute(
+        db.select(TodoItem.id, TodoItem.list_id, TodoItem.parent_id, TodoItem.content, TodoItem.completed,
+                  TodoItem.collapsed, TodoItem.created_at)
+        .join(TodoList, TodoList.id == TodoItem.list_id)
+        .where(TodoList.user_id == user_id).order_by(TodoItem.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in items:
+        yield {'type': 'item', 'id': row.id, 'list_id': row.list_id, 'parent_id': row.parent_id,
+               'content': row.content, 'completed': bool(row.completed), 'collapsed': bool(row.collapsed),
+               'created_at': row.created_at.isoformat() if row.created_at else None}
+
+
+def import_records(user_id, records, batch_size):
+    """
+    Inserts the lists and items of an export into a user's account, as new lists.
+
+    Records are consumed as they come and inserted with one multi-row INSERT ... RETURNING
+    per batch_size records (per batch and level for items whose parent is in the same
+    batch); only the new IDs of the imported lists and items are kept in memory. IDs in the
+    records are the exported ones and are mapped to the new ones. Levels and paths are
+    computed from the parents, and the nesting limit of create_item applies.
+
+    Args:
+        user_id: The ID of the user.
+        records: An iterable of (line number, record) pairs, in export order. It may raise
+            ValueError for a malformed line.
+        batch_size: Number of records inserted per statement.
+
+    Returns:
+        The number of imported lists and items and 201, or an error and 400 if a record is
+        malformed or refers to a list or parent that was not imported before it.
+    """
+    new_lists = {}  # Exported list ID -> new list ID
+    new_items = {}  # Exported item ID -> (new ID, path, level, new list ID)
+    pending_lists, pending_items, pending_ids = [], [], set()
+
+    def parse_date(line_number, value):
+        try:
+            return datetime.fromisoformat(value) if value else datetime.utcnow()
+        except (TypeError, ValueError):
+            raise ValueError(f'Line {line_number}: invalid created_at')
+
+    def insert_lists():
+        rows = [{'title': record['title'], 'user_id': user_id,
+                 'created_at': parse_date(line_number, record.get('created_at'))}
+                for line_number, record in pending_lists]
+        # New rows get ascending IDs in VALUES order, as in import_items
+        ids = sorted(db.session.scalars(db.insert(TodoList).returning(TodoList.id), rows))
+        new_lists.update(zip((record['id'] for _, record in pending_lists), ids))
+        pending_lists.clear()
+
+    def insert_items():
+        remaining = list(pending_items)
+        while remaining:
+            # Items whose parent is already inserted go first, the others wait for the next round
+            ready = [entry for entry in remaining
+                     if entry[1].get('parent_id') is None or entry[1]['parent_id'] in new_items]
+            if not ready:
+                raise ValueError(f'Line {remaining[0][0]}: unknown parent_id')
+            rows = []
+            for line_number, record in ready:
+                if record.get('parent_id') is None:
+                    if record['list_id'] not in new_lists:
+                        raise ValueError(f'Line {line_number}: unknown list_id')
+                    list_id, path, level = new_lists[record['list_id']], '/', 1
+                else:
+                    parent_id, parent_path, parent_level, list_id = new_items[record['parent_id']]
+                    path, level = f'{parent_path}{parent_id}/', parent_level + 1
+                if level > current_app.config['MAX_NESTING_LEVEL']:
+                    raise ValueError(f'Line {line_number}: maximum nesting level reached')
+                rows.append({
+                    'content': record['content'],
+                    'completed': bool(record.get('completed', False)),
+                    'collapsed': bool(record.get('collapsed', False)),
+                    'list_id': list_id,
+                    'parent_id': new_items[record['parent_id']][0] if level > 1 else None,
+                    'level': level,
+                    'path': path,
+                    'created_at': parse_date(line_number, record.get('created_at'))
+                })
+            ids = sorted(db.session.scalars(db.insert(TodoItem).returning(TodoItem.id), rows))
+            for (_, record), row, item_id in zip(ready, rows, ids):
+                new_items[record['id']] = (item_id, row['path'], row['level'], row['list_id'])
+            remaining = [entry for entry in remaining if entry[1]['id'] not in new_items]
+        pending_items.clear()
+        pending_ids.clear()
+
+    try:
+        for line_number, record in records:
+            kind = record.get('type') if isinstance(record, dict) else None
+            if kind == 'list':
+                if not isinstance(record.get('id'), int) or not isinstance(record.get('title'), str):
+                    raise ValueError(f'Line {line_number}: a list needs an id and a title')
+                pending_lists.append((line_number, record))
+                if len(pending_lists) >= batch_size:
+                    insert_lists()
+            elif kind == 'item':
+                if (not isinstance(record.get('id'), int) or not isinstance(record.get('list_id'), int)
+                        or not isinstance(record.get('content'), str) or not record['content']):
+                    raise ValueError(f'Line {line_number}: an item needs an id, a list_id and a content')
+                if record.get('parent_id') is not None and not isinstance(record['parent_id'], int):
+                    raise ValueError(f'Line {line_number}: invalid parent_id')
+                if record['id'] in new_items or record['id'] in pending_ids:
+                    raise ValueError(f'Line {line_number}: duplicate item id')
+                if pending_lists:
+                    insert_lists()
+                pending_items.append((line_number, record))
+                pending_ids.add(record['id'])
+                if len(pending_items) >= batch_size:
+                    insert_items()
+            else:
+                raise ValueError(f'Line {line_number}: unknown record type')
+        if pending_lists:
+            insert_lists()
+        if pending_items:
+            insert_items()
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    if new_lists:
+        # The bulk INSERTs skip the ORM events, so the counters are computed once at the end
+        recount_children(list(new_lists.values()))
+        bump_lists_version(user_id)
+    return {'lists': len(new_lists), 'items': len(new_items)}, 201
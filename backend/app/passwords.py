@@ -0,0 +1,88 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+from flask import current_app
+
+
+class HasherBusy(Exception):
+    """Raised when the password hashing pool and its queue are full."""
+
+
+class HashingPool:
+    """
+    A bounded thread pool for bcrypt work with admission control.
+
+    At most 'workers' hashes run at once and at most 'queue_size' more wait for a worker;
+    anything beyond that is rejected immediately instead of piling up behind the request
+    threads. bcrypt releases the GIL while hashing, so the workers run in parallel.
+    """
+
+    def __init__(self, workers, queue_size):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='bcrypt')
+        self.slots = BoundedSemaphore(workers + queue_size)
+        self.rejected = 0
+
+    def run(self, func, *args):
+        """
+        Runs func(*args) on the pool and waits for its result.
+
+        Raises:
+            HasherBusy: If every worker and queue slot is taken.
+        """
+        if not self.slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy()
+        try:
+            future = self.executor.submit(func, *args)
+        except BaseException:
+            self.slots.release()
+            raise
+        future.add_done_callback(lambda _: self.slots.release())
+        return future.result()
+
+
+class PasswordHasher:
+    """
+    Flask extension hashing and checking passwords with bcrypt on a bounded worker pool.
+
+    The cost factor comes from BCRYPT_LOG_ROUNDS; the pool from PASSWORD_HASH_WORKERS and
+    PASSWORD_HASH_QUEUE_SIZE.
+    """
+
+    def init_app(self, app, bcrypt):
+        """Creates the app's hashing pool around the given Flask-Bcrypt extension."""
+        self.bcrypt = bcrypt
+        app.extensions['password_hasher'] = HashingPool(
+            app.config['PASSWORD_HASH_WORKERS'],
+            app.config['PASSWORD_HASH_QUEUE_SIZE']
+        )
+
+    @property
+    def pool(self):
+        return current_app.extensions['password_hasher']
+
+    def hash(self, password):
+        """
+        Hashes a password with the configured cost factor.
+
+        Raises:
+            HasherBusy: If the hashing pool is full.
+        """
+        rounds = current_app.config['BCRYPT_LOG_ROUNDS']
+        return self.pool.run(self.bcrypt.generate_password_hash, password, rounds).decode('utf-8')
+
+    def check(self, password_hash, password):
+        """
+        Checks a password against a stored hash.
+
+        Raises:
+            HasherBusy: If the hashing pool is full.
+        """
+        return self.pool.run(self.bcrypt.check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """Returns True if a stored hash was made with a different cost factor than the configured one."""
+        try:
+            rounds = int(password_hash.split('$')[2])
+        except (IndexError, ValueError):
+            return True
+        return rounds != current_app.config['BCRYPT_LOG_ROUNDS']
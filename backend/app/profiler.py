@@ -0,0 +1,153 @@
+import cProfile
+import json
+import os
+import pstats
+import time
+from datetime import datetime
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+HEADER = 'X-Profile'
+SORT_KEYS = ('cumulative', 'tottime', 'calls')
+TOP_FUNCTIONS = 50
+
+
+def profile_requested():
+    """
+    Returns the sort key a request asks its profile to be ordered by, or None if it asks for none.
+
+    A request is profiled when it has an X-Profile header or a 'profile' query parameter;
+    '1' or 'true' orders by cumulative time, or the value may be one of SORT_KEYS.
+    """
+    value = request.headers.get(HEADER) or request.args.get('profile')
+    if not value or value.lower() in ('0', 'false'):
+        return None
+    return value if value in SORT_KEYS else 'cumulative'
+
+
+def function_stats(profile, sort_key, limit):
+    """Returns the limit most expensive functions of a profile, as dictionaries, ordered by sort_key."""
+    stats = pstats.Stats(profile)
+    stats.sort_stats(sort_key)
+    functions = []
+    for function in stats.fcn_list[:limit]:
+        primitive_calls, calls, total_time, cumulative_time, callers = stats.stats[function]
+        filename, line, name = function
+        functions.append({
+            'function': name if filename == '~' else f'{filename}:{line}({name})',
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'tottime_ms': round(total_time * 1000, 3),
+            'cumtime_ms': round(cumulative_time * 1000, 3)
+        })
+    return functions
+
+
+def parameter_types(parameters, executemany):
+    """
+    Describes the bound parameters of a statement by their types, e.g. ['int', 'str'].
+
+    Values are left out, so profiles never hold password hashes, token hashes or item
+    contents. For an executemany statement, the types are those of its first row.
+    """
+    row = (parameters[0] if parameters else ()) if executemany else parameters
+    values = row.values() if isinstance(row, dict) else row or ()
+    return [type(value).__name__ for value in values]
+
+
+class Profiler:
+    """
+    Flask extension running the requests that ask for it under cProfile.
+
+    Meant for development and staging: with PROFILER_ENABLED=0, the default, nothing is
+    installed and requests run exactly as without it. When enabled, a request with an
+    X-Profile header or a 'profile' query parameter is profiled from its first before_request
+    function to its last after_request one, so the view, its lazy loads and the encoding
+    of its JSON body are included, along with every SQL statement it executes and its
+    duration. The profile replaces the response, as JSON that keeps the original status in
+    'status'; if PROFILER_DIR is set, it is saved there instead (with the raw .prof file,
+    for tools like snakeviz), the response is left as it is and its X-Profile-File header
+    names the file. Statements are recorded with the types of their parameters, not their
+    values.
+    """
+
+    def init_app(self, app, db):
+        """Installs the request hooks and the engine listeners, if PROFILER_ENABLED is set."""
+        if not app.config['PROFILER_ENABLED']:
+            return
+        app.extensions['profiler'] = app.config['PROFILER_DIR']
+        # Registered so they run first and last, and the profile covers the other request hooks
+        app.before_request_funcs.setdefault(None, []).insert(0, self.start)
+        app.after_request_funcs.setdefault(None, []).insert(0, self.finish)
+        app.teardown_request(self.stop)
+        with app.app_context():
+            engine = db.engine
+        event.listen(engine, 'before_cursor_execute', self.start_statement)
+        event.listen(engine, 'after_cursor_execute', self.record_statement)
+
+    @staticmethod
+    def start():
+        sort_key = profile_requested()
+        if sort_key is None:
+            return
+        g.profile = {'sort_key': sort_key, 'statements': [], 'started': time.perf_counter()}
+        g.profile['profiler'] = profiler = cProfile.Profile()
+        profiler.enable()
+
+    @staticmethod
+    def stop(exception=None):
+        """Stops the profiler of a request that ended before finish ran, e.g. on an unhandled exception."""
+        profile = g.pop('profile', None)
+        if profile is not None:
+            profile['profiler'].disable()
+
+    def finish(self, response):
+        """Stops the request's profiler and attaches the profile to the response; an after_request function."""
+        profile = g.pop('profile', None)
+        if profile is None:
+            return response
+        profile['profiler'].disable()
+        duration = time.perf_counter() - profile['started']
+        statements = profile['statements']
+        report = {
+            'method': request.method,
+            'path': request.full_path.rstrip('?'),
+            'endpoint': request.endpoint,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'sql_count': len(statements),
+            'sql_ms': round(sum(statement['duration_ms'] for statement in statements), 3),
+            'sql': statements,
+            'sort_key': profile['sort_key'],
+            'functions': function_stats(profile['profiler'], profile['sort_key'], TOP_FUNCTIONS)
+        }
+
+        directory = current_app.extensions['profiler']
+        if not directory:
+            profiled = current_app.json.response(report)
+            for key, value in response.headers:
+                if key not in ('Content-Type', 'Content-Length', 'ETag'):
+                    profiled.headers.add(key, value)
+            return profiled
+        os.makedirs(directory, exist_ok=True)
+        name = f"{datetime.utcnow():%Y%m%dT%H%M%S.%f}-{request.endpoint or 'unmatched'}"
+        profile['profiler'].dump_stats(os.path.join(directory, f'{name}.prof'))
+        with open(os.path.join(directory, f'{name}.json'), 'w') as file:
+            json.dump(report, file, indent=2)
+        response.headers['X-Profile-File'] = f'{name}.json'
+        return response
+
+    @staticmethod
+    def start_statement(conn, cursor, statement, parameters, context, executemany):
+        conn.info['profile_statement_started'] = time.perf_counter()
+
+    @staticmethod
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('profile_statement_started', None)
+        profile = g.get('profile') if started is not None and has_app_context() else None
+        if profile is not None:
+            profile['statements'].append({
+                'statement': statement,
+                'parameters': parameter_types(parameters, executemany),
+                'duration_ms': round((time.perf_counter() - started) * 1000, 3)
+            })
@@ -0,0 +1,121 @@
+from contextlib import contextmanager
+from functools import wraps
+from threading import get_ident
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+
+MODES = ('off', 'log', 'raise')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a block or a view executes more SQL statements than its budget allows."""
+
+    def __init__(self, name, max_statements, statements):
+        listing = '\n'.join(f'  {index}. {statement}' for index, statement in enumerate(statements, 1))
+        super().__init__(f'{name} executed {len(statements)} SQL statements, over its budget of '
+                         f'{max_statements}:\n{listing}')
+        self.max_statements = max_statements
+        self.statements = statements
+
+
+class StatementCounter:
+    """
+    Context manager collecting the SQL statements an engine executes in the current thread.
+
+    Listens to the engine only while the block runs, so it suits tests and scripts; the
+    views' budgets use QueryBudget's permanent listener instead.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self.thread = None
+
+    def __enter__(self):
+        self.thread = get_ident()
+        event.listen(self.engine, 'before_cursor_execute', self.record)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if get_ident() == self.thread:
+            self.statements.append(statement)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def assert_max_queries(engine, max_statements, name='Block'):
+    """
+    Raises QueryBudgetExceeded, listing the statements, if the block executes more than max_statements.
+
+    Yields the StatementCounter, e.g.:
+        with assert_max_queries(db.engine, 3) as counter:
+            client.get('/lists')
+    """
+    with StatementCounter(engine) as counter:
+        yield counter
+    if counter.count > max_statements:
+        raise QueryBudgetExceeded(name, max_statements, counter.statements)
+
+
+class QueryBudget:
+    """
+    Flask extension checking the number of SQL statements views execute against their declared budget.
+
+    Views declare their budget with the limit decorator. QUERY_BUDGET_MODE selects what
+    happens when a view exceeds it: 'log' writes a warning to the app logger, 'raise'
+    raises QueryBudgetExceeded once the view returns (the test suite runs in this mode),
+    and 'off' installs nothing, so the decorator only costs a dictionary lookup.
+    """
+
+    def init_app(self, app, db):
+        """Records the app's mode and, unless it is 'off', installs the engine listener."""
+        mode = app.config['QUERY_BUDGET_MODE']
+        if mode not in MODES:
+            raise ValueError(f'Unknown QUERY_BUDGET_MODE {mode!r}, expected one of {MODES}')
+        app.extensions['query_budget'] = mode
+        if mode != 'off':
+            with app.app_context():
+                engine = db.engine
+            event.listen(engine, 'before_cursor_execute', self.record_statement)
+
+    @staticmethod
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        # Each thread has its own app context, so a budget only sees its own thread's statements
+        if has_app_context():
+            for statements in g.get('query_budgets', ()):
+                statements.append(statement)
+
+    def limit(self, max_statements):
+        """
+        Decorator declaring the most SQL statements a view may execute.
+
+        Place it under login_required, so the budget covers the view itself and not the
+        loading of the current user.
+        """
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                mode = current_app.extensions['query_budget']
+                if mode == 'off':
+                    return view(*args, **kwargs)
+                statements = []
+                budgets = g.setdefault('query_budgets', [])
+                budgets.append(statements)
+                try:
+                    response = view(*args, **kwargs)
+                finally:
+                    budgets.pop()
+                if len(statements) > max_statements:
+                    if mode == 'raise':
+                        raise QueryBudgetExceeded(request.endpoint, max_statements, statements)
+                    current_app.logger.warning('%s executed %d SQL statements, over its budget of %d',
+                                               request.endpoint, len(statements), max_statements)
+                return response
+            return wrapper
+        return decorator
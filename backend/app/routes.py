@@ -1,15 +1,203 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, make_response, current_app, stream_with_context
 from flask_login import login_user, logout_user, login_required, current_user
-from .models import db, User, TodoList, TodoItem
+from .models import db, User, TodoList, TodoItem, TodoItemTombstone
+from .operations import load_item_tree, load_subtrees, item_to_dict, list_to_dict, serialize_item_tree
 from flask_cors import cross_origin
-from . import bcrypt
-from datetime import timedelta
+from . import operations, search, tree_cache, user_cache, password_hasher, event_broker, metrics, query_budget
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .passwords import HasherBusy
+from .tokens import InvalidToken, issue_token, verify_token
+from datetime import timedelta, datetime
+import base64
 
 main = Blueprint('main', __name__)
 
 
+def hashing_busy():
+    """
+    Builds the response for a request rejected because the password hashing pool is full.
+
+    Returns:
+        A 503 Service Unavailable response asking the client to retry shortly.
+    """
+    response = jsonify({'error': 'Too many login attempts in progress, please retry'})
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def encode_cursor(row):
+    """
+    Encodes the (created_at, id) position of a row as an opaque pagination cursor.
+
+    Args:
+        row: The last TodoList or TodoItem of a page.
+
+    Returns:
+        A URL-safe cursor string.
+    """
+    position = f'{row.created_at.isoformat()}|{row.id}'
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    Decodes a pagination cursor produced by encode_cursor.
+
+    Args:
+        cursor: The cursor string.
+
+    Returns:
+        A (created_at, id) tuple.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(row_id)
+    except ValueError as e:  # Also covers base64 and unicode decoding errors
+        raise ValueError('Invalid cursor') from e
+
+
+def page_query(query, model):
+    """
+    Applies keyset pagination on (created_at, id) to a query or SELECT statement.
+
+    Reads the 'limit' and 'cursor' query parameters. Rows after the cursor are selected
+    with a row-value comparison that the (..., created_at, id) indexes can seek to, so
+    every page costs the same whatever its position. One row more than the limit is
+    selected, to tell whether there is a next page.
+
+    Args:
+        query: The query or statement selecting the rows to paginate.
+        model: The model class of the rows (TodoList or TodoItem).
+
+    Returns:
+        A (query, limit) tuple; pass the rows of the query to page_result.
+
+    Raises:
+        ValueError: If the limit or the cursor is invalid.
+    """
+    max_size = current_app.config['PAGE_MAX_SIZE']
+    try:
+        limit = int(request.args.get('limit', max_size))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= max_size:
+        raise ValueError('Invalid limit')
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        query = query.filter(db.tuple_(model.created_at, model.id) > decode_cursor(cursor))
+    return query.order_by(model.created_at, model.id).limit(limit + 1), limit
+
+
+def page_result(rows, limit):
+    """
+    Splits the rows of a query built by page_query into a page and the cursor of the next one.
+
+    Returns:
+        A (rows, next_cursor) tuple; next_cursor is None on the last page.
+    """
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def paginate(query, model):
+    """
+    Applies keyset pagination on (created_at, id) to a query and runs it.
+
+    Returns:
+        A (rows, next_cursor) tuple; next_cursor is None on the last page.
+
+    Raises:
+        ValueError: If the limit or the cursor is invalid.
+    """
+    query, limit = page_query(query, model)
+    return page_result(query.all(), limit)
+
+
+def is_paginated():
+    """Returns True if the request opted into pagination with a limit or cursor parameter."""
+    return 'limit' in request.args or 'cursor' in request.args
+
+
+def wants_list_stats():
+    """Returns True if the request asked for the item totals of each list with a stats=true parameter."""
+    return request.args.get('stats', '').lower() in ('1', 'true')
+
+
+def lists_version_select(user_id, stats=False):
+    """
+    Builds a SELECT of the versions that the ETag of a user's list collection is made of.
+
+    The collection version covers the lists themselves. With stats, the totals change with
+    every item change, so the sum of the list versions is selected too: it grows with every
+    bump of a list, and a list leaving the sum also bumps the collection version.
+
+    Args:
+        user_id: The ID of the user.
+        stats: True if the response includes the item totals of each list.
+    """
+    columns = [User.lists_version]
+    if stats:
+        columns.append(db.select(db.func.coalesce(db.func.sum(TodoList.version), 0))
+                       .where(TodoList.user_id == user_id).scalar_subquery())
+    return db.select(*columns).where(User.id == user_id)
+
+
+def lists_etag(user_id, lists_version, items_version=None):
+    """
+    Returns the ETag of a user's list collection at the given version.
+
+    items_version, the sum of the list versions, is only passed for responses with stats.
+    """
+    if items_version is not None:
+        return f'lists-{user_id}-{lists_version}-{items_version}'
+    return f'lists-{user_id}-{lists_version}'
+
+
+def items_etag(todo_list):
+    """Returns the ETag of a list's item tree at its current version."""
+    return f'list-{todo_list.id}-{todo_list.version}'
+
+
+def not_modified(etag):
+    """
+    Answers a conditional GET whose If-None-Match header matches the given ETag.
+
+    Args:
+        etag: The current (unquoted) strong ETag of the resource.
+
+    Returns:
+        A 304 Not Modified response, or None if the client's copy is stale.
+    """
+    if request.if_none_match.contains(etag):
+        return with_etag(make_response('', 304), etag)
+    return None
+
+
+def with_etag(response, etag):
+    """
+    Adds a strong ETag to a response and asks clients to revalidate before reusing it.
+
+    Args:
+        response: The Flask response object.
+        etag: The (unquoted) ETag value.
+
+    Returns:
+        The modified response object.
+    """
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+
 @main.route('/register', methods=['POST'])
 @cross_origin()
+@query_budget.limit(4)
 def register():
     """
     Registers a new user.
@@ -22,10 +210,10 @@ def register():
         201 Created on successful registration.
         400 Bad Request if required fields are missing or username/email already exists.
         500 Internal Server Error if an unexpected error occurs.
+        503 Service Unavailable if too many passwords are being hashed.
     """
     try:
         data = request.get_json()
-        print("Received registration data:", data)  # Debug print
 
         # Validate input
         if not data or 'username' not in data or 'email' not in data or 'password' not in data:
@@ -37,8 +225,8 @@ def register():
         if User.query.filter_by(email=data['email']).first():
             return jsonify({'error': 'Email already exists'}), 400
 
-        # Hash the password using bcrypt
-        hashed_password = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+        # Hash the password using bcrypt, on the bounded hashing pool
+        hashed_password = password_hasher.hash(data['password'])
         new_user = User(
             username=data['username'],
             email=data['email'],
@@ -57,27 +245,37 @@ def register():
             }
         }), 201
 
+    except HasherBusy:
+        return hashing_busy()
+
     except Exception as e:
         db.session.rollback()
-        print(f"Error during registration: {str(e)}")
+        current_app.logger.exception('Error during registration')
         return jsonify({'error': str(e)}), 500
 
 
 @main.route('/login', methods=['POST'])
 @cross_origin()
+@query_budget.limit(3)
 def login():
     """
     Logs in an existing user.
 
     Receives user data (username, password) in JSON format.
-    Verifies the credentials against the database.
+    Verifies the credentials against the database. A stored hash made with an outdated
+    bcrypt cost factor is replaced by one with the configured cost.
+
+    Besides starting a session, the response carries a signed access token and a refresh
+    token. Clients may send the access token as 'Authorization: Bearer <token>' instead of
+    the session cookie; it is verified without database access until it expires.
 
     Returns:
-        JSON response with success message and user data, or an error message.
+        JSON response with success message, user data and tokens, or an error message.
         200 OK on successful login.
         400 Bad Request if username or password are missing.
         401 Unauthorized if invalid credentials.
         500 Internal Server Error if an unexpected error occurs.
+        503 Service Unavailable if too many passwords are being hashed.
     """
     try:
         data = request.get_json()
@@ -87,7 +285,10 @@ def login():
 
         user = User.query.filter_by(username=data['username']).first()
 
-        if user and bcrypt.check_password_hash(user.password, data['password']):
+        if user and password_hasher.check(user.password, data['password']):
+            if password_hasher.needs_rehash(user.password):
+                user.password = password_hasher.hash(data['password'])
+                db.session.commit()
             login_user(user, remember=True, duration=timedelta(days=30))
             return jsonify({
                 'message': 'Logged in successfully',
@@ -95,16 +296,65 @@ def login():
                     'id': user.id,
                     'username': user.username,
                     'email': user.email
-                }
+                },
+                **token_response(user),
+                'refresh_token': issue_token(user, 'refresh')
             })
 
         return jsonify({'error': 'Invalid username or password'}), 401
 
+    except HasherBusy:
+        return hashing_busy()
+
     except Exception as e:
-        print(f"Error during login: {str(e)}")
+        current_app.logger.exception('Error during login')
         return jsonify({'error': str(e)}), 500
 
 
+def token_response(user):
+    """
+    Builds the access token fields of a login or refresh response.
+
+    Returns:
+        A dict with the access token, its type and its lifetime in seconds.
+    """
+    return {
+        'access_token': issue_token(user, 'access'),
+        'token_type': 'Bearer',
+        'expires_in': int(current_app.config['JWT_ACCESS_TOKEN_EXPIRES'].total_seconds())
+    }
+
+
+@main.route('/token/refresh', methods=['POST'])
+@cross_origin()
+def refresh_token():
+    """
+    Issues a new access token in exchange for a refresh token.
+
+    Receives {"refresh_token": ...} in JSON format. The user is looked up, so a deleted
+    user cannot refresh, and the new token carries their current username and email.
+
+    Returns:
+        JSON response with the new access token, or an error message.
+        200 OK on success.
+        400 Bad Request if the refresh token is missing.
+        401 Unauthorized if the refresh token is invalid or expired, or the user no longer exists.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get('refresh_token'), str):
+        return jsonify({'error': 'Missing refresh token'}), 400
+
+    try:
+        claims = verify_token(data['refresh_token'], 'refresh')
+    except InvalidToken as e:
+        return jsonify({'error': str(e)}), 401
+
+    user = db.session.get(User, int(claims['sub']))
+    if user is None:
+        return jsonify({'error': 'User not found'}), 401
+    return jsonify(token_response(user))
+
+
 @main.route('/logout')
 @cross_origin()
 @login_required
@@ -112,6 +362,9 @@ def logout():
     """
     Logs out the current user.
 
+    Ends the session only: access and refresh tokens are stateless and stay valid until
+    they expire, so token clients log out by discarding them.
+
     Returns:
         JSON response with success message.
         200 OK on successful logout.
@@ -122,6 +375,7 @@ def logout():
 
 @main.route('/check-auth', methods=['GET'])
 @cross_origin()
+@query_budget.limit(1)
 def check_auth():
     """
     Checks if the user is authenticated.
@@ -147,25 +401,61 @@ def check_auth():
 @main.route('/lists', methods=['GET'])
 @cross_origin()
 @login_required
+@query_budget.limit(3)
 def get_lists():
     """
     Retrieves all todo lists for the current user.
 
+    Supports conditional requests: the response carries an ETag derived from the user's
+    list collection version, and a matching If-None-Match header is answered with a 304
+    without querying the lists. The version is read from the database rather than from
+    the cached current_user, which another worker may have made stale.
+
+    Pagination is opt-in: with a 'limit' and/or 'cursor' query parameter, lists are ordered
+    by creation and returned as {"lists": [...], "next_cursor": ...}.
+
+    With stats=true, each list also carries the totals of its items, computed for all the
+    returned lists with a single grouped query.
+
     Returns:
-        JSON response with an array of todo lists.
+        JSON response with an array of todo lists, or a page of them.
         200 OK.
+        304 Not Modified if the client's copy is current.
+        400 Bad Request if the limit or cursor is invalid.
     """
-    lists = TodoList.query.filter_by(user_id=current_user.id).all()
-    return jsonify([{
-        'id': list.id,
-        'title': list.title,
-        'created_at': list.created_at
-    } for list in lists])
+    stats = wants_list_stats()
+    etag = lists_etag(current_user.id, *db.session.execute(lists_version_select(current_user.id, stats)).one())
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    def serialize(lists):
+        """Serializes the lists, with their item totals if requested."""
+        if not stats:
+            return [list_to_dict(list) for list in lists]
+        totals = operations.list_stats(lists, db.session.execute(
+            operations.list_stats_select([list.id for list in lists])))
+        return [list_to_dict(list, totals[list.id]) for list in lists]
+
+    query = TodoList.query.filter_by(user_id=current_user.id)
+    if is_paginated():
+        try:
+            lists, next_cursor = paginate(query, TodoList)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return with_etag(jsonify({
+            'lists': serialize(lists),
+            'next_cursor': next_cursor
+        }), etag)
+
+    lists = query.all()
+    return with_etag(jsonify(serialize(lists)), etag)
 
 
 @main.route('/lists', methods=['POST'])
 @cross_origin()
 @login_required
+@query_budget.limit(2)
 def create_list():
     """
     Creates a new todo list for the current user.
@@ -176,23 +466,15 @@ def create_list():
         JSON response with the created list data.
         201 Created.
     """
-    data = request.get_json()
-    new_list = TodoList(
-        title=data['title'],
-        user_id=current_user.id
-    )
-    db.session.add(new_list)
+    body, status = operations.create_list(current_user.id, request.get_json())
     db.session.commit()
-    return jsonify({
-        'id': new_list.id,
-        'title': new_list.title,
-        'created_at': new_list.created_at
-    }), 201
+    return jsonify(body), status
 
 
 @main.route('/lists/<int:list_id>', methods=['PUT'])
 @cross_origin()
 @login_required
+@query_budget.limit(3)
 def update_list(list_id):
     """
     Updates a todo list.
@@ -212,19 +494,15 @@ def update_list(list_id):
     if todo_list.user_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
 
-    data = request.get_json()
-    todo_list.title = data['title']
+    body, status = operations.rename_list(todo_list, request.get_json())
     db.session.commit()
-    return jsonify({
-        'id': todo_list.id,
-        'title': todo_list.title,
-        'created_at': todo_list.created_at
-    })
+    return jsonify(body), status
 
 
 @main.route('/lists/<int:list_id>', methods=['DELETE', 'OPTIONS'])
 @cross_origin()
 @login_required
+@query_budget.limit(7)
 def delete_list(list_id):
     """
     Deletes a todo list and all its items.
@@ -247,10 +525,15 @@ def delete_list(list_id):
         return jsonify({'error': 'Unauthorized'}), 403
 
     try:
-        # Delete all items in the list first (cascading delete)
-        TodoItem.query.filter_by(list_id=list_id).delete()
+        # Delete all items in the list's tree first
+        operations.delete_list_items(list_id)
+        # Sync clients of a deleted list have nothing left to reconcile
+        TodoItemTombstone.query.filter_by(list_id=list_id).delete()
         # Then delete the list
         db.session.delete(todo_list)
+        operations.bump_list_versions(list_id)  # Drops the list's cached tree
+        operations.bump_lists_version(current_user.id)
+        operations.record_event(list_id, 'list_deleted')
         db.session.commit()
         return jsonify({'message': 'List deleted successfully'})
     except Exception as e:
@@ -262,16 +545,29 @@ def delete_list(list_id):
 @main.route('/lists/<int:list_id>/items', methods=['GET'])
 @cross_origin()
 @login_required
+@query_budget.limit(3)
 def get_items(list_id):
     """
     Retrieves all todo items for a specific list.
 
+    Supports conditional requests: the response carries an ETag derived from the list's
+    version, and a matching If-None-Match header is answered with a 304 without loading
+    any items.
+
+    The serialized tree of the whole list is cached in memory per list version.
+
+    Pagination of the top-level items is opt-in: with a 'limit' and/or 'cursor' query
+    parameter, they are ordered by creation and returned with their full subtrees as
+    {"items": [...], "next_cursor": ...}.
+
     Args:
         list_id: The ID of the list.
 
     Returns:
-        JSON response with an array of todo items, including nested subtasks.
+        JSON response with an array of todo items, including nested subtasks, or a page of them.
         200 OK.
+        304 Not Modified if the client's copy is current.
+        400 Bad Request if the limit or cursor is invalid.
         403 Forbidden if the list does not belong to the current user.
         404 Not Found if the list does not exist.
     """
@@ -279,35 +575,143 @@ def get_items(list_id):
     if todo_list.user_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
 
-    # Get only top-level items (items with no parent)
-    items = TodoItem.query.filter_by(list_id=list_id, parent_id=None).all()
+    etag = items_etag(todo_list)
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
+    if is_paginated():
+        try:
+            roots, next_cursor = paginate(TodoItem.query.filter_by(list_id=list_id, parent_id=None), TodoItem)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        return with_etag(jsonify({
+            'items': serialize_item_tree(load_subtrees(roots), roots),
+            'next_cursor': next_cursor
+        }), etag)
+
+    data = tree_cache.get(todo_list.id, todo_list.version)
+    if data is None:
+        data = jsonify(serialize_item_tree(load_item_tree(list_id))).get_data()
+        tree_cache.set(todo_list.id, todo_list.version, data)
+    return with_etag(current_app.response_class(data, mimetype='application/json'), etag)
+
+
+@main.route('/lists/<int:list_id>/changes', methods=['GET'])
+@cross_origin()
+@login_required
+@query_budget.limit(3)
+def get_changes(list_id):
+    """
+    Retrieves the items of a list that changed since a sync cursor.
+
+    The cursor is the list's version. Without a 'since' parameter (or with since=0) every
+    item of the tree is returned, which lets a client take its initial snapshot. Items are
+    flat, with their parent_id; clients should apply 'deleted' before 'items', since SQLite
+    may reuse the ID of a deleted item.
+
+    Args:
+        list_id: The ID of the list.
+
+    Returns:
+        JSON response with the changed items, the IDs of deleted items and the new cursor.
+        200 OK.
+        400 Bad Request if the cursor is invalid.
+        403 Forbidden if the list does not belong to the current user.
+        404 Not Found if the list does not exist.
+    """
+    todo_list = TodoList.query.get_or_404(list_id)
+    if todo_list.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
 
-    def serialize_item(item):
-        """
-        Recursively serializes a todo item and its children.
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        since = -1
+    if since < 0 or since > todo_list.version:
+        return jsonify({'error': 'Invalid cursor'}), 400
+
+    items, deleted = [], []
+    if since == 0:
+        items = load_item_tree(list_id)
+    elif since < todo_list.version:
+        items = TodoItem.query.filter(
+            TodoItem.list_id == list_id,
+            TodoItem.revision > since
+        ).order_by(TodoItem.id).all()
+        deleted = [item_id for (item_id,) in db.session.query(TodoItemTombstone.item_id).filter(
+            TodoItemTombstone.list_id == list_id,
+            TodoItemTombstone.revision > since
+        ).order_by(TodoItemTombstone.id)]
 
-        Args:
-            item: The TodoItem object.
+    return jsonify({
+        'cursor': todo_list.version,
+        'items': [dict(item_to_dict(item), parent_id=item.parent_id, updated_at=item.updated_at)
+                  for item in items],
+        'deleted': deleted
+    })
 
-        Returns:
-            A dictionary representation of the item and its children.
-        """
-        return {
-            'id': item.id,
-            'content': item.content,
-            'completed': item.completed,
-            'collapsed': item.collapsed,
-            'level': item.level,
-            'created_at': item.created_at,
-            'children': [serialize_item(child) for child in item.children]
-        }
 
-    return jsonify([serialize_item(item) for item in items])
+@main.route('/lists/<int:list_id>/events', methods=['GET'])
+@cross_origin()
+@login_required
+@query_budget.limit(1)
+def list_events(list_id):
+    """
+    Streams the changes of a list as Server-Sent Events.
+
+    Each committed change is sent as a message whose data is a JSON object with its 'type'
+    (item_created, item_updated, item_moved, item_deleted, items_imported, list_updated or
+    list_deleted), the list_id and the changed data. A comment is sent every
+    EVENTS_HEARTBEAT_INTERVAL seconds to keep idle connections open. A client that falls
+    more than EVENTS_QUEUE_SIZE events behind gets a 'resync' event and the stream ends;
+    it should reload the list, e.g. through GET /lists/<id>/changes, and reconnect.
+
+    Args:
+        list_id: The ID of the list.
+
+    Returns:
+        A text/event-stream response.
+        200 OK.
+        403 Forbidden if the list does not belong to the current user.
+        404 Not Found if the list does not exist.
+    """
+    todo_list = TodoList.query.get_or_404(list_id)
+    if todo_list.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    # Subscribe before responding, so no change committed after this request is missed
+    subscription = event_broker.subscribe(list_id)
+    heartbeat_interval = current_app.config['EVENTS_HEARTBEAT_INTERVAL']
+
+    def generate():
+        try:
+            yield ': connected\n\n'
+            while True:
+                message = subscription.get(heartbeat_interval)
+                if subscription.overflowed:
+                    yield 'event: resync\ndata: {}\n\n'
+                    return
+                if message is None:
+                    yield ': heartbeat\n\n'
+                else:
+                    yield f'data: {message}\n\n'
+        finally:
+            subscription.close()
+
+    # The stream outlives the request's app context and database session on purpose
+    response = current_app.response_class(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'  # Stops nginx from buffering the stream
+    })
+    response.call_on_close(subscription.close)
+    return response
 
 
 @main.route('/lists/<int:list_id>/items', methods=['POST'])
 @cross_origin()
 @login_required
+@query_budget.limit(5)
 def create_item(list_id):
     """
     Creates a new todo item.
@@ -320,7 +724,7 @@ def create_item(list_id):
     Returns:
         JSON response with the created item data, or an error message.
         201 Created.
-        400 Bad Request if maximum nesting level is reached.
+        400 Bad Request if the parent item is not found or maximum nesting level is reached.
         403 Forbidden if the list does not belong to the current user.
         404 Not Found if the list does not exist.
     """
@@ -328,40 +732,49 @@ def create_item(list_id):
     if todo_list.user_id != current_user.id:
         return jsonify({'error': 'Unauthorized'}), 403
 
-    data = request.get_json()
-    parent_id = data.get('parent_id')
-
-    # Calculate level based on parent
-    level = 1
-    if parent_id:
-        parent = TodoItem.query.get(parent_id)
-        if parent:
-            level = parent.level + 1
-            if level > 3:  # Limit to 3 levels of nesting
-                return jsonify({'error': 'Maximum nesting level reached'}), 400
-
-    new_item = TodoItem(
-        content=data['content'],
-        list_id=list_id,
-        parent_id=parent_id,
-        level=level
-    )
-    db.session.add(new_item)
-    db.session.commit()
+    body, status = operations.create_item(todo_list, request.get_json())
+    if status == 201:
+        db.session.commit()
+    return jsonify(body), status
 
-    return jsonify({
-        'id': new_item.id,
-        'content': new_item.content,
-        'completed': new_item.completed,
-        'collapsed': new_item.collapsed,
-        'level': new_item.level,
-        'created_at': new_item.created_at
-    }), 201
+
+@main.route('/lists/<int:list_id>/items/import', methods=['POST'])
+@cross_origin()
+@login_required
+def import_items(list_id):
+    """
+    Imports a nested tree of items into a list, e.g. from a checklist template.
+
+    Receives {"items": [{"content", "completed", "children": [...]}, ...]} and an optional
+    parent_id in JSON format. Levels and parent IDs are computed server-side and the
+    nesting limit of create_item applies.
+
+    Args:
+        list_id: The ID of the list to import the items into.
+
+    Returns:
+        JSON response with the number of imported items and the IDs of the top-level ones,
+        or an error message.
+        201 Created.
+        400 Bad Request if the tree is malformed, too large or too deep.
+        403 Forbidden if the list does not belong to the current user.
+        404 Not Found if the list does not exist.
+    """
+    todo_list = TodoList.query.get_or_404(list_id)
+    if todo_list.user_id != current_user.id:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    body, status = operations.import_items(todo_list, request.get_json(silent=True) or {},
+                                           current_app.config['IMPORT_MAX_ITEMS'])
+    if status == 201:
+        db.session.commit()
+    return jsonify(body), status
 
 
 @main.route('/items/<int:item_id>', methods=['PUT'])
 @cross_origin()
 @login_required
+@query_budget.limit(8)
 def update_item(item_id):
     """
     Updates a todo item.
@@ -383,43 +796,20 @@ def update_item(item_id):
         if item.todo_list.user_id != current_user.id:
             return jsonify({'error': 'Unauthorized'}), 403
 
-        data = request.get_json()
-
-        if 'completed' in data:
-            item.completed = data['completed']
-
-        if 'collapsed' in data:
-            item.collapsed = data['collapsed']
-
-        if 'content' in data:
-            item.content = data['content']
-
-        # Handle moving to a different list
-        new_list_id = data.get('list_id')
-        if new_list_id and new_list_id != item.list_id:
-            new_list = TodoList.query.get(new_list_id)
-            if new_list and new_list.user_id == current_user.id:
-                item.list_id = new_list_id
-
+        body, status = operations.update_item(item, request.get_json(), current_user.id)
         db.session.commit()
-        return jsonify({
-            'id': item.id,
-            'content': item.content,
-            'completed': item.completed,
-            'collapsed': item.collapsed,
-            'level': item.level,
-            'created_at': item.created_at
-        })
+        return jsonify(body), status
 
     except Exception as e:
         db.session.rollback()
-        print(f"Error updating item: {str(e)}")
+        current_app.logger.exception('Error updating item')
         return jsonify({'error': str(e)}), 500
 
 
 @main.route('/items/<int:item_id>', methods=['DELETE'])
 @cross_origin()
 @login_required
+@query_budget.limit(6)
 def delete_item(item_id):
     """
     Deletes a todo item and its subtasks.
@@ -439,9 +829,9 @@ def delete_item(item_id):
         if item.todo_list.user_id != current_user.id:
             return jsonify({'error': 'Unauthorized'}), 403
 
-        db.session.delete(item)  # Cascading delete will handle subtasks
+        body, status = operations.delete_item(item)
         db.session.commit()
-        return jsonify({'message': 'Item and all subtasks deleted successfully'})
+        return jsonify(body), status
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
@@ -450,6 +840,7 @@ def delete_item(item_id):
 @main.route('/items/<int:item_id>/complete', methods=['PUT'])
 @cross_origin()
 @login_required
+@query_budget.limit(5)
 def complete_item(item_id):
     """
     Marks a todo item as complete. If the item has uncompleted subtasks, it will return an error.
@@ -471,26 +862,294 @@ def complete_item(item_id):
         if item.todo_list.user_id != current_user.id:
             return jsonify({'error': 'Unauthorized'}), 403
 
-        # Check for uncompleted subtasks
-        uncompleted_subtasks = TodoItem.query.filter_by(parent_id=item_id, completed=False).count()
-        if uncompleted_subtasks > 0:
-            return jsonify({
-                'error': 'Cannot complete this task. Some subtasks are not finished.',
-                'uncompleted_subtasks': uncompleted_subtasks
-            }), 400
+        body, status = operations.complete_item(item)
+        if status == 200:
+            db.session.commit()
+        return jsonify(body), status
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('Error completing item')
+        return jsonify({'error': str(e)}), 500
+
+
+@main.route('/export', methods=['GET'])
+@cross_origin()
+@login_required
+def export_data():
+    """
+    Exports all of the current user's lists and items as NDJSON.
 
-        if item.level == 1:  # Delete completed top-level tasks
-            db.session.delete(item)
-        else:
-            item.completed = True
+    The response is streamed: records are serialized one line at a time as they are read
+    from the database in batches of EXPORT_BATCH_SIZE rows, so memory use stays flat
+    however much the user has. Every list comes first, then every item, each item after
+    its parent.
 
+    Returns:
+        Streamed NDJSON response with one {"type": "list" | "item", ...} record per line.
+        200 OK.
+    """
+    records = operations.export_records(current_user.id, current_app.config['EXPORT_BATCH_SIZE'])
+
+    def generate():
+        for record in records:
+            yield current_app.json.dumps(record) + '\n'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/x-ndjson',
+                                      headers={'Content-Disposition': 'attachment; filename=export.ndjson'})
+
+
+@main.route('/import', methods=['POST'])
+@cross_origin()
+@login_required
+def import_data():
+    """
+    Imports the NDJSON produced by GET /export into the current user's account.
+
+    The request body is read line by line and inserted in batches of EXPORT_BATCH_SIZE
+    records, all in one transaction: the lists are created as new lists, and nothing is
+    imported if a line is invalid.
+
+    Returns:
+        JSON response with the number of imported lists and items, or an error message.
+        201 Created.
+        400 Bad Request if a line is not a valid record.
+    """
+    def records():
+        for line_number, line in enumerate(request.stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield line_number, current_app.json.loads(line)
+            except ValueError:
+                raise ValueError(f'Line {line_number}: invalid JSON')
+
+    body, status = operations.import_records(current_user.id, records(), current_app.config['EXPORT_BATCH_SIZE'])
+    if status == 201:
         db.session.commit()
-        return jsonify({
-            'message': 'Task completed successfully',
-            'deleted': item.level == 1
-        })
+    else:
+        db.session.rollback()
+    return jsonify(body), status
+
+
+@main.route('/search', methods=['GET'])
+@cross_origin()
+@login_required
+@query_budget.limit(2)
+def search_items():
+    """
+    Searches the content of the current user's items across all of their lists.
+
+    Every word of the 'q' parameter must appear in an item, the last one as a prefix. Hits
+    are ranked by relevance and carry their list ID and ancestors, so a client can show
+    where each one is. At most 'limit' hits are returned (20 by default).
+
+    Returns:
+        JSON response with an array of hits.
+        200 OK.
+        400 Bad Request if the query is missing or the limit is invalid.
+    """
+    text = request.args.get('q', '').strip()
+    if not text:
+        return jsonify({'error': 'Missing query'}), 400
+    try:
+        limit = int(request.args.get('limit', 20))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= current_app.config['PAGE_MAX_SIZE']:
+        return jsonify({'error': 'Invalid limit'}), 400
+
+    return jsonify(search.search_items(current_user.id, text, limit))
+
+
+@main.route('/cache/stats', methods=['GET'])
+@cross_origin()
+@login_required
+def cache_stats():
+    """
+    Reports the counters of the in-process caches of the serving worker.
+
+    Returns:
+        JSON response with the hit, miss and eviction counters, hit rate and usage of the
+        item tree cache ('trees') and of the user loader cache ('users').
+        200 OK.
+    """
+    return jsonify({
+        'trees': tree_cache.stats(),
+        'users': user_cache.stats()
+    })
+
+
+@main.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Exports the request metrics of the serving worker in the Prometheus text format.
+
+    Per method and endpoint: requests by status code, and histograms of the latency, the
+    response size, and the number and duration of the SQL statements of each request.
+
+    Returns:
+        The metrics as text/plain.
+        200 OK.
+        404 Not Found if METRICS_ENABLED is 0, the default.
+    """
+    if not metrics.enabled:
+        return jsonify({'error': 'Not found'}), 404
+    return current_app.response_class(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+@main.route('/batch', methods=['POST'])
+@cross_origin()
+@login_required
+def batch():
+    """
+    Applies an ordered array of operations in a single transaction.
+
+    Receives {"operations": [...]} in JSON format. Each operation has an 'op' field
+    (create_list, rename_list, create_item, update_item, complete_item, delete_item) plus
+    the fields its single-item route takes, with list_id/item_id in place of the URL
+    parameter. A create operation may carry a 'ref' name; later operations can pass that
+    name instead of a numeric list_id, item_id or parent_id to refer to the new row.
+
+    Ownership is checked once per list, and everything is committed at the end. If an
+    operation fails, the whole batch is rolled back.
+
+    Returns:
+        JSON response with one {status, body} result per operation, or an error message
+        with the index of the failing operation and the results up to it.
+        200 OK if every operation succeeded.
+        400 Bad Request if the batch is malformed or an operation is invalid.
+        403 Forbidden if an operation touches a list of another user.
+        404 Not Found if an operation refers to a missing list or item.
+        500 Internal Server Error if an unexpected error occurs.
+    """
+    data = request.get_json(silent=True)
+    batch_operations = data.get('operations') if isinstance(data, dict) else None
+    if not isinstance(batch_operations, list) or not all(isinstance(op, dict) for op in batch_operations):
+        return jsonify({'error': 'Missing operations'}), 400
+    if len(batch_operations) > current_app.config['BATCH_MAX_OPERATIONS']:
+        return jsonify({'error': 'Too many operations'}), 400
+
+    prefetch_batch(batch_operations)
+    lists = {}  # Lists whose ownership has been checked, by ID
+    refs = {}  # IDs created by earlier operations, by ref name
+    results = []
+    try:
+        for index, op in enumerate(batch_operations):
+            body, status = apply_batch_operation(op, lists, refs)
+            results.append({'status': status, 'body': body})
+            if status >= 400:
+                db.session.rollback()
+                return jsonify({'error': body['error'], 'index': index, 'results': results}), status
+            if 'ref' in op and 'id' in body:
+                refs[op['ref']] = body['id']
+
+        db.session.commit()
+        return jsonify({'results': results})
 
     except Exception as e:
         db.session.rollback()
-        print(f"Error completing item: {str(e)}")
+        current_app.logger.exception('Error applying batch')
         return jsonify({'error': str(e)}), 500
+
+
+def prefetch_batch(batch_operations):
+    """
+    Loads every list and item a batch refers to by ID with two queries.
+
+    Later lookups through db.session.get() are then served from the identity map.
+
+    Args:
+        batch_operations: The operations of the batch.
+    """
+    # Refs and malformed IDs (e.g. arrays) are skipped here and rejected by apply_batch_operation
+    item_ids = {op.get(key) for op in batch_operations for key in ('item_id', 'parent_id')
+                if is_batch_id(op.get(key))}
+    list_ids = {op.get('list_id') for op in batch_operations if is_batch_id(op.get('list_id'))}
+    if item_ids:
+        list_ids.update(item.list_id for item in TodoItem.query.filter(TodoItem.id.in_(item_ids)))
+    if list_ids:
+        TodoList.query.filter(TodoList.id.in_(list_ids)).all()
+
+
+def is_batch_id(value):
+    """Returns whether a batch operation's list_id, item_id or parent_id is a numeric ID."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class BatchOperationError(Exception):
+    """Raised when an operation of a batch cannot be applied."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def apply_batch_operation(op, lists, refs):
+    """
+    Applies a single operation of a batch.
+
+    Args:
+        op: The operation data.
+        lists: Lists already checked for ownership, by ID. Updated in place.
+        refs: IDs created by earlier operations, by ref name.
+
+    Returns:
+        A (JSON body, status code) pair.
+    """
+    def resolve(key, value):
+        """Maps a ref name to the ID it stands for; numeric IDs and None are returned as they are."""
+        if isinstance(value, str):
+            if value not in refs:
+                raise BatchOperationError(f'Unknown ref: {value}', 400)
+            return refs[value]
+        if value is not None and not is_batch_id(value):
+            raise BatchOperationError(f'Invalid {key}', 400)
+        return value
+
+    def owned_list(list_id):
+        """Returns the list if it belongs to the current user, checking each list once."""
+        if list_id not in lists:
+            todo_list = db.session.get(TodoList, list_id) if list_id is not None else None
+            if todo_list is None:
+                raise BatchOperationError('List not found', 404)
+            if todo_list.user_id != current_user.id:
+                raise BatchOperationError('Unauthorized', 403)
+            lists[list_id] = todo_list
+        return lists[list_id]
+
+    def owned_item(item_id):
+        """Returns the item if its list belongs to the current user."""
+        item = db.session.get(TodoItem, item_id) if item_id is not None else None
+        if item is None:
+            raise BatchOperationError('Item not found', 404)
+        owned_list(item.list_id)
+        return item
+
+    try:
+        if 'ref' in op and not isinstance(op['ref'], str):
+            raise BatchOperationError('Invalid ref', 400)
+        data = dict(op)
+        for key in ('list_id', 'item_id', 'parent_id'):
+            if key in data:
+                data[key] = resolve(key, data[key])
+
+        kind = data.get('op')
+        if kind == 'create_list':
+            return operations.create_list(current_user.id, data)
+        if kind == 'rename_list':
+            return operations.rename_list(owned_list(data.get('list_id')), data)
+        if kind == 'create_item':
+            return operations.create_item(owned_list(data.get('list_id')), data)
+        if kind == 'update_item':
+            return operations.update_item(owned_item(data.get('item_id')), data, current_user.id)
+        if kind == 'complete_item':
+            return operations.complete_item(owned_item(data.get('item_id')))
+        if kind == 'delete_item':
+            return operations.delete_item(owned_item(data.get('item_id')))
+        return {'error': f'Unknown operation: {kind}'}, 400
+
+    except BatchOperationError as e:
+        return {'error': str(e)}, e.status
+    except KeyError as e:
+        return {'error': f'Missing field: {e.args[0]}'}, 400
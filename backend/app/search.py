@@ -0,0 +1,112 @@
+import re
+from sqlalchemy import DDL, event
+from .models import db, TodoList, TodoItem
+from .operations import ancestor_ids
+
+# Full-text index of item contents. An external-content FTS5 table stores only the index
+# and reads the contents from todo_item; triggers keep it in sync with every write,
+# including the bulk INSERT and DELETE statements that bypass the ORM.
+SEARCH_INDEX_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS todo_item_fts USING fts5(content, content='todo_item', content_rowid='id')",
+    'CREATE TRIGGER IF NOT EXISTS todo_item_fts_insert AFTER INSERT ON todo_item BEGIN '
+    'INSERT INTO todo_item_fts (rowid, content) VALUES (new.id, new.content); END',
+    'CREATE TRIGGER IF NOT EXISTS todo_item_fts_delete AFTER DELETE ON todo_item BEGIN '
+    "INSERT INTO todo_item_fts (todo_item_fts, rowid, content) VALUES ('delete', old.id, old.content); END",
+    'CREATE TRIGGER IF NOT EXISTS todo_item_fts_update AFTER UPDATE OF content ON todo_item BEGIN '
+    "INSERT INTO todo_item_fts (todo_item_fts, rowid, content) VALUES ('delete', old.id, old.content); "
+    'INSERT INTO todo_item_fts (rowid, content) VALUES (new.id, new.content); END',
+]
+
+# The index is not part of the metadata, so it is created and dropped along with todo_item
+for statement in SEARCH_INDEX_DDL:
+    event.listen(TodoItem.__table__, 'after_create', DDL(statement).execute_if(dialect='sqlite'))
+event.listen(TodoItem.__table__, 'before_drop',
+             DDL('DROP TABLE IF EXISTS todo_item_fts').execute_if(dialect='sqlite'))
+
+search_index = db.table('todo_item_fts', db.column('rowid'), db.column('rank'))
+
+
+def create_index(connection):
+    """
+    Creates the search index and its triggers, if missing, and indexes every existing item.
+
+    Args:
+        connection: A connection in a transaction, to an SQLite database.
+    """
+    for statement in SEARCH_INDEX_DDL:
+        connection.exec_driver_sql(statement)
+    rebuild_index(connection)
+
+
+def rebuild_index(connection):
+    """
+    Rebuilds the search index from the contents of every item.
+
+    Args:
+        connection: A connection in a transaction, to an SQLite database.
+    """
+    connection.exec_driver_sql("INSERT INTO todo_item_fts (todo_item_fts) VALUES ('rebuild')")
+
+
+def match_expression(text):
+    """
+    Turns search text into an FTS5 query that matches items containing every word.
+
+    Each word is quoted, so FTS5 operators and punctuation in the text are searched for
+    rather than interpreted, and the last one matches as a prefix, to search as the user types.
+
+    Returns:
+        The FTS5 query, or None if the text has no words.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return ' '.join(f'"{word}"' for word in words) + '*'
+
+
+def search_items(user_id, text, limit):
+    """
+    Searches the contents of a user's items, across all of their lists.
+
+    Uses the FTS5 index, ranked by relevance (BM25), on SQLite; other databases fall back to
+    an unranked substring match.
+
+    Args:
+        user_id: The ID of the user.
+        text: The search text.
+        limit: The maximum number of hits.
+
+    Returns:
+        The hits, best first, as dictionaries with the item fields, its list ID and its
+        ancestors from the top-level item down, as {'id', 'content'} dictionaries.
+    """
+    query = match_expression(text)
+    if query is None:
+        return []
+
+    statement = db.select(TodoItem).join(TodoList, TodoList.id == TodoItem.list_id).where(TodoList.user_id == user_id)
+    if db.session.get_bind().dialect.name == 'sqlite':
+        statement = (statement.join(search_index, search_index.c.rowid == TodoItem.id)
+                     .where(db.literal_column('todo_item_fts').match(query))
+                     .order_by(search_index.c.rank))
+    else:
+        # Escaped, so '%' and '_' in the text match themselves, as they do in the index
+        statement = statement.where(TodoItem.content.icontains(text, autoescape=True)).order_by(TodoItem.id)
+    items = db.session.scalars(statement.limit(limit)).all()
+
+    # The ancestors of every hit are read from the paths, with one more query
+    paths = {item.id: ancestor_ids(item) for item in items}
+    wanted = {ancestor_id for ids in paths.values() for ancestor_id in ids}
+    contents = {}
+    if wanted:
+        contents = dict(db.session.execute(
+            db.select(TodoItem.id, TodoItem.content).where(TodoItem.id.in_(wanted))).all())
+
+    return [{
+        'id': item.id,
+        'content': item.content,
+        'completed': item.completed,
+        'level': item.level,
+        'list_id': item.list_id,
+        'ancestors': [{'id': ancestor_id, 'content': contents[ancestor_id]} for ancestor_id in paths[item.id]]
+    } for item in items]
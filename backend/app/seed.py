@@ -0,0 +1,127 @@
+import random
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from . import db, password_hasher
+from .models import User, TodoList, TodoItem
+
+
+def next_id(model):
+    """Returns the ID after the highest one of a table, so seeded rows can be given their IDs up front."""
+    return (db.session.scalar(db.select(db.func.max(model.id))) or 0) + 1
+
+
+def build_tree(list_id, first_id, items, children, depth, completed, rng):
+    """
+    Returns the rows of a list's item tree, with their IDs, paths and subtask counters.
+
+    The list has items top-level items, each item above depth has children subtasks, and
+    each item is completed with probability completed. Rows are generated level by level,
+    in ID order, so every parent comes before its children.
+    """
+    rows = []
+
+    def add(level, parent_id, path):
+        row = {
+            'id': first_id + len(rows), 'content': f'Item {first_id + len(rows)}', 'list_id': list_id,
+            'parent_id': parent_id, 'level': level, 'path': path, 'completed': rng.random() < completed,
+            'collapsed': False, 'child_count': 0, 'open_child_count': 0
+        }
+        rows.append(row)
+        return row
+
+    parents = [add(1, None, '/') for _ in range(items)]
+    for level in range(2, depth + 1):
+        level_rows = []
+        for parent in parents:
+            for _ in range(children):
+                child = add(level, parent['id'], f"{parent['path']}{parent['id']}/")
+                parent['child_count'] += 1
+                parent['open_child_count'] += not child['completed']
+                level_rows.append(child)
+        parents = level_rows
+    return rows
+
+
+def seed_data(users, lists, items, children, depth, completed=0.2, password='password', seed=0, batch_size=1000):
+    """
+    Bulk-generates users, lists and item trees, and commits them.
+
+    Users are named user<id> (email user<id>@example.com) and share one password hash.
+    Rows are inserted with multi-row INSERTs of batch_size rows, bypassing the ORM events,
+    so the subtask counters are computed here; the search index is filled by its triggers.
+    The same seed generates the same data.
+
+    Args:
+        users: Number of users.
+        lists: Lists per user.
+        items: Top-level items per list.
+        children: Subtasks per item, on every level above depth.
+        depth: Levels of each tree, at most MAX_NESTING_LEVEL.
+        completed: Share of the items that are completed.
+        password: Password of every user.
+        seed: Seed of the random completion statuses.
+        batch_size: Rows inserted per statement.
+
+    Returns:
+        A dictionary with the usernames, the list IDs per username and the number of items.
+
+    Raises:
+        ValueError: If depth is not between 1 and MAX_NESTING_LEVEL.
+    """
+    if not 1 <= depth <= current_app.config['MAX_NESTING_LEVEL']:
+        raise ValueError(f"depth must be between 1 and {current_app.config['MAX_NESTING_LEVEL']}")
+    rng = random.Random(seed)
+    password_hash = password_hasher.hash(password)
+
+    user_id, list_id, item_id = next_id(User), next_id(TodoList), next_id(TodoItem)
+    user_rows = [{'id': user_id + i, 'username': f'user{user_id + i}', 'email': f'user{user_id + i}@example.com',
+                  'password': password_hash} for i in range(users)]
+    if user_rows:
+        db.session.execute(db.insert(User), user_rows)
+
+    list_ids = {}
+    item_rows, item_count = [], 0
+    for user in user_rows:
+        list_rows = [{'id': list_id + i, 'title': f'List {list_id + i}', 'user_id': user['id']} for i in range(lists)]
+        if list_rows:
+            db.session.execute(db.insert(TodoList), list_rows)
+        list_ids[user['username']] = [row['id'] for row in list_rows]
+        list_id += lists
+        for row in list_rows:
+            tree = build_tree(row['id'], item_id, items, children, depth, completed, rng)
+            item_id += len(tree)
+            item_count += len(tree)
+            item_rows.extend(tree)
+            while len(item_rows) >= batch_size:
+                db.session.execute(db.insert(TodoItem), item_rows[:batch_size])
+                del item_rows[:batch_size]
+    if item_rows:
+        db.session.execute(db.insert(TodoItem), item_rows)
+    db.session.commit()
+    return {'usernames': [user['username'] for user in user_rows], 'list_ids': list_ids, 'items': item_count}
+
+
+@click.command('seed')
+@click.option('--users', default=10, show_default=True, help='Users to create.')
+@click.option('--lists', default=10, show_default=True, help='Lists per user.')
+@click.option('--items', default=10, show_default=True, help='Top-level items per list.')
+@click.option('--children', default=4, show_default=True, help='Subtasks per item, on every level but the last.')
+@click.option('--depth', default=3, show_default=True, help='Levels of each item tree.')
+@click.option('--completed', default=0.2, show_default=True, help='Share of the items that are completed.')
+@click.option('--password', default='password', show_default=True, help='Password of every user.')
+@click.option('--seed', 'seed', default=0, show_default=True, help='Random seed of the completion statuses.')
+@with_appcontext
+def seed_command(users, lists, items, children, depth, completed, password, seed):
+    """Fills the database (DATABASE_URL, meant to be a scratch one) with generated users, lists and items."""
+    try:
+        result = seed_data(users, lists, items, children, depth, completed, password, seed,
+                           current_app.config['EXPORT_BATCH_SIZE'])
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint='--depth')
+    usernames = result['usernames']
+    if usernames:
+        click.echo(f"Seeded {len(usernames)} users ({usernames[0]} to {usernames[-1]}, password '{password}'), "
+                   f"{len(usernames) * lists} lists and {result['items']} items")
+    else:
+        click.echo('Seeded nothing')
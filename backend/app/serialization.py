@@ -0,0 +1,88 @@
+from datetime import date, datetime, timezone
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Optional: the standard library encoder is used without it
+    orjson = None
+
+ENCODERS = ('auto', 'orjson', 'json')
+
+DAYS = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+MONTHS = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
+
+def http_date(value):
+    """
+    Formats a date or datetime as an RFC 822 date in GMT, e.g. 'Mon, 01 Jan 2024 00:00:00 GMT'.
+
+    Produces the same string as werkzeug.http.http_date, which Flask's default provider
+    uses, without going through email.utils. Naive datetimes are taken to be UTC, and a
+    date is formatted as its midnight.
+    """
+    if not isinstance(value, datetime):
+        value = datetime(value.year, value.month, value.day)
+    elif value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return (f'{DAYS[value.weekday()]}, {value.day:02d} {MONTHS[value.month - 1]} {value.year:04d} '
+            f'{value.hour:02d}:{value.minute:02d}:{value.second:02d} GMT')
+
+
+class JSONProvider(DefaultJSONProvider):
+    """
+    JSON provider of the app, serializing with orjson when it is installed.
+
+    Selected with JSON_ENCODER: 'auto' uses orjson if it can be imported and the standard
+    library otherwise, 'orjson' requires it, and 'json' always uses the standard library.
+    Both encoders format dates with http_date, so responses carry the same dates whichever
+    one is used. Unlike the standard library, orjson writes non-ASCII characters as UTF-8
+    rather than escaping them.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        encoder = app.config['JSON_ENCODER']
+        if encoder not in ENCODERS:
+            raise ValueError(f'Unknown JSON_ENCODER {encoder!r}, expected one of {ENCODERS}')
+        if encoder == 'orjson' and orjson is None:
+            raise ValueError("JSON_ENCODER is 'orjson' but orjson is not installed")
+        self.encoder = 'json' if encoder == 'json' or orjson is None else 'orjson'
+
+    @staticmethod
+    def default(value):
+        """Serializes the types neither encoder knows, like DefaultJSONProvider.default with a faster date format."""
+        if isinstance(value, date):
+            return http_date(value)
+        return DefaultJSONProvider.default(value)
+
+    def dump_bytes(self, obj, indent=False):
+        """
+        Serializes data as UTF-8 encoded JSON with orjson.
+
+        Dates are passed through to default, rather than written in orjson's ISO format.
+        """
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj, **kwargs):
+        """
+        Serializes data as a JSON string.
+
+        Keyword arguments are options of json.dumps, which orjson does not have, so a call
+        with any falls back to the standard library.
+        """
+        if self.encoder == 'orjson' and not kwargs:
+            return self.dump_bytes(obj).decode()
+        return super().dumps(obj, **kwargs)
+
+    def response(self, *args, **kwargs):
+        """Serializes the given arguments as JSON into a response, like DefaultJSONProvider.response."""
+        if self.encoder != 'orjson':
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dump_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,112 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from flask import current_app
+
+HEADER = {'alg': 'HS256', 'typ': 'JWT'}
+
+
+class InvalidToken(Exception):
+    """Raised when a token is malformed, has a bad signature, has expired or is of the wrong type."""
+
+
+def b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode('ascii')
+
+
+def b64decode(data):
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def sign(signing_input, secret):
+    return hmac.new(secret.encode('utf-8'), signing_input.encode('ascii'), hashlib.sha256).digest()
+
+
+def encode_token(claims, secret):
+    """
+    Encodes claims as a JSON Web Token signed with HMAC-SHA256.
+
+    Args:
+        claims: A JSON-serializable dict.
+        secret: The signing key.
+
+    Returns:
+        The compact serialization of the token.
+    """
+    signing_input = '.'.join(
+        b64encode(json.dumps(part, separators=(',', ':')).encode('utf-8')) for part in (HEADER, claims)
+    )
+    return f'{signing_input}.{b64encode(sign(signing_input, secret))}'
+
+
+def decode_token(token, secret, now=None):
+    """
+    Verifies the signature and expiry of a JSON Web Token and returns its claims.
+
+    Args:
+        token: The compact serialization of the token.
+        secret: The signing key.
+        now: The current Unix time, defaults to time.time().
+
+    Raises:
+        InvalidToken: If the token is malformed, its signature does not match or it has expired.
+    """
+    try:
+        signing_input, signature = token.rsplit('.', 1)
+        header, claims = (json.loads(b64decode(part)) for part in signing_input.split('.'))
+        signature = b64decode(signature)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise InvalidToken('Malformed token')
+    if header != HEADER or not hmac.compare_digest(signature, sign(signing_input, secret)):
+        raise InvalidToken('Invalid signature')
+    if not isinstance(claims, dict) or not isinstance(claims.get('exp'), int):
+        raise InvalidToken('Malformed token')
+    if claims['exp'] <= (time.time() if now is None else now):
+        raise InvalidToken('Token has expired')
+    return claims
+
+
+def issue_token(user, token_type):
+    """
+    Issues a signed access or refresh token for a user.
+
+    Access tokens carry the user's username and email, so that requests authenticated with
+    them need no database access; they live for JWT_ACCESS_TOKEN_EXPIRES. Refresh tokens
+    only carry the user ID and live for JWT_REFRESH_TOKEN_EXPIRES.
+
+    Args:
+        user: The user, or any object with id, username and email attributes.
+        token_type: 'access' or 'refresh'.
+    """
+    now = int(time.time())
+    if token_type == 'access':
+        lifetime = current_app.config['JWT_ACCESS_TOKEN_EXPIRES']
+        claims = {'sub': str(user.id), 'username': user.username, 'email': user.email}
+    else:
+        lifetime = current_app.config['JWT_REFRESH_TOKEN_EXPIRES']
+        claims = {'sub': str(user.id)}
+    claims.update(type=token_type, iat=now, exp=now + int(lifetime.total_seconds()))
+    return encode_token(claims, current_app.config['JWT_SECRET_KEY'])
+
+
+def verify_token(token, token_type):
+    """
+    Returns the claims of a token issued by issue_token, without touching the database.
+
+    Raises:
+        InvalidToken: If the token is invalid, has expired or is not of the given type.
+    """
+    claims = decode_token(token, current_app.config['JWT_SECRET_KEY'])
+    if claims.get('type') != token_type or not str(claims.get('sub', '')).isdigit():
+        raise InvalidToken('Wrong token type')
+    return claims
+
+
+def bearer_token(request):
+    """Returns the token of a request's 'Authorization: Bearer <token>' header, or None."""
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token.strip():
+        return None
+    return token.strip()
@@ -0,0 +1,5 @@
+from app.asgi import AsyncApp  # Import the ASGI wrapper of the Flask app
+from run import app as flask_app  # Import the Flask application instance and its extra routes
+
+# Serve the Flask application from an event loop, e.g. with: uvicorn asgi:app --port 8080
+app = AsyncApp(flask_app)
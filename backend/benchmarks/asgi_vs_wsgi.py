@@ -0,0 +1,144 @@
+"""
+Load test comparing the threaded WSGI server with the ASGI serving mode.
+
+Seeds a temporary database, starts each server in turn on it, opens a number of idle
+keep-alive connections, then has concurrent clients fetch a list's item tree with a
+bearer token for a fixed duration. Prints the throughput and latency percentiles of
+each mode.
+
+Run from backend/:
+    python benchmarks/asgi_vs_wsgi.py --concurrency 32 --duration 10
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+from app.models import User, TodoList, TodoItem  # noqa: E402
+from app.tokens import issue_token  # noqa: E402
+
+SERVERS = {
+    'wsgi': [sys.executable, '-m', 'flask', '--app', 'run', 'run', '--with-threads', '--port', '{port}'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:app', '--log-level', 'warning', '--port', '{port}'],
+}
+
+
+def seed(database_uri, items):
+    """Creates a user with one list of the given number of items, and returns (list ID, access token)."""
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_uri})
+    with app.app_context():
+        user = User(username='loadtest', email='loadtest@example.com', password='unused')
+        todo_list = TodoList(title='Load test', owner=user)
+        db.session.add(user)
+        db.session.flush()
+        db.session.execute(db.insert(TodoItem), [
+            {'content': f'Item {i}', 'list_id': todo_list.id, 'level': 1, 'path': '/'} for i in range(items)
+        ])
+        db.session.commit()
+        with app.test_request_context():
+            return todo_list.id, issue_token(user, 'access')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_listening(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+def percentile(latencies, fraction):
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] if latencies else 0.0
+
+
+def run_load(port, path, token, concurrency, duration, idle_connections):
+    """Opens the idle connections, then runs the clients and returns the measured latencies."""
+    idle = [socket.create_connection(('127.0.0.1', port)) for _ in range(idle_connections)]
+    latencies, errors, lock = [], [0], threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        local = []
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers={'Authorization': f'Bearer {token}'})
+                response = connection.getresponse()
+                response.read()
+                ok = response.status == 200
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection('127.0.0.1', port)
+                ok = False
+            if ok:
+                local.append(time.perf_counter() - started)
+            else:
+                with lock:
+                    errors[0] += 1
+        connection.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for sock in idle:
+        sock.close()
+    return sorted(latencies), errors[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=32, help='concurrent clients')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of load per mode')
+    parser.add_argument('--items', type=int, default=200, help='items in the fetched list')
+    parser.add_argument('--idle-connections', type=int, default=100, help='idle keep-alive connections held open')
+    parser.add_argument('--modes', nargs='+', choices=SERVERS, default=list(SERVERS))
+    args = parser.parse_args()
+
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as directory:
+        database_uri = f"sqlite:///{os.path.join(directory, 'load.db')}"
+        list_id, token = seed(database_uri, args.items)
+        path = f'/lists/{list_id}/items'
+
+        print(f'{"mode":<6}{"requests/s":>12}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"errors":>8}')
+        for mode in args.modes:
+            port = free_port()
+            command = [part.format(port=port) for part in SERVERS[mode]]
+            server = subprocess.Popen(command, cwd=backend, env={**os.environ, 'DATABASE_URL': database_uri},
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_until_listening(port)
+                latencies, errors = run_load(port, path, token, args.concurrency, args.duration,
+                                             args.idle_connections)
+            finally:
+                server.terminate()
+                server.wait()
+            print(f'{mode:<6}{len(latencies) / args.duration:>12.1f}'
+                  + ''.join(f'{percentile(latencies, q) * 1000:>10.2f}' for q in (0.5, 0.95, 0.99))
+                  + f'{errors:>8}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Benchmark of the JSON serialization of item trees, as GET /lists/<id>/items does it.
+
+Builds trees of each size in memory (three levels, ten children per item) and times, for
+each JSON provider, building the nested dictionaries and encoding them into a response.
+'default' is Flask's DefaultJSONProvider, which produced every response before
+JSONProvider; 'json' and 'orjson' are the two encoders of JSONProvider. Each output is
+checked against the default provider's, and the best time of the repeats is printed.
+
+Run from backend/:
+    python benchmarks/json_serialization.py --sizes 1000 10000 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask.json.provider import DefaultJSONProvider  # noqa: E402
+from app import create_app, serialization  # noqa: E402
+from app.models import TodoItem  # noqa: E402
+from app.operations import serialize_item_tree  # noqa: E402
+from app.serialization import JSONProvider  # noqa: E402
+
+
+def build_items(size, children_per_item=10):
+    """Returns a flat list of size transient items forming three-level trees, ordered by ID."""
+    items = []
+    created_at = datetime(2024, 1, 1)
+
+    def add(level, parent_id):
+        item_id = len(items) + 1
+        items.append(TodoItem(id=item_id, content=f'Item {item_id}', completed=item_id % 3 == 0, collapsed=False,
+                              level=level, parent_id=parent_id, created_at=created_at + timedelta(seconds=item_id),
+                              child_count=0, open_child_count=0))
+        return item_id
+
+    while len(items) < size:
+        root_id = add(1, None)
+        for _ in range(children_per_item):
+            if len(items) == size:
+                break
+            child_id = add(2, root_id)
+            for _ in range(children_per_item):
+                if len(items) == size:
+                    break
+                add(3, child_id)
+    return items
+
+
+def time_best(func, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help='items per tree')
+    parser.add_argument('--repeats', type=int, default=5, help='runs per measurement; the best is kept')
+    args = parser.parse_args()
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+    providers = {'default': DefaultJSONProvider(app)}
+    for encoder in ('json', 'orjson'):
+        if encoder == 'orjson' and serialization.orjson is None:
+            print('orjson is not installed, skipping it')
+            continue
+        app.config['JSON_ENCODER'] = encoder
+        providers[encoder] = JSONProvider(app)
+
+    print(f'{"items":>8}{"provider":>10}{"dicts ms":>10}{"encode ms":>11}{"total ms":>10}{"speedup":>9}{"bytes":>11}')
+    with app.app_context():
+        for size in args.sizes:
+            items = build_items(size)
+            dicts_time, tree = time_best(lambda: serialize_item_tree(items), args.repeats)
+            expected, baseline = None, None
+            for name, provider in providers.items():
+                encode_time, response = time_best(lambda: provider.response(tree), args.repeats)
+                body = response.get_data()
+                if expected is None:
+                    expected, baseline = json.loads(body), dicts_time + encode_time
+                elif json.loads(body) != expected:
+                    raise AssertionError(f'{name} output differs from the default provider')
+                total = dicts_time + encode_time
+                print(f'{size:>8}{name:>10}{dicts_time * 1000:>10.1f}{encode_time * 1000:>11.1f}'
+                      f'{total * 1000:>10.1f}{baseline / total:>8.2f}x{len(body):>11}')
+
+
+if __name__ == '__main__':
+    main()
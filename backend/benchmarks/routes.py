@@ -0,0 +1,200 @@
+"""
+Benchmark of the main routes, run through the test client against a seeded database.
+
+Seeds a temporary SQLite database with seed_data (the generator behind 'flask seed'),
+then times each scenario in turn: POST /login, GET /lists/<id>/items over the seeded
+lists, POST /lists/<id>/items, PUT /items/<id>/complete on the items just created, and
+DELETE /lists/<id> over the seeded lists. Requests are sent one at a time, so the numbers
+measure the cost of the app itself, without a server or concurrency. Prints the
+throughput and latency percentiles of each scenario and saves them, with the settings
+and the git commit, as JSON; --compare prints the change against an earlier run.
+
+Run from backend/:
+    python benchmarks/routes.py --requests 500 --output results.json
+    python benchmarks/routes.py --requests 500 --compare results.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app  # noqa: E402
+from app.seed import seed_data  # noqa: E402
+from app.tokens import issue_token  # noqa: E402
+from app.models import User  # noqa: E402
+
+SCENARIOS = ('login', 'get_items', 'create_item', 'complete_item', 'delete_list')
+
+
+def percentile(latencies, fraction):
+    """Returns the nearest-rank percentile of sorted latencies."""
+    return latencies[min(len(latencies) - 1, int(len(latencies) * fraction))] if latencies else 0.0
+
+
+def git_commit():
+    """Returns the commit the benchmark runs on, or None outside a git checkout."""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scenario(requests, warmup):
+    """
+    Sends the requests of a scenario and returns its measurements.
+
+    requests is a list of callables each sending one request and returning its response;
+    the first warmup of them are sent but not measured.
+    """
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for index, send in enumerate(requests):
+        if index == warmup:
+            started = time.perf_counter()
+        request_started = time.perf_counter()
+        response = send()
+        elapsed = time.perf_counter() - request_started
+        if index < warmup:
+            continue
+        if response.status_code >= 400:
+            errors += 1
+        latencies.append(elapsed)
+    duration = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput': len(latencies) / duration if duration else 0.0,
+        'p50_ms': percentile(latencies, 0.5) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+        'mean_ms': sum(latencies) / len(latencies) * 1000 if latencies else 0.0
+    }
+
+
+def build_scenarios(app, client, seeded, args):
+    """Returns, per scenario, a function creating its requests; each runs after the previous one."""
+    usernames = seeded['usernames']
+    with app.test_request_context():
+        users = User.query.filter(User.username.in_(usernames)).all()
+        headers = {user.username: {'Authorization': f"Bearer {issue_token(user, 'access')}"} for user in users}
+    owned_lists = [(username, list_id) for username in usernames for list_id in seeded['list_ids'][username]]
+    total = args.warmup + args.requests
+    created = []
+
+    def login():
+        # A client of its own, so the session cookie of the logins does not override the bearer tokens
+        login_client = app.test_client()
+        return [lambda i=i: login_client.post('/login', json={'username': usernames[i % len(usernames)],
+                                                              'password': args.password})
+                for i in range(total)]
+
+    def get_items():
+        return [lambda username=username, list_id=list_id: client.get(f'/lists/{list_id}/items',
+                                                                       headers=headers[username])
+                for username, list_id in (owned_lists[i % len(owned_lists)] for i in range(total))]
+
+    def create_item():
+        def send(username, list_id):
+            response = client.post(f'/lists/{list_id}/items', json={'content': 'Benchmark item'},
+                                   headers=headers[username])
+            if response.status_code == 201:
+                created.append((username, response.get_json()['id']))
+            return response
+        return [lambda target=owned_lists[i % len(owned_lists)]: send(*target) for i in range(total)]
+
+    def complete_item():
+        return [lambda username=username, item_id=item_id: client.put(f'/items/{item_id}/complete',
+                                                                       headers=headers[username])
+                for username, item_id in created[:total]]
+
+    def delete_list():
+        return [lambda username=username, list_id=list_id: client.delete(f'/lists/{list_id}',
+                                                                          headers=headers[username])
+                for username, list_id in owned_lists[:total]]
+
+    return {'login': login, 'get_items': get_items, 'create_item': create_item, 'complete_item': complete_item,
+            'delete_list': delete_list}
+
+
+def print_comparison(results, baseline):
+    """Prints the change of each scenario's throughput and percentiles against a baseline run."""
+    print(f'\nCompared with {baseline.get("commit") or "baseline"} ({baseline.get("timestamp")}):')
+    print(f'{"scenario":<15}{"req/s":>10}{"p50":>10}{"p95":>10}{"p99":>10}')
+    for name, result in results['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        changes = [(result[key] / before[key] - 1) * 100 if before[key] else 0.0
+                   for key in ('throughput', 'p50_ms', 'p95_ms', 'p99_ms')]
+        print(f'{name:<15}' + ''.join(f'{change:>+9.1f}%' for change in changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per scenario')
+    parser.add_argument('--warmup', type=int, default=10, help='requests sent before measuring each scenario')
+    parser.add_argument('--scenarios', nargs='+', choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument('--users', type=int, default=10, help='seeded users')
+    parser.add_argument('--lists', type=int, default=30, help='seeded lists per user')
+    parser.add_argument('--items', type=int, default=10, help='seeded top-level items per list')
+    parser.add_argument('--children', type=int, default=4, help='seeded subtasks per item')
+    parser.add_argument('--depth', type=int, default=3, help='levels of the seeded trees')
+    parser.add_argument('--password', default='password', help='password of the seeded users')
+    parser.add_argument('--seed', type=int, default=0, help='random seed of the seeded data')
+    parser.add_argument('--bcrypt-rounds', type=int, default=None,
+                        help='bcrypt cost of the seeded passwords (BCRYPT_LOG_ROUNDS by default)')
+    parser.add_argument('--output', help='file to save the results to, as JSON')
+    parser.add_argument('--compare', help='results file of an earlier run to compare with')
+    args = parser.parse_args()
+    if 'complete_item' in args.scenarios and 'create_item' not in args.scenarios:
+        parser.error('the complete_item scenario completes the items of the create_item scenario')
+
+    with tempfile.TemporaryDirectory() as directory:
+        config = {'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(directory, 'benchmark.db')}"}
+        if args.bcrypt_rounds is not None:
+            config['BCRYPT_LOG_ROUNDS'] = args.bcrypt_rounds
+        app = create_app(config)
+        with app.app_context():
+            seeded = seed_data(args.users, args.lists, args.items, args.children, args.depth,
+                               password=args.password, seed=args.seed)
+        client = app.test_client()
+        scenarios = build_scenarios(app, client, seeded, args)
+
+        results = {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'settings': {key: value for key, value in vars(args).items() if key not in ('output', 'compare')},
+            'seeded': {'users': len(seeded['usernames']), 'lists': args.users * args.lists, 'items': seeded['items']},
+            'scenarios': {}
+        }
+        print(f'Seeded {results["seeded"]["items"]} items in {results["seeded"]["lists"]} lists')
+        print(f'{"scenario":<15}{"requests":>10}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"p99 ms":>10}{"errors":>8}')
+        for name in SCENARIOS:
+            if name not in args.scenarios:
+                continue
+            requests = scenarios[name]()  # Built in turn, so complete_item gets the items create_item created
+            result = results['scenarios'][name] = run_scenario(requests, args.warmup)
+            print(f'{name:<15}{result["requests"]:>10}{result["throughput"]:>10.1f}{result["p50_ms"]:>10.2f}'
+                  f'{result["p95_ms"]:>10.2f}{result["p99_ms"]:>10.2f}{result["errors"]:>8}')
+
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f'Saved results to {args.output}')
+    if args.compare:
+        with open(args.compare) as file:
+            print_comparison(results, json.load(file))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import os
+import pytest
+
+# Every test app checks the query budgets the views declare, so a view that starts running
+# more SQL statements (an N+1 lazy load, say) fails the route tests that exercise it
+os.environ.setdefault('QUERY_BUDGET_MODE', 'raise')
+
+from app import create_app, db  # noqa: E402
+from app.query_budget import StatementCounter, assert_max_queries  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """An app on an in-memory database, with its app context pushed and its tables created."""
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def count_queries(app):
+    """
+    Returns a factory of StatementCounter on the app's engine, e.g.:
+        with count_queries() as counter:
+            client.get('/lists')
+        assert counter.count == 2
+    """
+    return lambda: StatementCounter(db.engine)
+
+
+@pytest.fixture
+def max_queries(app):
+    """
+    Returns a context manager factory failing the test if its block runs more than the given
+    number of SQL statements, e.g. `with max_queries(3): client.get('/lists')`.
+    """
+    return lambda max_statements: assert_max_queries(db.engine, max_statements, name='Test block')
@@ -0,0 +1,154 @@
+import asyncio
+import contextvars
+import json
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from app.asgi import AsyncApp, async_database_url
+from app.models import User, TodoList, TodoItem
+from app.tokens import issue_token
+
+
+class TestAsyncApp(unittest.TestCase):
+    """
+    Test suite for the ASGI serving mode.
+
+    The async engine cannot share an in-memory database with the Flask app's engine, so
+    these tests use a temporary database file.
+    """
+
+    def setUp(self):
+        """Set up an app on a temporary database, with a user, a list and its ASGI wrapper."""
+        fd, self.db_path = tempfile.mkstemp(suffix='.db')
+        os.close(fd)
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.db_path}'})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+
+        self.user = User(username='testuser', email='test@example.com', password='password')
+        self.todo_list = TodoList(title='List', owner=self.user)
+        parent = TodoItem(content='Parent', todo_list=self.todo_list)
+        TodoItem(content='Child', todo_list=self.todo_list, parent=parent, level=2)
+        TodoItem(content='Other', todo_list=self.todo_list)
+        db.session.add(self.user)
+        db.session.commit()
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = self.user.id
+        with self.app.test_request_context():
+            self.token = issue_token(self.user, 'access')
+
+        self.loop = asyncio.new_event_loop()
+        self.asgi = AsyncApp(self.app)
+
+    def tearDown(self):
+        """Clean up the engines, the event loop and the database file."""
+        self.loop.run_until_complete(self.asgi.engine.dispose())
+        self.loop.close()
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        os.remove(self.db_path)
+
+    def request(self, method, path, query='', headers=None, body=None, token=True):
+        """
+        Sends a request to the ASGI app.
+
+        Returns:
+            A (status, headers, body) tuple; header names are lower-cased.
+        """
+        headers = dict(headers or {})
+        if token:
+            headers['Authorization'] = f'Bearer {self.token}'
+        data = json.dumps(body).encode() if body is not None else b''
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+            headers['Content-Length'] = str(len(data))
+        scope = {
+            'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+            'http_version': '1.1', 'scheme': 'http', 'server': ('localhost', 80), 'client': ('127.0.0.1', 1234),
+            'headers': [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': data, 'more_body': False}
+
+        async def send(message):
+            messages.append(message)
+
+        # Run in an empty context, as under an ASGI server, rather than in the test's app context
+        contextvars.Context().run(self.loop.run_until_complete, self.asgi(scope, receive, send))
+        start = messages[0]
+        response_headers = {name.decode(): value.decode() for name, value in start['headers']}
+        return start['status'], response_headers, b''.join(m.get('body', b'') for m in messages[1:])
+
+    def test_async_database_url(self):
+        """Test that the async engine uses the app's database with an async driver."""
+        url = async_database_url(self.app)
+        self.assertEqual(url.drivername, 'sqlite+aiosqlite')
+        self.assertEqual(url.database, self.db_path)
+
+    def test_get_items_matches_blueprint(self):
+        """Test that the async view returns the same body and ETag as the Flask route."""
+        expected = self.client.get(f'/lists/{self.todo_list.id}/items')
+        status, headers, body = self.request('GET', f'/lists/{self.todo_list.id}/items')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), expected.get_json())
+        self.assertEqual(headers['etag'], expected.headers['ETag'])
+        self.assertEqual(headers['access-control-allow-credentials'], 'true')
+
+        status, _, body = self.request('GET', f'/lists/{self.todo_list.id}/items',
+                                       headers={'If-None-Match': headers['etag']})
+        self.assertEqual(status, 304)
+        self.assertEqual(body, b'')
+
+    def test_get_items_paginated(self):
+        """Test that the async view paginates top-level items with their subtrees."""
+        status, _, body = self.request('GET', f'/lists/{self.todo_list.id}/items', query='limit=1')
+        page = json.loads(body)
+        self.assertEqual(status, 200)
+        self.assertEqual([item['content'] for item in page['items']], ['Parent'])
+        self.assertEqual(page['items'][0]['children'][0]['content'], 'Child')
+
+        status, _, body = self.request('GET', f'/lists/{self.todo_list.id}/items',
+                                       query=f"cursor={page['next_cursor']}")
+        self.assertEqual([item['content'] for item in json.loads(body)['items']], ['Other'])
+        self.assertEqual(self.request('GET', '/lists', query='limit=0')[0], 400)
+
+    def test_get_lists_with_session_cookie(self):
+        """Test that the async views accept the Flask session cookie."""
+        cookie = self.client.get_cookie('session').value
+        status, _, body = self.request('GET', '/lists', headers={'Cookie': f'session={cookie}'}, token=False)
+        self.assertEqual(status, 200)
+        self.assertEqual([todo_list['title'] for todo_list in json.loads(body)], ['List'])
+
+    def test_get_lists_with_stats_matches_blueprint(self):
+        """Test that the async view returns the same list totals and ETag as the Flask route."""
+        expected = self.client.get('/lists?stats=true')
+        status, headers, body = self.request('GET', '/lists', query='stats=true')
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), expected.get_json())
+        self.assertEqual(json.loads(body)[0]['stats'], {'item_count': 3, 'completed_count': 0, 'top_level_count': 2})
+        self.assertEqual(headers['etag'], expected.headers['ETag'])
+
+    def test_ownership_and_missing_list(self):
+        """Test that other users' lists are forbidden and missing lists are not found."""
+        other = User(username='other', email='other@example.com', password='password')
+        other_list = TodoList(title='Other', owner=other)
+        db.session.add(other)
+        db.session.commit()
+        self.assertEqual(self.request('GET', f'/lists/{other_list.id}/items')[0], 403)
+        self.assertEqual(self.request('GET', '/lists/9999/items')[0], 404)
+
+    def test_other_requests_are_served_by_flask(self):
+        """Test that writes and unauthenticated requests fall back to the Flask app."""
+        status, _, body = self.request('POST', '/lists', body={'title': 'New'})
+        self.assertEqual(status, 201)
+        self.assertEqual(json.loads(body)['title'], 'New')
+        self.assertEqual(self.request('GET', '/lists', token=False)[0], 401)
+
+
+if __name__ == '__main__':
+    unittest.main()
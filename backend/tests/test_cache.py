@@ -0,0 +1,109 @@
+import unittest
+from app.cache import ByteBudgetLRU, TTLCache
+
+
+class TestByteBudgetLRU(unittest.TestCase):
+    """
+    Test suite for the byte-budgeted LRU cache.
+    """
+
+    def test_get_and_set(self):
+        """Test that values are returned for the version they were stored with."""
+        cache = ByteBudgetLRU(100)
+        cache.set(1, 1, b'tree')
+        self.assertEqual(cache.get(1, 1), b'tree')
+        self.assertIsNone(cache.get(1, 2))  # Stale version
+        self.assertIsNone(cache.get(2, 1))  # Unknown key
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (1, 2))
+
+    def test_replace_keeps_size(self):
+        """Test that storing a key again replaces its previous value."""
+        cache = ByteBudgetLRU(100)
+        cache.set(1, 1, b'x' * 40)
+        cache.set(1, 2, b'x' * 30)
+        self.assertEqual(cache.stats()['bytes'], 30)
+        self.assertEqual(cache.stats()['entries'], 1)
+
+    def test_eviction_by_size(self):
+        """Test that least recently used entries are evicted once the byte budget is exceeded."""
+        cache = ByteBudgetLRU(100)
+        cache.set(1, 1, b'x' * 40)
+        cache.set(2, 1, b'x' * 40)
+        cache.get(1, 1)  # Key 2 is now the least recently used
+        cache.set(3, 1, b'x' * 40)
+
+        self.assertIsNotNone(cache.get(1, 1))
+        self.assertIsNone(cache.get(2, 1))
+        self.assertIsNotNone(cache.get(3, 1))
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['bytes'], 80)
+
+    def test_oversized_value_is_not_stored(self):
+        """Test that a value larger than the whole budget is not cached."""
+        cache = ByteBudgetLRU(10)
+        cache.set(1, 1, b'x' * 11)
+        self.assertIsNone(cache.get(1, 1))
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+    def test_invalidate(self):
+        """Test that invalidated keys are dropped."""
+        cache = ByteBudgetLRU(100)
+        cache.set(1, 1, b'tree')
+        cache.set(2, 1, b'tree')
+        cache.invalidate(1, 3)
+        self.assertIsNone(cache.get(1, 1))
+        self.assertEqual(cache.get(2, 1), b'tree')
+        self.assertEqual(cache.stats()['bytes'], 4)
+
+    def test_hit_rate(self):
+        """Test that the hit rate is reported, and is zero before the first lookup."""
+        cache = ByteBudgetLRU(100)
+        self.assertEqual(cache.stats()['hit_rate'], 0.0)
+        cache.set(1, 1, b'tree')
+        cache.get(1, 1)
+        cache.get(2, 1)
+        self.assertEqual(cache.stats()['hit_rate'], 0.5)
+
+
+class TestTTLCache(unittest.TestCase):
+    """
+    Test suite for the expiring LRU cache.
+    """
+
+    def setUp(self):
+        self.now = 0
+        self.cache = TTLCache(2, 60, clock=lambda: self.now)
+
+    def test_get_and_set(self):
+        """Test that stored values are returned until they expire."""
+        self.cache.set(1, 'user')
+        self.now = 59
+        self.assertEqual(self.cache.get(1), 'user')
+        self.now = 60
+        self.assertIsNone(self.cache.get(1))
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['expirations'], stats['entries']), (1, 1, 1, 0))
+
+    def test_eviction_by_count(self):
+        """Test that the least recently used entry is evicted once the cache is full."""
+        self.cache.set(1, 'a')
+        self.cache.set(2, 'b')
+        self.cache.get(1)  # Key 2 is now the least recently used
+        self.cache.set(3, 'c')
+
+        self.assertEqual(self.cache.get(1), 'a')
+        self.assertIsNone(self.cache.get(2))
+        self.assertEqual(self.cache.get(3), 'c')
+        self.assertEqual(self.cache.stats()['evictions'], 1)
+
+    def test_invalidate(self):
+        """Test that invalidated keys are dropped."""
+        self.cache.set(1, 'a')
+        self.cache.set(2, 'b')
+        self.cache.invalidate(1, 3)
+        self.assertIsNone(self.cache.get(1))
+        self.assertEqual(self.cache.get(2), 'b')
+
+
+if __name__ == '__main__':
+    unittest.main()
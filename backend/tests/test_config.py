@@ -30,6 +30,26 @@ class TestConfig(unittest.TestCase):
         """Tests the JWT_ACCESS_TOKEN_EXPIRES configuration."""
         self.assertEqual(Config.JWT_ACCESS_TOKEN_EXPIRES, timedelta(hours=1))
 
+    def test_database_profile(self):
+        """Tests the DATABASE_PROFILE, DATABASE_POOL_SIZE and DATABASE_MAX_OVERFLOW configuration."""
+        self.assertEqual(Config.DATABASE_PROFILE, os.environ.get('DATABASE_PROFILE') or 'development')
+        self.assertEqual(Config.DATABASE_POOL_SIZE, int(os.environ.get('DATABASE_POOL_SIZE') or 10))
+        self.assertEqual(Config.DATABASE_MAX_OVERFLOW, int(os.environ.get('DATABASE_MAX_OVERFLOW') or 20))
+
+    def test_sqlite_pragmas(self):
+        """Tests the SQLITE_BUSY_TIMEOUT, SQLITE_MMAP_SIZE and SQLITE_CACHE_SIZE configuration."""
+        self.assertEqual(Config.SQLITE_BUSY_TIMEOUT, int(os.environ.get('SQLITE_BUSY_TIMEOUT') or 5000))
+        self.assertEqual(Config.SQLITE_MMAP_SIZE, int(os.environ.get('SQLITE_MMAP_SIZE') or 256 * 1024 * 1024))
+        self.assertEqual(Config.SQLITE_CACHE_SIZE, int(os.environ.get('SQLITE_CACHE_SIZE') or 64 * 1024 * 1024))
+
+    def test_sqlalchemy_async_database_uri(self):
+        """Tests the SQLALCHEMY_ASYNC_DATABASE_URI configuration."""
+        self.assertEqual(Config.SQLALCHEMY_ASYNC_DATABASE_URI, os.environ.get('ASYNC_DATABASE_URL'))
+
+    def test_jwt_refresh_token_expires(self):
+        """Tests the JWT_REFRESH_TOKEN_EXPIRES configuration."""
+        self.assertEqual(Config.JWT_REFRESH_TOKEN_EXPIRES, timedelta(days=30))
+
     def test_permanent_session_lifetime(self):
         """Tests the PERMANENT_SESSION_LIFETIME configuration."""
         self.assertEqual(Config.PERMANENT_SESSION_LIFETIME, timedelta(days=30))
@@ -38,6 +58,67 @@ class TestConfig(unittest.TestCase):
         """Tests the SESSION_PERMANENT configuration."""
         self.assertTrue(Config.SESSION_PERMANENT)
 
+    def test_batch_max_operations(self):
+        """Tests the BATCH_MAX_OPERATIONS configuration."""
+        self.assertEqual(Config.BATCH_MAX_OPERATIONS, int(os.environ.get('BATCH_MAX_OPERATIONS') or 500))
+
+    def test_import_max_items(self):
+        """Tests the IMPORT_MAX_ITEMS configuration."""
+        self.assertEqual(Config.IMPORT_MAX_ITEMS, int(os.environ.get('IMPORT_MAX_ITEMS') or 10000))
+
+    def test_page_max_size(self):
+        """Tests the PAGE_MAX_SIZE configuration."""
+        self.assertEqual(Config.PAGE_MAX_SIZE, int(os.environ.get('PAGE_MAX_SIZE') or 200))
+
+    def test_json_encoder(self):
+        """Tests the JSON_ENCODER configuration."""
+        self.assertEqual(Config.JSON_ENCODER, os.environ.get('JSON_ENCODER') or 'auto')
+
+    def test_tree_cache_max_bytes(self):
+        """Tests the TREE_CACHE_MAX_BYTES configuration."""
+        self.assertEqual(Config.TREE_CACHE_MAX_BYTES, int(os.environ.get('TREE_CACHE_MAX_BYTES') or 64 * 1024 * 1024))
+
+    def test_export_batch_size(self):
+        """Tests the EXPORT_BATCH_SIZE configuration."""
+        self.assertEqual(Config.EXPORT_BATCH_SIZE, int(os.environ.get('EXPORT_BATCH_SIZE') or 1000))
+
+    def test_max_nesting_level(self):
+        """Tests the MAX_NESTING_LEVEL configuration."""
+        self.assertEqual(Config.MAX_NESTING_LEVEL, int(os.environ.get('MAX_NESTING_LEVEL') or 3))
+
+    def test_events(self):
+        """Tests the EVENTS_BACKEND, EVENTS_QUEUE_SIZE and EVENTS_HEARTBEAT_INTERVAL configuration."""
+        self.assertEqual(Config.EVENTS_BACKEND, os.environ.get('EVENTS_BACKEND') or 'app.events.MemoryBackend')
+        self.assertEqual(Config.EVENTS_QUEUE_SIZE, int(os.environ.get('EVENTS_QUEUE_SIZE') or 100))
+        self.assertEqual(Config.EVENTS_HEARTBEAT_INTERVAL, float(os.environ.get('EVENTS_HEARTBEAT_INTERVAL') or 15))
+
+    def test_metrics_enabled(self):
+        """Tests the METRICS_ENABLED configuration."""
+        self.assertEqual(Config.METRICS_ENABLED, int(os.environ.get('METRICS_ENABLED') or 0))
+
+    def test_query_budget_mode(self):
+        """Tests the QUERY_BUDGET_MODE configuration."""
+        self.assertEqual(Config.QUERY_BUDGET_MODE, os.environ.get('QUERY_BUDGET_MODE') or 'off')
+
+    def test_profiler(self):
+        """Tests the PROFILER_ENABLED and PROFILER_DIR configuration."""
+        self.assertEqual(Config.PROFILER_ENABLED, int(os.environ.get('PROFILER_ENABLED') or 0))
+        self.assertEqual(Config.PROFILER_DIR, os.environ.get('PROFILER_DIR'))
+
+    def test_bcrypt_log_rounds(self):
+        """Tests the BCRYPT_LOG_ROUNDS configuration."""
+        self.assertEqual(Config.BCRYPT_LOG_ROUNDS, int(os.environ.get('BCRYPT_LOG_ROUNDS') or 12))
+
+    def test_password_hash_pool(self):
+        """Tests the PASSWORD_HASH_WORKERS and PASSWORD_HASH_QUEUE_SIZE configuration."""
+        self.assertEqual(Config.PASSWORD_HASH_WORKERS, int(os.environ.get('PASSWORD_HASH_WORKERS') or 4))
+        self.assertEqual(Config.PASSWORD_HASH_QUEUE_SIZE, int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE') or 16))
+
+    def test_user_cache(self):
+        """Tests the USER_CACHE_SIZE and USER_CACHE_TTL configuration."""
+        self.assertEqual(Config.USER_CACHE_SIZE, int(os.environ.get('USER_CACHE_SIZE') or 10000))
+        self.assertEqual(Config.USER_CACHE_TTL, int(os.environ.get('USER_CACHE_TTL') or 60))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,130 @@
+import os
+import tempfile
+import threading
+import unittest
+from app import create_app, db
+from app.models import User, TodoList, TodoItem
+
+
+class TestDatabaseProfile(unittest.TestCase):
+    """
+    Test suite for the database profiles.
+
+    Pragmas and pooling only apply to database files, so these tests use a temporary one.
+    """
+
+    def setUp(self):
+        """Create a temporary database file."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.database_uri = f"sqlite:///{os.path.join(self.directory.name, 'test.db')}"
+
+    def tearDown(self):
+        """Remove the temporary database file."""
+        self.directory.cleanup()
+
+    def create_app(self, profile, **config):
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': self.database_uri,
+                          'DATABASE_PROFILE': profile, **config})
+        self.addCleanup(self.dispose, app)
+        return app
+
+    def dispose(self, app):
+        with app.app_context():
+            db.engine.dispose()
+
+    def pragma(self, name):
+        return db.session.execute(db.text(f'PRAGMA {name}')).scalar()
+
+    def test_production_pragmas(self):
+        """Test that the production profile sets its pragmas on every connection."""
+        app = self.create_app('production', SQLITE_BUSY_TIMEOUT=1234)
+        with app.app_context():
+            self.assertEqual(self.pragma('journal_mode'), 'wal')
+            self.assertEqual(self.pragma('busy_timeout'), 1234)
+            self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+            self.assertEqual(self.pragma('mmap_size'), 256 * 1024 * 1024)
+            self.assertEqual(self.pragma('cache_size'), -64 * 1024)
+            self.assertEqual(self.pragma('foreign_keys'), 1)
+            self.assertEqual(db.engine.pool.size(), 10)
+
+    def test_development_profile(self):
+        """Test that the development profile keeps the driver defaults."""
+        app = self.create_app('development')
+        with app.app_context():
+            self.assertEqual(self.pragma('journal_mode'), 'delete')
+            self.assertEqual(self.pragma('foreign_keys'), 0)
+            self.assertEqual(app.config['SQLALCHEMY_ENGINE_OPTIONS'], {})
+
+    def test_in_memory_database_keeps_default_pool(self):
+        """Test that the production profile does not size the pool of an in-memory database."""
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                          'DATABASE_PROFILE': 'production'})
+        self.assertEqual(app.config['SQLALCHEMY_ENGINE_OPTIONS'], {})
+
+    def test_unknown_profile(self):
+        """Test that an unknown profile is rejected."""
+        with self.assertRaises(ValueError):
+            self.create_app('fast')
+
+    def test_delete_list_with_moved_subtasks(self):
+        """Test that deleting lists whose trees were moved between them satisfies the foreign keys."""
+        app = self.create_app('production')
+        with app.app_context():
+            user = User(username='testuser', email='test@example.com', password='password')
+            first, second = TodoList(title='First', owner=user), TodoList(title='Second', owner=user)
+            moved = TodoItem(content='Moved', todo_list=first)
+            child = TodoItem(content='Child', todo_list=first, parent=moved, level=2)
+            db.session.add(user)
+            db.session.commit()
+            user_id, first_id, second_id, moved_id, child_id = user.id, first.id, second.id, moved.id, child.id
+            db.session.remove()
+
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['_user_id'] = user_id
+            self.assertEqual(client.put(f'/items/{moved_id}', json={'list_id': second_id}).status_code, 200)
+            self.assertEqual(client.delete(f'/lists/{first_id}').status_code, 200)
+            self.assertEqual(db.session.get(TodoItem, child_id).list_id, second_id)
+            self.assertEqual(client.delete(f'/lists/{second_id}').status_code, 200)
+            self.assertEqual(TodoItem.query.count(), 0)
+
+    def test_concurrent_reads_and_writes(self):
+        """Stress test: concurrent writers and readers on one database file all succeed."""
+        app = self.create_app('production')
+        with app.app_context():
+            user = User(username='testuser', email='test@example.com', password='password')
+            todo_list = TodoList(title='List', owner=user)
+            db.session.add(user)
+            db.session.commit()
+            user_id, list_id = user.id, todo_list.id
+
+        writers, readers, writes_each = 8, 8, 25
+        errors = []
+
+        def worker(write):
+            client = app.test_client()
+            with client.session_transaction() as sess:
+                sess['_user_id'] = user_id
+            for i in range(writes_each):
+                if write:
+                    response = client.post(f'/lists/{list_id}/items', json={'content': f'Item {i}'})
+                    expected = 201
+                else:
+                    response = client.get(f'/lists/{list_id}/items')
+                    expected = 200
+                if response.status_code != expected:
+                    errors.append(response.get_data(as_text=True))
+
+        threads = [threading.Thread(target=worker, args=(i < writers,)) for i in range(writers + readers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        with app.app_context():
+            self.assertEqual(TodoItem.query.filter_by(list_id=list_id).count(), writers * writes_each)
+
+
+if __name__ == '__main__':
+    unittest.main()
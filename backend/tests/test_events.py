@@ -0,0 +1,253 @@
+import json
+import unittest
+from flask import url_for
+from app import create_app, db, event_broker
+from app.events import EventBackend, MemoryBackend
+from app.models import User, TodoList, TodoItem
+
+
+class RecordingBackend(MemoryBackend):
+    """Backend keeping every published message, to test that EVENTS_BACKEND is used."""
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.published = []
+
+    def publish(self, channel, message):
+        self.published.append((channel, message))
+        super().publish(channel, message)
+
+
+class PublishOnlyBackend(EventBackend):
+    """Backend missing subscribe and unsubscribe."""
+
+    def publish(self, channel, message):
+        pass
+
+
+class TestMemoryBackend(unittest.TestCase):
+    """
+    Test suite for the in-process event backend.
+    """
+
+    def setUp(self):
+        self.backend = MemoryBackend({'EVENTS_QUEUE_SIZE': 2})
+
+    def test_publish_reaches_subscribers_of_channel(self):
+        """Test that a message reaches every subscriber of its channel and no other."""
+        first, second = self.backend.subscribe('list:1'), self.backend.subscribe('list:1')
+        other = self.backend.subscribe('list:2')
+        self.backend.publish('list:1', 'hello')
+        self.assertEqual(first.get(0), 'hello')
+        self.assertEqual(second.get(0), 'hello')
+        self.assertIsNone(other.get(0))
+
+    def test_close_unsubscribes(self):
+        """Test that a closed subscription no longer receives messages and its channel is dropped."""
+        subscription = self.backend.subscribe('list:1')
+        subscription.close()
+        subscription.close()  # Closing twice is harmless
+        self.backend.publish('list:1', 'hello')
+        self.assertIsNone(subscription.get(0))
+        self.assertEqual(self.backend.subscriptions, {})
+
+    def test_overflow(self):
+        """Test that a subscriber falling behind by more than the queue size is marked as overflowed."""
+        subscription = self.backend.subscribe('list:1')
+        self.backend.publish('list:1', 'one')
+        self.backend.publish('list:1', 'two')
+        self.assertFalse(subscription.overflowed)
+        self.backend.publish('list:1', 'three')
+        self.assertTrue(subscription.overflowed)
+        self.assertEqual([subscription.get(0), subscription.get(0)], ['one', 'two'])
+
+
+class TestListEvents(unittest.TestCase):
+    """
+    Test suite for the change events of lists and their event stream.
+    """
+
+    def setUp(self):
+        """Set up a logged in user with a list."""
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SERVER_NAME': 'localhost',  # Required for url_for
+            'EVENTS_HEARTBEAT_INTERVAL': 0.01
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        db.create_all()
+
+        self.user = User(username='testuser', email='test@example.com', password='password')
+        self.todo_list = TodoList(title='Test List', owner=self.user)
+        db.session.add(self.user)
+        db.session.commit()
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = self.user.id
+
+    def tearDown(self):
+        """Clean up the test environment after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def subscribe(self):
+        """Returns a subscription to the test list's events, closed at the end of the test."""
+        subscription = event_broker.subscribe(self.todo_list.id)
+        self.addCleanup(subscription.close)
+        return subscription
+
+    def events(self, subscription):
+        """Returns the events queued on a subscription."""
+        events = []
+        while (message := subscription.get(0)) is not None:
+            events.append(json.loads(message))
+        return events
+
+    def test_stream(self):
+        """Test that the stream sends committed changes as messages, with heartbeats in between."""
+        response = self.client.get(url_for('main.list_events', list_id=self.todo_list.id), buffered=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(response.headers['Cache-Control'], 'no-cache')
+        stream = iter(response.response)
+        self.assertEqual(next(stream), b': connected\n\n')
+        self.assertEqual(next(stream), b': heartbeat\n\n')
+
+        other = self.app.test_client()
+        with other.session_transaction() as sess:
+            sess['_user_id'] = self.user.id
+        item_id = other.post(url_for('main.create_item', list_id=self.todo_list.id),
+                             json={'content': 'New Item'}).get_json()['id']
+
+        chunk = next(stream)
+        self.assertTrue(chunk.startswith(b'data: ') and chunk.endswith(b'\n\n'))
+        event = json.loads(chunk[len('data: '):])
+        self.assertEqual(event['type'], 'item_created')
+        self.assertEqual(event['list_id'], self.todo_list.id)
+        self.assertEqual(event['item']['id'], item_id)
+        self.assertEqual(event['item']['content'], 'New Item')
+        self.assertIsNone(event['item']['parent_id'])
+
+        response.close()
+        self.assertEqual(self.app.extensions['event_broker'].subscriptions, {})
+
+    def test_stream_resync_on_overflow(self):
+        """Test that a stream falling too far behind is told to reload and ends."""
+        self.app.extensions['event_broker'].queue_size = 1
+        response = self.client.get(url_for('main.list_events', list_id=self.todo_list.id), buffered=False)
+        stream = iter(response.response)
+        next(stream)
+        for content in ('One', 'Two'):
+            self.client.post(url_for('main.create_item', list_id=self.todo_list.id), json={'content': content})
+        self.assertEqual(list(stream), [b'event: resync\ndata: {}\n\n'])
+        self.assertEqual(self.app.extensions['event_broker'].subscriptions, {})
+        response.close()
+
+    def test_stream_unauthorized(self):
+        """Test that only the owner can stream a list's events."""
+        other = User(username='other', email='other@example.com', password='password')
+        other_list = TodoList(title='Other', owner=other)
+        db.session.add(other)
+        db.session.commit()
+        response = self.client.get(url_for('main.list_events', list_id=other_list.id))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(url_for('main.list_events', list_id=999))
+        self.assertEqual(response.status_code, 404)
+
+    def test_write_routes_publish_events(self):
+        """Test that each write route publishes its change once committed."""
+        subscription = self.subscribe()
+        parent = self.client.post(url_for('main.create_item', list_id=self.todo_list.id),
+                                  json={'content': 'Parent'}).get_json()
+        child = self.client.post(url_for('main.create_item', list_id=self.todo_list.id),
+                                 json={'content': 'Child', 'parent_id': parent['id']}).get_json()
+        self.client.put(url_for('main.update_item', item_id=child['id']), json={'content': 'Renamed'})
+        self.client.put(url_for('main.complete_item', item_id=child['id']))
+        self.client.delete(url_for('main.delete_item', item_id=child['id']))
+        self.client.put(url_for('main.update_list', list_id=self.todo_list.id), json={'title': 'Renamed list'})
+
+        events = self.events(subscription)
+        self.assertEqual([event['type'] for event in events], ['item_created', 'item_created', 'item_updated',
+                                                               'item_updated', 'item_deleted', 'list_updated'])
+        self.assertEqual(events[1]['item']['parent_id'], parent['id'])
+        self.assertEqual(events[2]['item']['content'], 'Renamed')
+        self.assertTrue(events[3]['item']['completed'])
+        self.assertEqual(events[4]['item_id'], child['id'])
+        self.assertEqual(events[5]['list']['title'], 'Renamed list')
+
+        # Completing a top-level item deletes it
+        self.client.put(url_for('main.complete_item', item_id=parent['id']))
+        self.assertEqual(self.events(subscription), [
+            {'type': 'item_deleted', 'list_id': self.todo_list.id, 'item_id': parent['id']}])
+
+        self.client.delete(url_for('main.delete_list', list_id=self.todo_list.id))
+        self.assertEqual(self.events(subscription), [{'type': 'list_deleted', 'list_id': self.todo_list.id}])
+
+    def test_move_publishes_to_both_lists(self):
+        """Test that moving an item to another list is published to both lists."""
+        target = TodoList(title='Target', owner=self.user)
+        item = TodoItem(content='Item', todo_list=self.todo_list)
+        db.session.add_all([target, item])
+        db.session.commit()
+        subscription = self.subscribe()
+        target_subscription = event_broker.subscribe(target.id)
+        self.addCleanup(target_subscription.close)
+
+        self.client.put(url_for('main.update_item', item_id=item.id), json={'list_id': target.id})
+        expected = [{'type': 'item_moved', 'item_id': item.id, 'from_list_id': self.todo_list.id,
+                     'to_list_id': target.id}]
+        self.assertEqual(self.events(subscription), [dict(expected[0], list_id=self.todo_list.id)])
+        self.assertEqual(self.events(target_subscription), [dict(expected[0], list_id=target.id)])
+
+    def test_batch_publishes_after_commit(self):
+        """Test that a batch publishes its events once committed, and none when it is rolled back."""
+        subscription = self.subscribe()
+        response = self.client.post(url_for('main.batch'), json={'operations': [
+            {'op': 'create_item', 'list_id': self.todo_list.id, 'content': 'One', 'ref': 'one'},
+            {'op': 'update_item', 'item_id': 'one', 'content': 'Two'}
+        ]})
+        self.assertEqual(response.status_code, 200)
+        events = self.events(subscription)
+        self.assertEqual([event['type'] for event in events], ['item_created', 'item_updated'])
+        self.assertEqual(events[1]['item']['content'], 'Two')
+
+        response = self.client.post(url_for('main.batch'), json={'operations': [
+            {'op': 'create_item', 'list_id': self.todo_list.id, 'content': 'Three'},
+            {'op': 'delete_item', 'item_id': 999}
+        ]})
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(self.events(subscription), [])
+        db.session.commit()  # A later transaction does not publish the rolled back events either
+        self.assertEqual(self.events(subscription), [])
+
+    def test_import_publishes_one_event(self):
+        """Test that importing items publishes a single event with the new top-level IDs."""
+        subscription = self.subscribe()
+        data = self.client.post(url_for('main.import_items', list_id=self.todo_list.id), json={'items': [
+            {'content': 'One', 'children': [{'content': 'Child'}]},
+            {'content': 'Two'}
+        ]}).get_json()
+        self.assertEqual(self.events(subscription), [{'type': 'items_imported', 'list_id': self.todo_list.id,
+                                                      'parent_id': None, 'ids': data['ids'], 'count': 3}])
+
+    def test_events_backend_setting(self):
+        """Test that the broker uses the EVENTS_BACKEND class, created with the app's config."""
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                          'EVENTS_BACKEND': f'{__name__}.RecordingBackend', 'EVENTS_QUEUE_SIZE': 5})
+        backend = app.extensions['event_broker']
+        self.assertIsInstance(backend, RecordingBackend)
+        self.assertEqual(backend.queue_size, 5)
+        with app.app_context():
+            event_broker.publish(3, {'type': 'list_deleted', 'list_id': 3})
+        [(channel, message)] = backend.published
+        self.assertEqual(channel, 'list:3')
+        self.assertEqual(json.loads(message), {'type': 'list_deleted', 'list_id': 3})
+
+    def test_incomplete_events_backend(self):
+        """Test that a backend class missing part of the interface fails when the app is created."""
+        with self.assertRaises(TypeError):
+            create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                        'EVENTS_BACKEND': f'{__name__}.PublishOnlyBackend'})
@@ -0,0 +1,129 @@
+import unittest
+from flask import url_for
+from app import create_app, db
+from app.metrics import Counter, Histogram
+from app.models import User, TodoList, TodoItem
+
+
+class TestMetricFamilies(unittest.TestCase):
+    """
+    Test suite for the counters and histograms and their text format.
+    """
+
+    def test_counter(self):
+        """Test that counters are kept per label values, and label values are escaped."""
+        counter = Counter('requests_total', 'Requests.', ('method', 'path'))
+        counter.inc(('GET', '/a'))
+        counter.inc(('GET', '/a'), 2)
+        counter.inc(('GET', 'say "hi"\\\n'))
+        self.assertEqual(list(counter.samples()), [
+            'requests_total{method="GET",path="/a"} 3',
+            'requests_total{method="GET",path="say \\"hi\\"\\\\\\n"} 1'
+        ])
+
+    def test_histogram(self):
+        """Test that histogram buckets are cumulative, bounds are inclusive and the sum is kept."""
+        histogram = Histogram('latency_seconds', 'Latency.', ('endpoint',), (0.1, 1))
+        for value in (0.05, 0.1, 0.5, 3):
+            histogram.observe(('main.x',), value)
+        self.assertEqual(list(histogram.samples()), [
+            'latency_seconds_bucket{endpoint="main.x",le="0.1"} 2',
+            'latency_seconds_bucket{endpoint="main.x",le="1"} 3',
+            'latency_seconds_bucket{endpoint="main.x",le="+Inf"} 4',
+            'latency_seconds_sum{endpoint="main.x"} 3.65',
+            'latency_seconds_count{endpoint="main.x"} 4'
+        ])
+
+
+class TestMetrics(unittest.TestCase):
+    """
+    Test suite for the request metrics and GET /metrics.
+    """
+
+    def setUp(self):
+        """Set up a logged in user with a list of items."""
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SERVER_NAME': 'localhost',  # Required for url_for
+            'METRICS_ENABLED': 1
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = self.app.test_client()
+        db.create_all()
+
+        self.user = User(username='testuser', email='test@example.com', password='password')
+        self.todo_list = TodoList(title='Test List', owner=self.user)
+        db.session.add_all([self.user, TodoItem(content='Item', todo_list=self.todo_list)])
+        db.session.commit()
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = self.user.id
+
+    def tearDown(self):
+        """Clean up the test environment after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def samples(self):
+        """Returns the samples of GET /metrics as a mapping of name and labels to value."""
+        response = self.client.get(url_for('main.get_metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content_type, 'text/plain; version=0.0.4; charset=utf-8')
+        samples = {}
+        for line in response.get_data(as_text=True).splitlines():
+            if not line.startswith('#'):
+                name, value = line.rsplit(' ', 1)
+                samples[name] = float(value)
+        return samples
+
+    def test_requests_are_recorded_per_route(self):
+        """Test that latency, status codes, SQL statements and response sizes are recorded per route."""
+        url = url_for('main.get_items', list_id=self.todo_list.id)
+        body = self.client.get(url).get_data()
+        self.client.get(url)
+        self.client.get(url_for('main.get_items', list_id=999))
+
+        samples = self.samples()
+        route = 'method="GET",endpoint="main.get_items"'
+        self.assertEqual(samples[f'http_requests_total{{{route},status="200"}}'], 2)
+        self.assertEqual(samples[f'http_requests_total{{{route},status="404"}}'], 1)
+        self.assertEqual(samples[f'http_request_duration_seconds_count{{{route}}}'], 3)
+        self.assertGreater(samples[f'http_request_duration_seconds_sum{{{route}}}'], 0)
+        self.assertEqual(samples[f'http_request_duration_seconds_bucket{{{route},le="+Inf"}}'], 3)
+        self.assertGreater(samples[f'http_request_sql_statements_sum{{{route}}}'], 0)
+        self.assertGreater(samples[f'http_request_sql_duration_seconds_sum{{{route}}}'], 0)
+        self.assertEqual(samples[f'http_response_size_bytes_count{{{route}}}'], 3)
+        self.assertGreaterEqual(samples[f'http_response_size_bytes_sum{{{route}}}'], 2 * len(body))
+
+    def test_sql_statements_are_counted_per_request(self):
+        """Test that each request records the statements it executed, and only those."""
+        self.client.get(url_for('main.get_lists'))
+        db.session.execute(db.text('SELECT 1'))  # Outside a request: not counted
+        samples = self.samples()
+        route = 'method="GET",endpoint="main.get_lists"'
+        statements = samples[f'http_request_sql_statements_sum{{{route}}}']
+        self.client.get(url_for('main.get_lists'))
+        self.assertEqual(self.samples()[f'http_request_sql_statements_sum{{{route}}}'], 2 * statements)
+
+    def test_unmatched_requests_are_not_recorded(self):
+        """Test that requests matching no route do not create series."""
+        self.client.get('/no-such-route')
+        self.assertNotIn('endpoint="None"', self.client.get(url_for('main.get_metrics')).get_data(as_text=True))
+
+    def test_disabled(self):
+        """Test that METRICS_ENABLED=0 installs no instrumentation and hides the endpoint."""
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'METRICS_ENABLED': 0})
+        self.assertNotIn('metrics', app.extensions)
+        self.assertEqual(app.test_client().get('/metrics').status_code, 404)
+
+    def test_disabled_by_default(self):
+        """Test that without METRICS_ENABLED the unauthenticated endpoint is not served."""
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        self.assertNotIn('metrics', app.extensions)
+        self.assertEqual(app.test_client().get('/metrics').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
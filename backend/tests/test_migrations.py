@@ -0,0 +1,172 @@
+import os
+import tempfile
+import unittest
+from app import create_app, db
+from app import migrations, search
+from app.models import TodoItem, TodoItemTombstone, TodoList
+from app.operations import descendants_of, list_tree_select
+
+# Schema of a database created before schema versioning was introduced
+LEGACY_SCHEMA = [
+    'CREATE TABLE user (id INTEGER NOT NULL, username VARCHAR(80) NOT NULL, email VARCHAR(120) NOT NULL, '
+    'password VARCHAR(60) NOT NULL, PRIMARY KEY (id), UNIQUE (username), UNIQUE (email))',
+    'CREATE TABLE todo_list (id INTEGER NOT NULL, title VARCHAR(100) NOT NULL, user_id INTEGER NOT NULL, '
+    'created_at DATETIME, PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id))',
+    'CREATE TABLE todo_item (id INTEGER NOT NULL, content VARCHAR(200) NOT NULL, completed BOOLEAN, '
+    'collapsed BOOLEAN, list_id INTEGER NOT NULL, parent_id INTEGER, created_at DATETIME, level INTEGER, '
+    'PRIMARY KEY (id), FOREIGN KEY(list_id) REFERENCES todo_list (id), '
+    'FOREIGN KEY(parent_id) REFERENCES todo_item (id))',
+    "INSERT INTO user (id, username, email, password) VALUES (1, 'testuser', 'test@example.com', 'password')",
+    "INSERT INTO todo_list (id, title, user_id, created_at) VALUES (1, 'Old List', 1, '2024-01-01 00:00:00')",
+    "INSERT INTO todo_list (id, title, user_id, created_at) VALUES (2, 'Other List', 1, '2024-01-01 00:00:00')",
+    "INSERT INTO todo_item (id, content, completed, collapsed, list_id, parent_id, created_at, level) "
+    "VALUES (1, 'Old Item', 0, 0, 1, NULL, '2024-01-01 00:00:00', 1)",
+    # A top-level item moved to list 1 whose subtasks were left in list 2
+    "INSERT INTO todo_item (id, content, completed, collapsed, list_id, parent_id, created_at, level) "
+    "VALUES (2, 'Moved Item', 0, 0, 1, NULL, '2024-01-01 00:00:00', 1)",
+    "INSERT INTO todo_item (id, content, completed, collapsed, list_id, parent_id, created_at, level) "
+    "VALUES (3, 'Subtask', 0, 0, 2, 2, '2024-01-01 00:00:00', 2)",
+    "INSERT INTO todo_item (id, content, completed, collapsed, list_id, parent_id, created_at, level) "
+    "VALUES (4, 'Sub-subtask', 0, 0, 2, 3, '2024-01-01 00:00:00', 3)",
+]
+
+
+class TestMigrations(unittest.TestCase):
+    """
+    Test suite for the schema migrations.
+    """
+
+    def setUp(self):
+        """Create a database file with the legacy schema."""
+        handle, self.path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        engine = db.create_engine(f'sqlite:///{self.path}')
+        with engine.begin() as connection:
+            for statement in LEGACY_SCHEMA:
+                connection.exec_driver_sql(statement)
+        engine.dispose()
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.path}'})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        """Remove the database file."""
+        db.session.remove()
+        db.engine.dispose()
+        self.app_context.pop()
+        os.remove(self.path)
+
+    def test_legacy_database_is_not_stamped(self):
+        """Test that create_app leaves an existing database at its version."""
+        with db.engine.connect() as connection:
+            self.assertEqual(migrations.current_version(connection), 0)
+
+    def test_new_database_is_stamped(self):
+        """Test that a database created from the models is recorded as up to date."""
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        with app.app_context(), db.engine.connect() as connection:
+            self.assertEqual(migrations.current_version(connection), migrations.head())
+
+    def test_upgrade(self):
+        """Test that upgrading adds the new columns and keeps existing data."""
+        applied = migrations.upgrade(db.engine)
+        self.assertEqual([version for version, _ in applied], [version for version, _, _ in migrations.MIGRATIONS])
+        self.assertEqual(migrations.upgrade(db.engine), [])  # Nothing left to apply
+
+        item = db.session.get(TodoItem, 1)
+        self.assertEqual(item.content, 'Old Item')
+        self.assertEqual(item.revision, 0)
+        self.assertEqual(item.updated_at, item.created_at)
+        self.assertEqual(db.session.get(TodoList, 1).version, 1)
+
+        client = self.app.test_client()
+        with client.session_transaction() as sess:
+            sess['_user_id'] = 1
+        self.assertEqual(client.post('/lists/1/items', json={'content': 'New Item'}).status_code, 201)
+        self.assertEqual(len(client.get('/lists/1/items').get_json()), 3)
+
+    def test_upgrade_computes_item_paths(self):
+        """Test that upgrading computes item paths and moves left-behind subtasks to their tree's list."""
+        migrations.upgrade(db.engine)
+        items = {item.id: item for item in TodoItem.query.all()}
+        self.assertEqual([items[i].path for i in (1, 2, 3, 4)], ['/', '/', '/2/', '/2/3/'])
+        self.assertEqual([items[i].list_id for i in (1, 2, 3, 4)], [1, 1, 1, 1])
+        self.assertEqual([item.id for item in TodoItem.query.filter(descendants_of(items[2]))], [3, 4])
+
+    def test_upgrade_counts_subtasks(self):
+        """Test that upgrading fills in the subtask counters of existing items."""
+        migrations.upgrade(db.engine)
+        items = {item.id: item for item in TodoItem.query.all()}
+        self.assertEqual([(items[i].child_count, items[i].open_child_count) for i in (1, 2, 3, 4)],
+                         [(0, 0), (1, 1), (1, 1), (0, 0)])
+
+    def test_upgrade_indexes_items_for_search(self):
+        """Test that upgrading indexes the existing items, and flask db rebuild-search rebuilds the index."""
+        migrations.upgrade(db.engine)
+        self.assertEqual([hit['id'] for hit in search.search_items(1, 'moved', 20)], [2])
+
+        db.session.execute(db.text("INSERT INTO todo_item_fts (todo_item_fts) VALUES ('delete-all')"))
+        db.session.commit()
+        self.assertEqual(search.search_items(1, 'moved', 20), [])
+        self.assertIn('Search index rebuilt', self.app.test_cli_runner().invoke(args=['db', 'rebuild-search']).output)
+        self.assertEqual([hit['id'] for hit in search.search_items(1, 'moved', 20)], [2])
+
+    def test_check_counts_command(self):
+        """Test that flask db check-counts reports wrong subtask counters and repairs them."""
+        migrations.upgrade(db.engine)
+        TodoItem.query.filter_by(id=2).update({TodoItem.child_count: 5})
+        db.session.commit()
+
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['db', 'check-counts'])
+        self.assertEqual(result.exit_code, 1)
+        self.assertIn('Item 2: 5/1 subtasks/open recorded, 1/1 actual', result.output)
+
+        self.assertIn('Repaired 1 items', runner.invoke(args=['db', 'check-counts', '--repair']).output)
+        result = runner.invoke(args=['db', 'check-counts'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn('All subtask counters are correct', result.output)
+
+    def test_upgrade_command(self):
+        """Test the flask db upgrade and flask db current commands."""
+        runner = self.app.test_cli_runner()
+        self.assertIn(f'({migrations.head()} pending)', runner.invoke(args=['db', 'current']).output)
+        output = runner.invoke(args=['db', 'upgrade']).output
+        self.assertIn('Applied migration 1', output)
+        self.assertIn(f'Database is at version {migrations.head()}', output)
+        self.assertNotIn('pending', runner.invoke(args=['db', 'current']).output)
+
+    def explain(self, statement):
+        """Returns the SQLite query plan of a statement."""
+        sql = str(statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        with db.engine.connect() as connection:
+            return ' '.join(row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {sql}'))
+
+    def test_hot_path_queries_use_indexes(self):
+        """Test that the queries the routes run are served by the migrated indexes."""
+        migrations.upgrade(db.engine)
+
+        plan = self.explain(db.select(TodoList).where(TodoList.user_id == 1))
+        self.assertIn('USING INDEX ix_todo_list_user_id_created_at', plan)
+
+        plan = self.explain(list_tree_select(1))
+        self.assertIn('USING INDEX ix_todo_item_list_id_parent_id_created_at (list_id=?)', plan)
+
+        plan = self.explain(db.select(TodoItem).where(descendants_of(db.session.get(TodoItem, 2))))
+        self.assertIn('USING INDEX ix_todo_item_path (path>? AND path<?)', plan)
+
+        # The delta of GET /lists/<id>/changes: items and tombstones since a revision
+        plan = self.explain(db.select(TodoItem).where(TodoItem.list_id == 1, TodoItem.revision > 1))
+        self.assertIn('USING INDEX ix_todo_item_list_id_parent_id_created_at (list_id=?)', plan)
+        plan = self.explain(db.select(TodoItemTombstone.item_id).where(TodoItemTombstone.list_id == 1,
+                                                                       TodoItemTombstone.revision > 1))
+        self.assertIn('USING INDEX ix_todo_item_tombstone_list_id_revision (list_id=? AND revision>?)', plan)
+
+        # The open-subtask count of recount_children
+        child = db.aliased(TodoItem)
+        plan = self.explain(db.select(db.func.count()).where(child.parent_id == 1, child.completed.isnot(True)))
+        self.assertIn('USING COVERING INDEX ix_todo_item_parent_id_completed (parent_id=?)', plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,9 +10,10 @@ class TestModels(unittest.TestCase):
 
     def setUp(self):
         """Set up the test environment before each test."""
-        self.app = create_app()
-        self.app.config['TESTING'] = True
-        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'  # Use in-memory database
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'  # Use in-memory database
+        })
         self.app_context = self.app.app_context()
         self.app_context.push()
         db.create_all()
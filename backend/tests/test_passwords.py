@@ -0,0 +1,70 @@
+import threading
+import unittest
+from app import create_app, password_hasher
+from app.passwords import HashingPool, HasherBusy
+
+
+class TestHashingPool(unittest.TestCase):
+    """
+    Test suite for the bounded password hashing pool.
+    """
+
+    def test_run(self):
+        """Test that work runs on the pool and returns its result."""
+        pool = HashingPool(workers=2, queue_size=0)
+        self.assertEqual(pool.run(lambda: threading.current_thread().name)[:6], 'bcrypt')
+
+    def test_rejects_when_full(self):
+        """Test that work beyond the workers and queue slots is rejected immediately."""
+        pool = HashingPool(workers=1, queue_size=0)
+        started, release = threading.Event(), threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        blocker = threading.Thread(target=pool.run, args=(block,))
+        blocker.start()
+        started.wait(5)
+        with self.assertRaises(HasherBusy):
+            pool.run(lambda: None)
+        self.assertEqual(pool.rejected, 1)
+
+        release.set()
+        blocker.join()
+        self.assertIsNone(pool.run(lambda: None))  # The slot is free again
+
+
+class TestPasswordHasher(unittest.TestCase):
+    """
+    Test suite for the password hashing extension.
+    """
+
+    def setUp(self):
+        """Set up an app with a cheap cost factor."""
+        self.app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+                               'BCRYPT_LOG_ROUNDS': 4})
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+
+    def tearDown(self):
+        """Clean up the test environment after each test."""
+        self.app_context.pop()
+
+    def test_hash_and_check(self):
+        """Test that hashes use the configured cost and verify the password."""
+        password_hash = password_hasher.hash('secret')
+        self.assertTrue(password_hash.startswith('$2b$04$'))
+        self.assertTrue(password_hasher.check(password_hash, 'secret'))
+        self.assertFalse(password_hasher.check(password_hash, 'wrong'))
+
+    def test_needs_rehash(self):
+        """Test that only hashes with a different cost factor need rehashing."""
+        password_hash = password_hasher.hash('secret')
+        self.assertFalse(password_hasher.needs_rehash(password_hash))
+        self.app.config['BCRYPT_LOG_ROUNDS'] = 5
+        self.assertTrue(password_hasher.needs_rehash(password_hash))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+import unittest
+from flask import url_for
+from app import create_app, db
+from app.models import User, TodoList, TodoItem
+
+
+class TestProfiler(unittest.TestCase):
+    """
+    Test suite for the opt-in request profiler.
+    """
+
+    def create_app(self, **config):
+        """Creates an app with the given settings, a logged in user and a list of items."""
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SERVER_NAME': 'localhost',  # Required for url_for
+            **config
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.addCleanup(self.app_context.pop)
+        self.addCleanup(db.session.remove)
+        db.create_all()
+        self.user = User(username='testuser', email='test@example.com', password='password')
+        self.todo_list = TodoList(title='Test List', owner=self.user)
+        db.session.add_all([self.user, TodoItem(content='Item', todo_list=self.todo_list)])
+        db.session.commit()
+        self.client = self.app.test_client()
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = self.user.id
+        return url_for('main.get_items', list_id=self.todo_list.id)
+
+    def test_disabled_by_default(self):
+        """Test that without PROFILER_ENABLED the header is ignored and no hook is installed."""
+        url = self.create_app()
+        self.assertNotIn('profiler', self.app.extensions)
+        response = self.client.get(url, headers={'X-Profile': '1'})
+        self.assertEqual(response.get_json()[0]['content'], 'Item')
+
+    def test_profile_replaces_response(self):
+        """Test that a profiled request returns its call statistics and SQL statements."""
+        url = self.create_app(PROFILER_ENABLED=1)
+        report = self.client.get(url, headers={'X-Profile': 'tottime'}).get_json()
+        self.assertEqual(report['endpoint'], 'main.get_items')
+        self.assertEqual(report['status'], 200)
+        self.assertEqual(report['sort_key'], 'tottime')
+        self.assertEqual(report['sql_count'], len(report['sql']))
+        self.assertTrue(any('FROM todo_item' in statement['statement'] for statement in report['sql']))
+        self.assertTrue(any('get_items' in function['function'] for function in report['functions']))
+        self.assertGreater(report['duration_ms'], 0)
+
+        report = self.client.get(f'{url}?profile=1').get_json()
+        self.assertEqual(report['sort_key'], 'cumulative')
+        self.assertEqual(report['path'], f'/lists/{self.todo_list.id}/items?profile=1')
+        self.assertEqual(self.client.get(url).get_json()[0]['content'], 'Item')  # Not asked for: untouched
+        self.assertEqual(self.client.get(f'{url}?profile=0').get_json()[0]['content'], 'Item')
+
+    def test_profile_omits_parameter_values(self):
+        """Test that statements are recorded with the types of their parameters, without the values."""
+        url = self.create_app(PROFILER_ENABLED=1)
+        response = self.client.post(f'{url}?profile=1', json={'content': 'Secret content'})
+        report = response.get_json()
+        self.assertEqual(report['status'], 201)
+        self.assertNotIn('Secret content', response.get_data(as_text=True))
+        insert = next(statement for statement in report['sql'] if statement['statement'].startswith('INSERT'))
+        self.assertIn('str', insert['parameters'])
+
+    def test_profile_saved_to_directory(self):
+        """Test that with PROFILER_DIR the profile is saved and the response left as it is."""
+        with tempfile.TemporaryDirectory() as directory:
+            url = self.create_app(PROFILER_ENABLED=1, PROFILER_DIR=directory)
+            response = self.client.get(url, headers={'X-Profile': '1'})
+            self.assertEqual(response.get_json()[0]['content'], 'Item')
+            name = response.headers['X-Profile-File']
+            with open(os.path.join(directory, name)) as file:
+                self.assertEqual(json.load(file)['endpoint'], 'main.get_items')
+            self.assertTrue(os.path.exists(os.path.join(directory, name.replace('.json', '.prof'))))
+
+
+if __name__ == '__main__':
+    unittest.main()
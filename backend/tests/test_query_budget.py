@@ -0,0 +1,93 @@
+import unittest
+from app import create_app, db, query_budget
+from app.models import User, TodoList
+from app.query_budget import QueryBudgetExceeded, StatementCounter, assert_max_queries
+
+
+def create_budget_app(mode):
+    """Returns an app in the given mode with a view running two statements against a budget of one."""
+    app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'QUERY_BUDGET_MODE': mode})
+
+    @query_budget.limit(1)
+    def two_statements():
+        db.session.execute(db.text('SELECT 1'))
+        db.session.execute(db.text('SELECT 2'))
+        return 'done'
+
+    app.add_url_rule('/two-statements', 'two_statements', two_statements)
+    return app
+
+
+class TestQueryBudget(unittest.TestCase):
+    """
+    Test suite for the query budgets of views and the statement counters.
+    """
+
+    def test_raise_mode(self):
+        """Test that a view over its budget raises, listing its statements."""
+        app = create_budget_app('raise')
+        with self.assertRaises(QueryBudgetExceeded) as raised:
+            app.test_client().get('/two-statements')
+        self.assertEqual(raised.exception.statements, ['SELECT 1', 'SELECT 2'])
+        self.assertIn('two_statements executed 2 SQL statements, over its budget of 1', str(raised.exception))
+
+    def test_log_mode(self):
+        """Test that a view over its budget is answered and logged."""
+        app = create_budget_app('log')
+        with self.assertLogs(app.logger, 'WARNING') as logs:
+            response = app.test_client().get('/two-statements')
+        self.assertEqual(response.get_data(as_text=True), 'done')
+        self.assertIn('two_statements executed 2 SQL statements, over its budget of 1', logs.output[0])
+
+    def test_off_mode(self):
+        """Test that 'off' installs no listener and checks nothing."""
+        app = create_budget_app('off')
+        self.assertEqual(app.test_client().get('/two-statements').get_data(as_text=True), 'done')
+
+    def test_unknown_mode(self):
+        """Test that an unknown mode is rejected."""
+        with self.assertRaises(ValueError):
+            create_budget_app('strict')
+
+    def test_assert_max_queries(self):
+        """Test that the context manager counts the block's statements and raises over the budget."""
+        app = create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'})
+        with app.app_context():
+            with assert_max_queries(db.engine, 1) as counter:
+                db.session.execute(db.text('SELECT 1'))
+            self.assertEqual(counter.count, 1)
+            with self.assertRaises(QueryBudgetExceeded):
+                with assert_max_queries(db.engine, 0):
+                    db.session.execute(db.text('SELECT 1'))
+            with StatementCounter(db.engine) as counter:
+                pass
+            db.session.execute(db.text('SELECT 1'))  # After the block: not counted
+            self.assertEqual(counter.statements, [])
+
+
+def test_get_lists_runs_constant_statements(app, max_queries, count_queries):
+    """Test the fixtures: GET /lists runs as many statements for 40 lists as for 20."""
+    user = User(username='testuser', email='test@example.com', password='password')
+    db.session.add_all([user] + [TodoList(title=f'List {i}', owner=user) for i in range(20)])
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['_user_id'] = user.id
+
+    with count_queries() as counter:
+        client.get('/lists?stats=true')
+    db.session.add_all([TodoList(title=f'List {i}', owner=user) for i in range(20, 40)])
+    db.session.commit()
+    with max_queries(counter.count):
+        assert len(client.get('/lists?stats=true').get_json()) == 40
+
+
+def test_max_queries_fails_over_budget(app, max_queries):
+    """Test that max_queries fails a block running more statements than allowed."""
+    try:
+        with max_queries(0):
+            db.session.execute(db.text('SELECT 1'))
+    except QueryBudgetExceeded as error:
+        assert error.statements == ['SELECT 1']
+    else:
+        raise AssertionError('max_queries did not fail')
@@ -1,7 +1,16 @@
+import json
 import unittest
-from app import create_app, db
-from app.models import User, TodoList, TodoItem
-from flask import url_for
+from app import create_app, db, tree_cache, user_cache, password_hasher
+from app.migrations import wrong_child_counts
+from app.operations import ancestor_ids, descendants_of
+from app.passwords import HasherBusy
+from app.query_budget import StatementCounter
+from app.tokens import issue_token
+from unittest import mock
+from app.models import User, TodoList, TodoItem, TodoItemTombstone
+from flask import g, url_for
+from datetime import datetime, timedelta
+from sqlalchemy import event
 
 
 class TestRoutes(unittest.TestCase):
@@ -11,10 +20,11 @@ class TestRoutes(unittest.TestCase):
 
     def setUp(self):
         """Set up the test environment before each test."""
-        self.app = create_app()
-        self.app.config['TESTING'] = True
-        self.app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-        self.app.config['SERVER_NAME'] = 'localhost'  # Required for url_for
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SERVER_NAME': 'localhost'  # Required for url_for
+        })
         self.app_context = self.app.app_context()
         self.app_context.push()
         self.client = self.app.test_client()
@@ -24,6 +34,7 @@ class TestRoutes(unittest.TestCase):
         self.user = User(username='testuser', email='test@example.com', password='password')
         db.session.add(self.user)
         db.session.commit()
+        self.user_id = self.user.id
         with self.client.session_transaction() as sess:
             sess['_user_id'] = self.user.id
 
@@ -79,6 +90,941 @@ class TestRoutes(unittest.TestCase):
         self.assertEqual(data['message'], 'Task completed successfully')
         self.assertTrue(data['deleted'])  # Top-level items are deleted when completed
 
+    def count_queries(self, func):
+        """Runs func and returns the number of SQL statements it executed."""
+        return len(self.capture_queries(func)[1])
+
+    def capture_queries(self, func):
+        """
+        Runs func from a cold start and returns its result along with the SQL statements it executed.
+
+        The test client shares the test's app context and session, and the user loader caches
+        the user, so all of them are reset first to measure what a request on a fresh worker would run.
+        """
+        db.session.expire_all()
+        g.pop('_login_user', None)
+        user_cache.invalidate(self.user_id)
+        with StatementCounter(db.engine) as counter:
+            result = func()
+        return result, counter.statements
+
+    def create_tree(self, todolist, top_level_count, children_per_item):
+        """Creates a three-level tree of items in the given list."""
+        for i in range(top_level_count):
+            parent = TodoItem(content=f'Task {i}', todo_list=todolist, level=1)
+            db.session.add(parent)
+            for j in range(children_per_item):
+                child = TodoItem(content=f'Subtask {i}.{j}', todo_list=todolist, parent=parent, level=2)
+                db.session.add(child)
+                for k in range(children_per_item):
+                    db.session.add(TodoItem(content=f'Subtask {i}.{j}.{k}', todo_list=todolist,
+                                            parent=child, level=3))
+        db.session.commit()
+
+    def test_get_items_nested(self):
+        """Test that items are returned as a nested tree."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        self.create_tree(todolist, 2, 2)
+
+        response = self.client.get(url_for('main.get_items', list_id=todolist.id))
+        data = response.get_json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['content'] for item in data], ['Task 0', 'Task 1'])
+        self.assertEqual([child['content'] for child in data[0]['children']], ['Subtask 0.0', 'Subtask 0.1'])
+        self.assertEqual([child['content'] for child in data[0]['children'][1]['children']],
+                         ['Subtask 0.1.0', 'Subtask 0.1.1'])
+        self.assertEqual(data[0]['children'][1]['children'][0]['children'], [])
+        self.assertEqual(set(data[0]), {'id', 'content', 'completed', 'collapsed', 'level', 'created_at',
+                                        'child_count', 'open_child_count', 'children'})
+        self.assertEqual((data[0]['child_count'], data[0]['open_child_count']), (2, 2))
+
+    def test_get_items_includes_children_of_moved_item(self):
+        """Test that subtasks follow their parent after it was moved to another list."""
+        source = TodoList(title='Source', owner=self.user)
+        target = TodoList(title='Target', owner=self.user)
+        parent_item = TodoItem(content='Parent Item', todo_list=source, level=1)
+        child_item = TodoItem(content='Child Item', todo_list=source, parent=parent_item, level=2)
+        TodoItem(content='Grandchild Item', todo_list=source, parent=child_item, level=3)
+        db.session.add_all([source, target, parent_item])
+        db.session.commit()
+
+        response = self.client.put(url_for('main.update_item', item_id=parent_item.id), json={'list_id': target.id})
+        self.assertEqual(response.status_code, 200)
+        data = self.client.get(url_for('main.get_items', list_id=target.id)).get_json()
+        self.assertEqual(data[0]['children'][0]['content'], 'Child Item')
+        self.assertEqual(data[0]['children'][0]['children'][0]['content'], 'Grandchild Item')
+        self.assertEqual(self.client.get(url_for('main.get_items', list_id=source.id)).get_json(), [])
+        self.assertEqual(TodoItem.query.filter_by(list_id=target.id).count(), 3)
+
+    def test_get_items_query_count_is_constant(self):
+        """Test that the number of queries does not grow with the size of the tree."""
+        small = TodoList(title='Small', owner=self.user)
+        large = TodoList(title='Large', owner=self.user)
+        db.session.add_all([small, large])
+        self.create_tree(small, 1, 1)
+        self.create_tree(large, 10, 4)
+        small_id, large_id = small.id, large.id
+
+        def get_items(list_id):
+            return lambda: self.client.get(url_for('main.get_items', list_id=list_id))
+
+        small_count = self.count_queries(get_items(small_id))
+        large_count = self.count_queries(get_items(large_id))
+        self.assertEqual(small_count, large_count)
+
+    def test_get_items_conditional(self):
+        """Test that GET /lists/<id>/items answers a matching If-None-Match with a 304."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add_all([todolist, TodoItem(content='Test Item', todo_list=todolist)])
+        db.session.commit()
+        list_id = todolist.id
+
+        response = self.client.get(url_for('main.get_items', list_id=list_id))
+        etag = response.headers['ETag']
+        self.assertEqual(response.status_code, 200)
+
+        response, statements = self.capture_queries(lambda: self.client.get(
+            url_for('main.get_items', list_id=list_id), headers={'If-None-Match': etag}))
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.headers['ETag'], etag)
+        self.assertFalse([statement for statement in statements if 'FROM todo_item' in statement])
+
+    def test_item_writes_change_list_etag(self):
+        """Test that every item write route changes the ETag of the list's tree."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        list_id = todolist.id
+
+        def etag():
+            return self.client.get(url_for('main.get_items', list_id=list_id)).headers['ETag']
+
+        etags = [etag()]
+        item_id = self.client.post(url_for('main.create_item', list_id=list_id),
+                                   json={'content': 'Parent'}).get_json()['id']
+        etags.append(etag())
+        child_id = self.client.post(url_for('main.create_item', list_id=list_id),
+                                    json={'content': 'Child', 'parent_id': item_id}).get_json()['id']
+        etags.append(etag())
+        self.client.put(url_for('main.update_item', item_id=child_id), json={'content': 'Renamed'})
+        etags.append(etag())
+        self.client.put(url_for('main.complete_item', item_id=child_id))
+        etags.append(etag())
+        self.client.delete(url_for('main.delete_item', item_id=item_id))
+        etags.append(etag())
+
+        self.assertEqual(len(set(etags)), len(etags))
+
+    def test_moving_item_changes_both_list_etags(self):
+        """Test that moving an item to another list changes the ETags of both lists."""
+        source = TodoList(title='Source', owner=self.user)
+        target = TodoList(title='Target', owner=self.user)
+        item = TodoItem(content='Test Item', todo_list=source)
+        db.session.add_all([source, target, item])
+        db.session.commit()
+        source_id, target_id, item_id = source.id, target.id, item.id
+
+        before = [self.client.get(url_for('main.get_items', list_id=list_id)).headers['ETag']
+                  for list_id in (source_id, target_id)]
+        self.client.put(url_for('main.update_item', item_id=item_id), json={'list_id': target_id})
+        for list_id, etag in zip((source_id, target_id), before):
+            response = self.client.get(url_for('main.get_items', list_id=list_id), headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+
+    def test_get_lists_conditional(self):
+        """Test that GET /lists revalidates until a list route changes the collection."""
+        response = self.client.get(url_for('main.get_lists'))
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get(url_for('main.get_lists'), headers={'If-None-Match': etag}).status_code, 304)
+
+        list_id = self.client.post(url_for('main.create_list'), json={'title': 'New List'}).get_json()['id']
+        response = self.client.get(url_for('main.get_lists'), headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()[0]['title'], 'New List')
+
+        for change in (lambda: self.client.put(url_for('main.update_list', list_id=list_id), json={'title': 'Renamed'}),
+                       lambda: self.client.delete(url_for('main.delete_list', list_id=list_id))):
+            etag = self.client.get(url_for('main.get_lists')).headers['ETag']
+            change()
+            self.assertNotEqual(self.client.get(url_for('main.get_lists')).headers['ETag'], etag)
+
+    def test_get_lists_with_stats(self):
+        """Test that GET /lists?stats=true adds the item totals of each list."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        empty = TodoList(title='Empty List', owner=self.user)
+        db.session.add_all([todolist, empty])
+        self.create_tree(todolist, 2, 2)
+        TodoItem.query.filter_by(content='Subtask 0.0.0').one().completed = True
+        db.session.commit()
+
+        data = self.client.get(url_for('main.get_lists', stats='true')).get_json()
+        self.assertEqual(data[0]['stats'], {'item_count': 14, 'completed_count': 1, 'top_level_count': 2})
+        self.assertEqual(data[1]['stats'], {'item_count': 0, 'completed_count': 0, 'top_level_count': 0})
+        self.assertNotIn('stats', self.client.get(url_for('main.get_lists')).get_json()[0])
+
+        page = self.client.get(url_for('main.get_lists', stats='true', limit=1)).get_json()
+        self.assertEqual(page['lists'][0]['stats']['item_count'], 14)
+
+    def test_get_lists_stats_query_count_is_constant(self):
+        """Test that the totals of all lists come from one query, whatever the number of lists."""
+        def get_lists():
+            return self.client.get(url_for('main.get_lists', stats='true'))
+
+        db.session.add(TodoList(title='List 0', owner=self.user))
+        self.create_tree(TodoList.query.one(), 1, 1)
+        few = self.count_queries(get_lists)
+        lists = [TodoList(title=f'List {i}', owner=self.user) for i in range(1, 10)]
+        db.session.add_all(lists)
+        for todolist in lists:
+            self.create_tree(todolist, 2, 2)
+        self.assertEqual(self.count_queries(get_lists), few)
+
+    def test_get_lists_stats_conditional(self):
+        """Test that the ETag of GET /lists?stats=true changes with the items of the lists."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        list_id = todolist.id
+
+        response = self.client.get(url_for('main.get_lists', stats='true'))
+        etag = response.headers['ETag']
+        self.assertNotEqual(etag, self.client.get(url_for('main.get_lists')).headers['ETag'])
+        self.client.post(url_for('main.create_item', list_id=list_id), json={'content': 'New Item'})
+        response = self.client.get(url_for('main.get_lists', stats='true'), headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()[0]['stats']['item_count'], 1)
+
+    def test_get_changes(self):
+        """Test that GET /lists/<id>/changes returns only what changed since the cursor."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        list_id = todolist.id
+
+        def create(content, parent_id=None):
+            return self.client.post(url_for('main.create_item', list_id=list_id),
+                                    json={'content': content, 'parent_id': parent_id}).get_json()['id']
+
+        parent_id = create('Parent')
+        child_id = create('Child', parent_id)
+        untouched_id = create('Untouched')
+
+        snapshot = self.client.get(url_for('main.get_changes', list_id=list_id)).get_json()
+        self.assertEqual([item['id'] for item in snapshot['items']], [parent_id, child_id, untouched_id])
+        self.assertEqual(snapshot['items'][1]['parent_id'], parent_id)
+        self.assertEqual(snapshot['deleted'], [])
+
+        self.client.put(url_for('main.update_item', item_id=child_id), json={'content': 'Renamed'})
+        new_id = create('New')
+        changes = self.client.get(url_for('main.get_changes', list_id=list_id, since=snapshot['cursor'])).get_json()
+        self.assertEqual([item['id'] for item in changes['items']], [child_id, new_id])
+        self.assertEqual(changes['items'][0]['content'], 'Renamed')
+        self.assertEqual(changes['deleted'], [])
+
+        self.client.delete(url_for('main.delete_item', item_id=parent_id))
+        self.client.put(url_for('main.complete_item', item_id=new_id))
+        latest = self.client.get(url_for('main.get_changes', list_id=list_id, since=changes['cursor'])).get_json()
+        self.assertEqual(latest['items'], [])
+        self.assertEqual(latest['deleted'], [parent_id, child_id, new_id])
+
+        unchanged = self.client.get(url_for('main.get_changes', list_id=list_id, since=latest['cursor'])).get_json()
+        self.assertEqual(unchanged, {'cursor': latest['cursor'], 'items': [], 'deleted': []})
+
+    def test_get_changes_sends_parent_counters(self):
+        """Test that a parent whose subtasks change is in the delta with its new counters."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        list_id = todolist.id
+        parent_id = self.client.post(url_for('main.create_item', list_id=list_id),
+                                     json={'content': 'Parent'}).get_json()['id']
+
+        def changes_since(cursor):
+            changes = self.client.get(url_for('main.get_changes', list_id=list_id, since=cursor)).get_json()
+            return changes['cursor'], {item['id']: item for item in changes['items']}
+
+        cursor = self.client.get(url_for('main.get_changes', list_id=list_id)).get_json()['cursor']
+        child_id = self.client.post(url_for('main.create_item', list_id=list_id),
+                                    json={'content': 'Child', 'parent_id': parent_id}).get_json()['id']
+        cursor, items = changes_since(cursor)
+        self.assertEqual(set(items), {parent_id, child_id})
+        self.assertEqual((items[parent_id]['child_count'], items[parent_id]['open_child_count']), (1, 1))
+
+        self.client.put(url_for('main.complete_item', item_id=child_id))
+        cursor, items = changes_since(cursor)
+        self.assertEqual(set(items), {parent_id, child_id})
+        self.assertEqual((items[parent_id]['child_count'], items[parent_id]['open_child_count']), (1, 0))
+
+        self.client.delete(url_for('main.delete_item', item_id=child_id))
+        cursor, items = changes_since(cursor)
+        self.assertEqual(set(items), {parent_id})
+        self.assertEqual((items[parent_id]['child_count'], items[parent_id]['open_child_count']), (0, 0))
+
+        self.client.post(url_for('main.import_items', list_id=list_id),
+                         json={'parent_id': parent_id, 'items': [{'content': 'Imported'}]})
+        cursor, items = changes_since(cursor)
+        self.assertEqual(items[parent_id]['child_count'], 1)
+
+    def test_get_changes_after_move(self):
+        """Test that a moved item and its subtasks show up as deleted in one list and changed in the other."""
+        source = TodoList(title='Source', owner=self.user)
+        target = TodoList(title='Target', owner=self.user)
+        parent_item = TodoItem(content='Parent Item', todo_list=source, level=1)
+        child_item = TodoItem(content='Child Item', todo_list=source, parent=parent_item, level=2)
+        db.session.add_all([source, target, parent_item, child_item])
+        db.session.commit()
+        source_id, target_id = source.id, target.id
+        item_ids = [parent_item.id, child_item.id]
+
+        cursors = {list_id: self.client.get(url_for('main.get_changes', list_id=list_id)).get_json()['cursor']
+                   for list_id in (source_id, target_id)}
+        self.client.put(url_for('main.update_item', item_id=item_ids[0]), json={'list_id': target_id})
+
+        source_changes = self.client.get(url_for('main.get_changes', list_id=source_id,
+                                                 since=cursors[source_id])).get_json()
+        target_changes = self.client.get(url_for('main.get_changes', list_id=target_id,
+                                                 since=cursors[target_id])).get_json()
+        self.assertEqual(source_changes['deleted'], item_ids)
+        self.assertEqual([item['id'] for item in target_changes['items']], item_ids)
+
+    def test_get_changes_invalid_cursor(self):
+        """Test that malformed or future cursors are rejected."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+
+        for since in ('abc', '-1', '99'):
+            response = self.client.get(url_for('main.get_changes', list_id=todolist.id, since=since))
+            self.assertEqual(response.status_code, 400)
+
+    def test_batch(self):
+        """Test that a batch applies its operations in order and resolves refs."""
+        response = self.client.post(url_for('main.batch'), json={'operations': [
+            {'op': 'create_list', 'title': 'Groceries', 'ref': 'list'},
+            {'op': 'create_item', 'list_id': 'list', 'content': 'Fruit', 'ref': 'fruit'},
+            {'op': 'create_item', 'list_id': 'list', 'content': 'Apples', 'parent_id': 'fruit', 'ref': 'apples'},
+            {'op': 'complete_item', 'item_id': 'apples'},
+            {'op': 'update_item', 'item_id': 'fruit', 'collapsed': True},
+            {'op': 'rename_list', 'list_id': 'list', 'title': 'Shopping'}
+        ]})
+        data = response.get_json()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['status'] for result in data['results']], [201, 201, 201, 200, 200, 200])
+        self.assertFalse(data['results'][3]['body']['deleted'])
+        self.assertEqual(data['results'][5]['body']['title'], 'Shopping')
+
+        list_id = data['results'][0]['body']['id']
+        items = self.client.get(url_for('main.get_items', list_id=list_id)).get_json()
+        self.assertTrue(items[0]['collapsed'])
+        self.assertEqual(items[0]['children'][0]['content'], 'Apples')
+        self.assertTrue(items[0]['children'][0]['completed'])
+
+    def test_batch_bumps_versions_once(self):
+        """Test that a batch bumps the version of each list it touches only once."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        parent_item = TodoItem(content='Parent Item', todo_list=todolist, level=1)
+        children = [TodoItem(content=f'Child {i}', todo_list=todolist, parent=parent_item, level=2)
+                    for i in range(5)]
+        db.session.add_all([todolist, parent_item] + children)
+        db.session.commit()
+        version = todolist.version
+
+        response = self.client.post(url_for('main.batch'), json={'operations': [
+            {'op': 'complete_item', 'item_id': child.id} for child in children
+        ] + [{'op': 'complete_item', 'item_id': parent_item.id}]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(db.session.get(TodoList, todolist.id).version, version + 1)
+        self.assertEqual(TodoItem.query.count(), 0)
+
+    def test_batch_rolls_back_on_failure(self):
+        """Test that a failing operation rolls back the whole batch."""
+        other_user = User(username='otheruser', email='other@example.com', password='password')
+        other_list = TodoList(title='Other List', owner=other_user)
+        db.session.add_all([other_user, other_list])
+        db.session.commit()
+
+        response = self.client.post(url_for('main.batch'), json={'operations': [
+            {'op': 'create_list', 'title': 'Mine'},
+            {'op': 'create_item', 'list_id': other_list.id, 'content': 'Not mine'}
+        ]})
+        data = response.get_json()
+
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(data['index'], 1)
+        self.assertEqual(TodoList.query.filter_by(title='Mine').count(), 0)
+        self.assertEqual(TodoItem.query.count(), 0)
+
+    def test_batch_invalid_operations(self):
+        """Test that malformed batches and operations are rejected."""
+        self.assertEqual(self.client.post(url_for('main.batch'), json={}).status_code, 400)
+        for op in ({'op': 'explode'}, {'op': 'create_list'}, {'op': 'complete_item', 'item_id': 'missing'}):
+            response = self.client.post(url_for('main.batch'), json={'operations': [op]})
+            self.assertEqual(response.status_code, 400)
+        for ref in (['a'], {'a': 1}, 1):
+            response = self.client.post(url_for('main.batch'), json={'operations': [
+                {'op': 'create_list', 'title': 'Mine'}, {'op': 'create_list', 'title': 'Ref', 'ref': ref}
+            ]})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.get_json()['error'], 'Invalid ref')
+            self.assertEqual(response.get_json()['index'], 1)
+        self.assertEqual(TodoList.query.count(), 0)
+        response = self.client.post(url_for('main.batch'), json={'operations': [{'op': 'delete_item', 'item_id': 999}]})
+        self.assertEqual(response.status_code, 404)
+
+    def test_batch_invalid_ids(self):
+        """Test that IDs that are neither numbers nor refs are rejected as a failed operation."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        list_id = todolist.id
+        for op in ({'op': 'create_item', 'list_id': [list_id], 'content': 'Task'},
+                   {'op': 'create_item', 'list_id': list_id, 'parent_id': {}, 'content': 'Task'},
+                   {'op': 'complete_item', 'item_id': [1, 2]},
+                   {'op': 'rename_list', 'list_id': True, 'title': 'Renamed'}):
+            response = self.client.post(url_for('main.batch'), json={'operations': [op]})
+            data = response.get_json()
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(data['index'], 0)
+            self.assertTrue(data['error'].startswith('Invalid '))
+        self.assertEqual(TodoItem.query.count(), 0)
+
+    def test_import_items(self):
+        """Test that a nested tree is imported with server-side levels and parents."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        list_id = todolist.id
+        tree = [
+            {'content': 'Pack', 'children': [
+                {'content': 'Clothes', 'children': [{'content': 'Socks', 'completed': True}]},
+                {'content': 'Tickets'}
+            ]},
+            {'content': 'Leave'}
+        ]
+
+        response = self.client.post(url_for('main.import_items', list_id=list_id), json={'items': tree})
+        data = response.get_json()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(data['imported'], 5)
+
+        items = self.client.get(url_for('main.get_items', list_id=list_id)).get_json()
+        self.assertEqual([item['id'] for item in items], data['ids'])
+        self.assertEqual([item['content'] for item in items], ['Pack', 'Leave'])
+        self.assertEqual([child['content'] for child in items[0]['children']], ['Clothes', 'Tickets'])
+        socks = items[0]['children'][0]['children'][0]
+        self.assertEqual((socks['content'], socks['level'], socks['completed']), ('Socks', 3, True))
+
+    def test_import_items_not_an_object(self):
+        """Test that an import body that is not a JSON object is rejected."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        for body in ([], [{'content': 'Task'}], 'items'):
+            response = self.client.post(url_for('main.import_items', list_id=todolist.id), json=body)
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.get_json()['error'], 'Missing items')
+        self.assertEqual(TodoItem.query.count(), 0)
+
+    def test_import_items_query_count_is_constant(self):
+        """Test that the number of statements depends on the tree depth, not its size."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        list_id = todolist.id
+
+        def import_tree(width):
+            tree = [{'content': f'Task {i}', 'children': [{'content': f'Subtask {i}.{j}'} for j in range(width)]}
+                    for i in range(width)]
+            return lambda: self.client.post(url_for('main.import_items', list_id=list_id), json={'items': tree})
+
+        self.assertEqual(self.count_queries(import_tree(2)), self.count_queries(import_tree(20)))
+
+    def test_delete_item_deletes_subtree(self):
+        """Test that deleting an item deletes all its descendants and records their tombstones."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        self.create_tree(todolist, 2, 2)
+        doomed = TodoItem.query.filter_by(content='Task 0').one()
+        doomed_ids = {doomed.id} | {item.id for item in TodoItem.query.filter(TodoItem.content.like('Subtask 0.%'))}
+
+        response = self.client.delete(url_for('main.delete_item', item_id=doomed.id))
+        self.assertEqual(response.status_code, 200)
+        db.session.expire_all()
+        remaining = {item.id for item in TodoItem.query.all()}
+        self.assertEqual(len(remaining), 7)
+        self.assertFalse(remaining & doomed_ids)
+        self.assertEqual({t.item_id for t in TodoItemTombstone.query.all()}, doomed_ids)
+
+    def create_deletable_trees(self, todolist):
+        """Creates a small and a large tree whose subtasks are completed, and returns the IDs of their roots."""
+        self.create_tree(todolist, 1, 1)
+        self.create_tree(todolist, 1, 5)
+        for item in TodoItem.query.filter(TodoItem.level > 1):
+            item.completed = True
+        db.session.commit()
+        return [item.id for item in TodoItem.query.filter_by(level=1).order_by(TodoItem.id)]
+
+    def test_subtree_deletion_query_count_is_constant(self):
+        """Test that deleting or completing a top-level item runs the same queries whatever its subtree size."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        for route, method in (('main.delete_item', self.client.delete), ('main.complete_item', self.client.put)):
+            small_id, large_id = self.create_deletable_trees(todolist)
+            small_count = self.count_queries(lambda: method(url_for(route, item_id=small_id)))
+            large_count = self.count_queries(lambda: method(url_for(route, item_id=large_id)))
+            self.assertEqual(small_count, large_count)
+            self.assertEqual(TodoItem.query.count(), 0)
+
+    def test_import_items_too_deep(self):
+        """Test that imports beyond the nesting limit are rejected without writing anything."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        tree = [{'content': '1', 'children': [{'content': '2', 'children': [
+            {'content': '3', 'children': [{'content': '4'}]}
+        ]}]}]
+
+        response = self.client.post(url_for('main.import_items', list_id=todolist.id), json={'items': tree})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['error'], 'Maximum nesting level reached')
+        self.assertEqual(TodoItem.query.count(), 0)
+
+    def test_item_paths(self):
+        """Test that created and imported items get the path of their ancestors."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        list_id = todolist.id
+
+        def create(content, parent_id=None):
+            return self.client.post(url_for('main.create_item', list_id=list_id),
+                                    json={'content': content, 'parent_id': parent_id}).get_json()['id']
+
+        root_id = create('Root')
+        child_id = create('Child', root_id)
+        response = self.client.post(url_for('main.import_items', list_id=list_id),
+                                    json={'items': [{'content': 'Imported'}], 'parent_id': child_id})
+        imported_id = response.get_json()['ids'][0]
+
+        root, imported = db.session.get(TodoItem, root_id), db.session.get(TodoItem, imported_id)
+        self.assertEqual(root.path, '/')
+        self.assertEqual(imported.path, f'/{root_id}/{child_id}/')
+        self.assertEqual(ancestor_ids(imported), [root_id, child_id])
+        self.assertEqual([item.id for item in TodoItem.query.filter(descendants_of(root)).order_by(TodoItem.id)],
+                         [child_id, imported_id])
+
+    def test_create_item_with_foreign_parent(self):
+        """Test that an item cannot be created under another user's item."""
+        other = User(username='other', email='other@example.com', password='password')
+        other_list = TodoList(title='Other List', owner=other)
+        other_item = TodoItem(content='Other Item', todo_list=other_list)
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add_all([other, todolist])
+        db.session.commit()
+
+        for parent_id in (other_item.id, 9999):
+            response = self.client.post(url_for('main.create_item', list_id=todolist.id),
+                                        json={'content': 'Child', 'parent_id': parent_id})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.get_json()['error'], 'Parent item not found')
+
+    def test_max_nesting_level_is_configurable(self):
+        """Test that MAX_NESTING_LEVEL sets the depth limit of imports."""
+        self.app.config['MAX_NESTING_LEVEL'] = 4
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        tree = [{'content': '1', 'children': [{'content': '2', 'children': [
+            {'content': '3', 'children': [{'content': '4'}]}
+        ]}]}]
+
+        response = self.client.post(url_for('main.import_items', list_id=todolist.id), json={'items': tree})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(TodoItem.query.filter_by(content='4').one().level, 4)
+
+    def assert_child_counts_correct(self):
+        """Asserts that the subtask counters of every item match its actual subtasks."""
+        with db.engine.connect() as connection:
+            self.assertEqual(wrong_child_counts(connection), [])
+
+    def test_child_counts(self):
+        """Test that creating, completing, reopening, importing and deleting subtasks keep the counters right."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        list_id = todolist.id
+
+        def create(content, parent_id=None):
+            return self.client.post(url_for('main.create_item', list_id=list_id),
+                                    json={'content': content, 'parent_id': parent_id}).get_json()['id']
+
+        def counts(item_id):
+            db.session.expire_all()
+            item = db.session.get(TodoItem, item_id)
+            return item.child_count, item.open_child_count
+
+        parent_id = create('Parent')
+        first_id, second_id = create('First', parent_id), create('Second', parent_id)
+        self.assertEqual(counts(parent_id), (2, 2))
+
+        self.client.put(url_for('main.complete_item', item_id=first_id))
+        self.assertEqual(counts(parent_id), (2, 1))
+        self.client.put(url_for('main.update_item', item_id=first_id), json={'completed': False})
+        self.assertEqual(counts(parent_id), (2, 2))
+
+        self.client.post(url_for('main.import_items', list_id=list_id), json={
+            'parent_id': parent_id, 'items': [{'content': 'Done', 'completed': True}, {'content': 'Open'}]
+        })
+        self.assertEqual(counts(parent_id), (4, 3))
+
+        self.client.delete(url_for('main.delete_item', item_id=second_id))
+        self.assertEqual(counts(parent_id), (3, 2))
+        self.assert_child_counts_correct()
+
+        items = self.client.get(url_for('main.get_items', list_id=list_id)).get_json()
+        self.assertEqual((items[0]['child_count'], items[0]['open_child_count']), (3, 2))
+
+    def test_complete_item_reads_open_child_count(self):
+        """Test that complete_item checks subtasks without counting them, even within a batch."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        parent_item = TodoItem(content='Parent Item', todo_list=todolist, level=1)
+        db.session.add_all([todolist, parent_item])
+        db.session.commit()
+
+        response = self.client.post(url_for('main.batch'), json={'operations': [
+            {'op': 'create_item', 'list_id': todolist.id, 'content': 'Child', 'parent_id': parent_item.id, 'ref': 'child'},
+            {'op': 'complete_item', 'item_id': parent_item.id},
+        ]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()['results'][-1]['body']['uncompleted_subtasks'], 1)
+
+        _, statements = self.capture_queries(
+            lambda: self.client.put(url_for('main.complete_item', item_id=parent_item.id)))
+        self.assertFalse(any('count(' in statement for statement in statements))
+        self.assert_child_counts_correct()
+
+    def test_search_items(self):
+        """Test that GET /search finds items created, imported and edited through the routes."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        db.session.commit()
+        list_id = todolist.id
+        parent_id = self.client.post(url_for('main.create_item', list_id=list_id),
+                                     json={'content': 'Groceries'}).get_json()['id']
+        self.client.post(url_for('main.import_items', list_id=list_id),
+                         json={'parent_id': parent_id, 'items': [{'content': 'Apples'}, {'content': 'Pears'}]})
+        self.client.put(url_for('main.update_item', item_id=parent_id), json={'content': 'Fruit'})
+
+        hits = self.client.get(url_for('main.search_items', q='apple')).get_json()
+        self.assertEqual([hit['content'] for hit in hits], ['Apples'])
+        self.assertEqual(hits[0]['list_id'], list_id)
+        self.assertEqual(hits[0]['ancestors'], [{'id': parent_id, 'content': 'Fruit'}])
+        self.assertEqual(self.client.get(url_for('main.search_items', q='groceries')).get_json(), [])
+
+        self.client.delete(url_for('main.delete_item', item_id=parent_id))
+        self.assertEqual(self.client.get(url_for('main.search_items', q='apples')).get_json(), [])
+
+    def test_search_items_invalid(self):
+        """Test that GET /search rejects a missing query or an invalid limit."""
+        for args in ({}, {'q': '  '}, {'q': 'apples', 'limit': 0}, {'q': 'apples', 'limit': 'x'}):
+            self.assertEqual(self.client.get(url_for('main.search_items', **args)).status_code, 400)
+
+    def export_lines(self):
+        """Fetches GET /export and returns its records."""
+        response = self.client.get(url_for('main.export_data'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    def test_export_and_import(self):
+        """Test that an export imported into another account recreates the same lists and trees."""
+        self.app.config['EXPORT_BATCH_SIZE'] = 2  # Parents and children share batches, and span them
+        for title in ('First', 'Second'):
+            todolist = TodoList(title=title, owner=self.user)
+            db.session.add(todolist)
+            self.create_tree(todolist, 2, 2)
+        TodoItem.query.filter_by(content='Subtask 0.0.0').first().completed = True
+        db.session.commit()
+        records = self.export_lines()
+        self.assertEqual([record['type'] for record in records], ['list'] * 2 + ['item'] * 28)
+        expected = [self.client.get(url_for('main.get_items', list_id=record['id'])).get_json()
+                    for record in records[:2]]
+
+        other = User(username='other', email='other@example.com', password='password')
+        db.session.add(other)
+        db.session.commit()
+        with self.client.session_transaction() as sess:
+            sess['_user_id'] = other.id
+        g.pop('_login_user', None)
+        body = '\n'.join(json.dumps(record) for record in records) + '\n'
+        response = self.client.post(url_for('main.import_data'), data=body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json(), {'lists': 2, 'items': 28})
+
+        lists = self.client.get(url_for('main.get_lists')).get_json()
+        self.assertEqual([todo_list['title'] for todo_list in lists], ['First', 'Second'])
+
+        def strip_ids(items):
+            return [dict(item, id=None, children=strip_ids(item['children'])) for item in items]
+
+        for todo_list, tree in zip(lists, expected):
+            imported = self.client.get(url_for('main.get_items', list_id=todo_list['id'])).get_json()
+            self.assertEqual(strip_ids(imported), strip_ids(tree))
+        self.assert_child_counts_correct()
+
+    def test_import_invalid(self):
+        """Test that an invalid line rejects the whole import."""
+        list_record = json.dumps({'type': 'list', 'id': 1, 'title': 'List'})
+        item_record = {'type': 'item', 'id': 1, 'list_id': 1, 'content': 'Item'}
+        deep = [dict(item_record, id=i, parent_id=i - 1 if i > 1 else None) for i in range(1, 5)]
+        for lines, error in (
+            ([list_record, '{not json'], 'Line 2: invalid JSON'),
+            ([list_record, json.dumps(dict(item_record, parent_id=7))], 'Line 2: unknown parent_id'),
+            ([list_record, json.dumps(dict(item_record, parent_id=[1]))], 'Line 2: invalid parent_id'),
+            ([list_record, json.dumps(dict(item_record, parent_id={}))], 'Line 2: invalid parent_id'),
+            ([list_record, json.dumps(dict(item_record, list_id=2))], 'Line 2: unknown list_id'),
+            ([list_record] + [json.dumps(record) for record in deep], 'Line 5: maximum nesting level reached'),
+            ([list_record, json.dumps({'type': 'user'})], 'Line 2: unknown record type'),
+        ):
+            response = self.client.post(url_for('main.import_data'), data='\n'.join(lines))
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.get_json()['error'], error)
+        self.assertEqual(TodoList.query.count(), 0)
+        self.assertEqual(TodoItem.query.count(), 0)
+
+    def test_get_lists_paginated(self):
+        """Test that GET /lists pages through lists in creation order."""
+        created_at = datetime(2024, 1, 1)
+        # Pairs of lists share a timestamp, so pages must break ties on the ID
+        db.session.add_all([TodoList(title=f'List {i}', owner=self.user, created_at=created_at + timedelta(seconds=i // 2))
+                            for i in range(5)])
+        db.session.commit()
+
+        titles, cursor = [], None
+        for _ in range(3):
+            data = self.client.get(url_for('main.get_lists', limit=2, cursor=cursor)).get_json()
+            titles.extend(todo_list['title'] for todo_list in data['lists'])
+            cursor = data['next_cursor']
+        self.assertEqual(titles, [f'List {i}' for i in range(5)])
+        self.assertIsNone(cursor)
+
+    def test_get_items_paginated(self):
+        """Test that top-level items are paginated with their full subtrees."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        self.create_tree(todolist, 5, 2)
+        list_id = todolist.id
+
+        first = self.client.get(url_for('main.get_items', list_id=list_id, limit=3)).get_json()
+        second = self.client.get(url_for('main.get_items', list_id=list_id, limit=3,
+                                         cursor=first['next_cursor'])).get_json()
+        self.assertEqual([item['content'] for item in first['items'] + second['items']],
+                         [f'Task {i}' for i in range(5)])
+        self.assertIsNone(second['next_cursor'])
+        full = self.client.get(url_for('main.get_items', list_id=list_id)).get_json()
+        self.assertEqual(first['items'] + second['items'], full)
+
+    def test_get_items_paginated_query_count_is_constant(self):
+        """Test that a page costs the same number of queries whatever its position."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        self.create_tree(todolist, 9, 2)
+        list_id = todolist.id
+        cursor = self.client.get(url_for('main.get_items', list_id=list_id, limit=6)).get_json()['next_cursor']
+
+        def get_page(cursor):
+            return lambda: self.client.get(url_for('main.get_items', list_id=list_id, limit=3, cursor=cursor))
+
+        self.assertEqual(self.count_queries(get_page(None)), self.count_queries(get_page(cursor)))
+
+    def test_pagination_invalid_parameters(self):
+        """Test that invalid limits and cursors are rejected."""
+        for args in ({'limit': 0}, {'limit': 'abc'}, {'limit': 10000}, {'cursor': 'not-a-cursor'}):
+            self.assertEqual(self.client.get(url_for('main.get_lists', **args)).status_code, 400)
+
+    def test_get_items_cached(self):
+        """Test that the serialized tree is served from the cache until the list changes."""
+        todolist = TodoList(title='Test List', owner=self.user)
+        db.session.add(todolist)
+        self.create_tree(todolist, 2, 2)
+        list_id = todolist.id
+
+        first = self.client.get(url_for('main.get_items', list_id=list_id))
+        second, statements = self.capture_queries(lambda: self.client.get(url_for('main.get_items', list_id=list_id)))
+        self.assertEqual(first.get_json(), second.get_json())
+        self.assertFalse([statement for statement in statements if 'FROM todo_item' in statement])
+        self.assertEqual(tree_cache.stats()['hits'], 1)
+
+        self.client.post(url_for('main.create_item', list_id=list_id), json={'content': 'New'})
+        self.assertEqual(tree_cache.stats()['entries'], 0)
+        third = self.client.get(url_for('main.get_items', list_id=list_id)).get_json()
+        self.assertEqual(third[-1]['content'], 'New')
+
+    def test_moving_item_invalidates_both_cached_trees(self):
+        """Test that a cross-list move drops the cached trees of both lists."""
+        source = TodoList(title='Source', owner=self.user)
+        target = TodoList(title='Target', owner=self.user)
+        item = TodoItem(content='Test Item', todo_list=source)
+        db.session.add_all([source, target, item])
+        db.session.commit()
+        source_id, target_id, item_id = source.id, target.id, item.id
+
+        for list_id in (source_id, target_id):
+            self.client.get(url_for('main.get_items', list_id=list_id))
+        self.assertEqual(tree_cache.stats()['entries'], 2)
+
+        self.client.put(url_for('main.update_item', item_id=item_id), json={'list_id': target_id})
+        self.assertEqual(tree_cache.stats()['entries'], 0)
+        self.assertEqual(self.client.get(url_for('main.get_items', list_id=source_id)).get_json(), [])
+        self.assertEqual(len(self.client.get(url_for('main.get_items', list_id=target_id)).get_json()), 1)
+
+    def test_cache_stats(self):
+        """Test that the cache counters are exposed."""
+        response = self.client.get(url_for('main.cache_stats'))
+        data = response.get_json()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(data['trees']), {'hits', 'misses', 'hit_rate', 'evictions', 'entries', 'bytes', 'max_bytes'})
+        self.assertEqual(set(data['users']), {'hits', 'misses', 'hit_rate', 'evictions', 'expirations', 'entries',
+                                              'max_entries'})
+
+    def test_user_loader_is_cached(self):
+        """Test that authenticated requests after the first one do not query the users table."""
+        self.client.get(url_for('main.check_auth'))
+        db.session.expire_all()
+        for route in ('main.check_auth', 'main.cache_stats'):
+            g.pop('_login_user', None)
+            statements = []
+            listener = lambda conn, cursor, statement, *args: statements.append(statement)
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            try:
+                response = self.client.get(url_for(route))
+            finally:
+                event.remove(db.engine, 'before_cursor_execute', listener)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(statements, [])
+        self.assertEqual(response.get_json()['users']['hits'], 2)
+
+    def test_user_change_invalidates_cached_user(self):
+        """Test that committing a change to a user drops their cached record."""
+        self.assertEqual(self.client.get(url_for('main.check_auth')).get_json()['user']['username'], 'testuser')
+        db.session.get(User, self.user_id).username = 'renamed'
+        db.session.commit()
+        g.pop('_login_user', None)
+        self.assertEqual(self.client.get(url_for('main.check_auth')).get_json()['user']['username'], 'renamed')
+
+    def test_list_write_keeps_cached_user(self):
+        """Test that changing a user's lists does not drop their cached record."""
+        self.client.get(url_for('main.check_auth'))
+        self.assertEqual(self.client.post(url_for('main.create_list'), json={'title': 'New List'}).status_code, 201)
+        db.session.expire_all()
+        g.pop('_login_user', None)
+        statements = []
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', listener)
+        try:
+            response = self.client.get(url_for('main.check_auth'))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(statements, [])
+
+    def test_register_and_login(self):
+        """Test that a registered user can log in with their password."""
+        self.app.config['BCRYPT_LOG_ROUNDS'] = 4
+        response = self.client.post(url_for('main.register'), json={
+            'username': 'newuser', 'email': 'new@example.com', 'password': 'secret'
+        })
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post(url_for('main.login'), json={'username': 'newuser', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        response = self.client.post(url_for('main.login'), json={'username': 'newuser', 'password': 'wrong'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_login_rehashes_outdated_password(self):
+        """Test that a hash with an outdated cost factor is upgraded on login."""
+        self.app.config['BCRYPT_LOG_ROUNDS'] = 4
+        user = User(username='olduser', email='old@example.com', password=password_hasher.hash('secret'))
+        db.session.add(user)
+        db.session.commit()
+
+        self.app.config['BCRYPT_LOG_ROUNDS'] = 5
+        response = self.client.post(url_for('main.login'), json={'username': 'olduser', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        db.session.refresh(user)
+        self.assertTrue(user.password.startswith('$2b$05$'))
+        self.assertTrue(password_hasher.check(user.password, 'secret'))
+
+    def test_login_rejected_when_hashing_pool_is_full(self):
+        """Test that logins are rejected with a 503 while the hashing pool is full."""
+        with mock.patch.object(password_hasher.pool, 'run', side_effect=HasherBusy()):
+            response = self.client.post(url_for('main.login'), json={'username': 'testuser', 'password': 'password'})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '1')
+
+    def login_for_tokens(self):
+        """Logs in a user with a real password from a fresh client and returns the login response data."""
+        user = User(username='tokenuser', email='token@example.com', password=password_hasher.hash('secret'))
+        db.session.add(user)
+        db.session.commit()
+        response = self.app.test_client().post(url_for('main.login'),
+                                               json={'username': 'tokenuser', 'password': 'secret'})
+        self.assertEqual(response.status_code, 200)
+        return response.get_json()
+
+    def test_bearer_token_authenticates_without_user_lookup(self):
+        """Test that an access token from /login authenticates requests without reading the users table."""
+        data = self.login_for_tokens()
+        self.assertEqual(data['token_type'], 'Bearer')
+        self.assertEqual(data['expires_in'], 3600)
+        client = self.app.test_client()  # No session cookie
+        headers = {'Authorization': f"Bearer {data['access_token']}"}
+
+        response, statements = self.capture_queries(lambda: client.get(url_for('main.check_auth'), headers=headers))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['user'], data['user'])
+        self.assertEqual(statements, [])
+
+        g.pop('_login_user', None)
+        self.assertEqual(client.post(url_for('main.create_list'), json={'title': 'Mine'}, headers=headers).status_code,
+                         201)
+        self.assertEqual(TodoList.query.filter_by(title='Mine').one().user_id, data['user']['id'])
+
+    def test_invalid_bearer_tokens_are_rejected(self):
+        """Test that forged, expired and refresh tokens are not accepted as access tokens."""
+        data = self.login_for_tokens()
+        self.app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=-1)
+        with self.app.test_request_context():
+            expired = issue_token(User.query.filter_by(username='tokenuser').one(), 'access')
+        for token in (data['access_token'][:-2] + 'xx', expired, data['refresh_token'], 'garbage'):
+            g.pop('_login_user', None)
+            response = self.app.test_client().get(url_for('main.get_lists'),
+                                                  headers={'Authorization': f'Bearer {token}'})
+            self.assertEqual(response.status_code, 401)
+
+    def test_refresh_token(self):
+        """Test that a refresh token is exchanged for a new access token, and an access token is not."""
+        data = self.login_for_tokens()
+        response = self.client.post(url_for('main.refresh_token'), json={'refresh_token': data['refresh_token']})
+        self.assertEqual(response.status_code, 200)
+        g.pop('_login_user', None)
+        check = self.app.test_client().get(url_for('main.check_auth'),
+                                           headers={'Authorization': f"Bearer {response.get_json()['access_token']}"})
+        self.assertEqual(check.get_json()['user']['username'], 'tokenuser')
+
+        response = self.client.post(url_for('main.refresh_token'), json={'refresh_token': data['access_token']})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(self.client.post(url_for('main.refresh_token'), json={}).status_code, 400)
+
+        db.session.delete(User.query.filter_by(username='tokenuser').one())
+        db.session.commit()
+        response = self.client.post(url_for('main.refresh_token'), json={'refresh_token': data['refresh_token']})
+        self.assertEqual(response.status_code, 401)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from unittest import mock
+from app import create_app, db
+from app.models import User, TodoList, TodoItem
+from app.search import match_expression, rebuild_index, search_items
+
+
+class TestSearch(unittest.TestCase):
+    """
+    Test suite for the full-text search of items.
+    """
+
+    def setUp(self):
+        """Set up a user with a list of nested items."""
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:'
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.user = User(username='testuser', email='test@example.com', password='password')
+        self.todo_list = TodoList(title='Trip', owner=self.user)
+        self.pack = TodoItem(content='Pack the bags', todo_list=self.todo_list)
+        self.clothes = TodoItem(content='Clothes', todo_list=self.todo_list, parent=self.pack, level=2)
+        self.socks = TodoItem(content='Warm socks, wool socks', todo_list=self.todo_list,
+                              parent=self.clothes, level=3)
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up the test environment after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def search(self, text, limit=20):
+        return [hit['content'] for hit in search_items(self.user.id, text, limit)]
+
+    def test_match_expression(self):
+        """Test that search text becomes quoted words, the last one a prefix."""
+        self.assertEqual(match_expression('warm so'), '"warm" "so"*')
+        self.assertEqual(match_expression('socks" OR NEAR(x'), '"socks" "OR" "NEAR" "x"*')
+        self.assertIsNone(match_expression(' "* '))
+
+    def test_search_ranks_hits_with_ancestors(self):
+        """Test that hits are ranked by relevance and carry their list and ancestors."""
+        db.session.add(TodoItem(content='Buy socks', todo_list=self.todo_list))
+        db.session.commit()
+
+        hits = search_items(self.user.id, 'socks', 20)
+        self.assertEqual([hit['content'] for hit in hits], ['Warm socks, wool socks', 'Buy socks'])
+        self.assertEqual(hits[0]['list_id'], self.todo_list.id)
+        self.assertEqual(hits[0]['ancestors'], [{'id': self.pack.id, 'content': 'Pack the bags'},
+                                                {'id': self.clothes.id, 'content': 'Clothes'}])
+        self.assertEqual(hits[1]['ancestors'], [])
+        self.assertEqual(self.search('socks', limit=1), ['Warm socks, wool socks'])
+
+    def test_search_matches_prefix_and_all_words(self):
+        """Test that every word must match and the last one matches as a prefix."""
+        self.assertEqual(self.search('clo'), ['Clothes'])
+        self.assertEqual(self.search('wool war'), ['Warm socks, wool socks'])
+        self.assertEqual(self.search('wool bags'), [])
+        self.assertEqual(self.search('*'), [])
+
+    def test_search_without_index_escapes_wildcards(self):
+        """Test that the search of databases without the index matches '%' and '_' literally."""
+        db.session.add(TodoItem(content='Rename file_2', todo_list=self.todo_list))
+        db.session.commit()
+        with mock.patch.object(db.engine.dialect, 'name', 'postgresql'):
+            self.assertEqual(self.search('SOCKS'), ['Warm socks, wool socks'])
+            self.assertEqual(self.search('_'), ['Rename file_2'])
+            self.assertEqual(self.search('%'), [])
+
+    def test_search_only_returns_own_items(self):
+        """Test that other users' items are not searched."""
+        other = User(username='other', email='other@example.com', password='password')
+        TodoItem(content='Other socks', todo_list=TodoList(title='Other', owner=other))
+        db.session.add(other)
+        db.session.commit()
+        self.assertEqual(self.search('other'), [])
+        self.assertEqual([hit['content'] for hit in search_items(other.id, 'socks', 20)], ['Other socks'])
+
+    def test_index_follows_writes(self):
+        """Test that updates, bulk deletes and rebuilds keep the index in sync with the items."""
+        self.pack.content = 'Pack the suitcase'
+        db.session.commit()
+        self.assertEqual(self.search('bags'), [])
+        self.assertEqual(self.search('suitcase'), ['Pack the suitcase'])
+
+        TodoItem.query.filter_by(id=self.socks.id).delete()
+        db.session.commit()
+        self.assertEqual(self.search('socks'), [])
+
+        db.session.execute(db.text("INSERT INTO todo_item_fts (todo_item_fts) VALUES ('delete-all')"))
+        self.assertEqual(self.search('clothes'), [])
+        rebuild_index(db.session.connection())
+        self.assertEqual(self.search('clothes'), ['Clothes'])
+
+
+if __name__ == '__main__':
+    unittest.main()
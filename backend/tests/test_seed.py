@@ -0,0 +1,75 @@
+import unittest
+from app import create_app, db
+from app.migrations import wrong_child_counts
+from app.models import User, TodoList, TodoItem
+from app.operations import descendants_of
+from app.search import search_items
+from app.seed import seed_data
+
+
+class TestSeed(unittest.TestCase):
+    """
+    Test suite for the generator of benchmark data and flask seed.
+    """
+
+    def setUp(self):
+        """Set up the test environment before each test."""
+        self.app = create_app({
+            'TESTING': True,
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'BCRYPT_LOG_ROUNDS': 4
+        })
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Clean up the test environment after each test."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_seed_data(self):
+        """Test that the generated trees have the requested shape, paths and subtask counters."""
+        result = seed_data(users=2, lists=3, items=2, children=3, depth=3, completed=0.5, batch_size=7)
+        self.assertEqual(result['usernames'], ['user1', 'user2'])
+        self.assertEqual(result['items'], 2 * 3 * (2 + 6 + 18))
+        self.assertEqual(TodoItem.query.count(), result['items'])
+        self.assertEqual(TodoList.query.filter_by(user_id=2).count(), 3)
+        self.assertEqual(len(result['list_ids']['user2']), 3)
+
+        root = TodoItem.query.filter_by(list_id=result['list_ids']['user1'][0], parent_id=None).first()
+        self.assertEqual(TodoItem.query.filter(descendants_of(root)).count(), 3 + 9)
+        self.assertEqual(max(item.level for item in TodoItem.query), 3)
+        with db.engine.connect() as connection:
+            self.assertEqual(wrong_child_counts(connection), [])
+        self.assertEqual(len(search_items(1, 'item', 100)), 78)
+
+    def test_seed_data_is_reproducible_and_appends(self):
+        """Test that the same seed generates the same statuses, and a second run adds new users."""
+        seed_data(users=1, lists=2, items=5, children=2, depth=2, seed=7)
+        first = [item.completed for item in TodoItem.query.order_by(TodoItem.id)]
+        result = seed_data(users=1, lists=2, items=5, children=2, depth=2, seed=7)
+        self.assertEqual(result['usernames'], ['user2'])
+        second = [item.completed for item in TodoItem.query.filter(TodoItem.id > len(first)).order_by(TodoItem.id)]
+        self.assertEqual(first, second)
+
+    def test_seed_data_rejects_deep_trees(self):
+        """Test that trees deeper than MAX_NESTING_LEVEL are rejected."""
+        with self.assertRaises(ValueError):
+            seed_data(users=1, lists=1, items=1, children=1, depth=4)
+        self.assertEqual(User.query.count(), 0)
+
+    def test_seed_command(self):
+        """Test flask seed."""
+        runner = self.app.test_cli_runner()
+        result = runner.invoke(args=['seed', '--users', '2', '--lists', '1', '--items', '2', '--children', '1'])
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Seeded 2 users (user1 to user2, password 'password'), 2 lists and 12 items", result.output)
+        self.assertEqual(self.app.test_client().post('/login', json={
+            'username': 'user2', 'password': 'password'}).status_code, 200)
+        self.assertNotEqual(runner.invoke(args=['seed', '--depth', '5']).exit_code, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import json
+import unittest
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from decimal import Decimal
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date as werkzeug_http_date
+from app import create_app
+from app import serialization
+from app.serialization import JSONProvider, http_date
+
+
+class TestSerialization(unittest.TestCase):
+    """
+    Test suite for the JSON provider.
+    """
+
+    data = {
+        'created_at': datetime(2024, 2, 29, 23, 59, 58, 123456),
+        'due': date(2024, 1, 1),
+        'aware': datetime(2024, 3, 1, 1, 30, tzinfo=timezone(timedelta(hours=2))),
+        'id': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+        'amount': Decimal('1.50'),
+        'title': 'Café',
+        'items': [{'b': 1, 'a': [True, None, 2.5]}],
+    }
+
+    def create_app(self, encoder):
+        return create_app({'TESTING': True, 'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:', 'JSON_ENCODER': encoder})
+
+    def test_http_date_matches_werkzeug(self):
+        """Test that dates are formatted exactly like Flask's default provider does."""
+        for value in (datetime(2024, 2, 29, 23, 59, 58, 123456), datetime(1999, 12, 31), date(2024, 1, 7),
+                      datetime(2024, 3, 1, 1, 30, tzinfo=timezone(timedelta(hours=2)))):
+            self.assertEqual(http_date(value), werkzeug_http_date(value))
+
+    def test_json_encoder_matches_default_provider(self):
+        """Test that the standard library encoder produces the same output as Flask's default provider."""
+        app = self.create_app('json')
+        self.assertEqual(app.json.encoder, 'json')
+        self.assertEqual(app.json.dumps(self.data), DefaultJSONProvider(app).dumps(self.data))
+        with app.app_context():
+            self.assertEqual(app.json.response(self.data).get_data(),
+                             DefaultJSONProvider(app).response(self.data).get_data())
+
+    @unittest.skipIf(serialization.orjson is None, 'orjson is not installed')
+    def test_orjson_encoder_matches_default_provider(self):
+        """Test that orjson produces the same data, dates included, as Flask's default provider."""
+        app = self.create_app('orjson')
+        self.assertEqual(app.json.encoder, 'orjson')
+        expected = json.loads(DefaultJSONProvider(app).dumps(self.data))
+        self.assertEqual(json.loads(app.json.dumps(self.data)), expected)
+        with app.app_context():
+            response = app.json.response(self.data)
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(json.loads(response.get_data()), expected)
+        self.assertEqual(app.json.dumps({'b': 1, 'a': 2}), '{"a":2,"b":1}')
+
+    @unittest.skipIf(serialization.orjson is None, 'orjson is not installed')
+    def test_orjson_falls_back_for_dumps_options(self):
+        """Test that dumps with json.dumps options uses the standard library."""
+        app = self.create_app('orjson')
+        self.assertEqual(app.json.dumps({'a': 1}, indent=1), '{\n "a": 1\n}')
+
+    def test_auto_encoder(self):
+        """Test that 'auto' uses orjson only when it is installed."""
+        expected = 'json' if serialization.orjson is None else 'orjson'
+        self.assertEqual(self.create_app('auto').json.encoder, expected)
+        original, serialization.orjson = serialization.orjson, None
+        try:
+            self.assertEqual(self.create_app('auto').json.encoder, 'json')
+            with self.assertRaises(ValueError):
+                self.create_app('orjson')
+        finally:
+            serialization.orjson = original
+
+    def test_unknown_encoder(self):
+        """Test that an unknown encoder is rejected."""
+        with self.assertRaises(ValueError):
+            self.create_app('ujson')
+
+    def test_app_uses_provider(self):
+        """Test that the app serializes its responses with the provider."""
+        self.assertIsInstance(self.create_app('auto').json, JSONProvider)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+import unittest
+from app.tokens import InvalidToken, encode_token, decode_token
+
+
+class TestTokens(unittest.TestCase):
+    """
+    Test suite for the signed token helpers.
+    """
+
+    def test_round_trip(self):
+        """Test that the claims of a token are returned while it is valid."""
+        token = encode_token({'sub': '1', 'exp': 100}, 'secret')
+        self.assertEqual(decode_token(token, 'secret', now=99), {'sub': '1', 'exp': 100})
+
+    def test_expired(self):
+        """Test that a token is rejected once it has expired."""
+        token = encode_token({'sub': '1', 'exp': 100}, 'secret')
+        with self.assertRaises(InvalidToken):
+            decode_token(token, 'secret', now=100)
+
+    def test_bad_signature(self):
+        """Test that tokens signed with another key or with altered claims are rejected."""
+        token = encode_token({'sub': '1', 'exp': 100}, 'secret')
+        with self.assertRaises(InvalidToken):
+            decode_token(token, 'other', now=0)
+        header, _, signature = token.split('.')
+        forged = encode_token({'sub': '2', 'exp': 100}, 'other').split('.')[1]
+        with self.assertRaises(InvalidToken):
+            decode_token(f'{header}.{forged}.{signature}', 'secret', now=0)
+
+    def test_malformed(self):
+        """Test that malformed tokens are rejected."""
+        for token in ('', 'abc', 'a.b.c', 'a.b.c.d', encode_token({'sub': '1'}, 'secret')):
+            with self.assertRaises(InvalidToken):
+                decode_token(token, 'secret', now=0)
+
+
+if __name__ == '__main__':
+    unittest.main()